@@ -0,0 +1,236 @@
+"""
+Aegis 코어 계산 — Streamlit/네트워크 없이 숫자만 다루는 공용 로직.
+app.py(대시보드·백테스트)와 bot.py(텔레그램 봇)가 같은 함수를 쓰도록 한곳에 모아둔다.
+"""
+import numpy as np
+import pytz
+from datetime import datetime
+
+
+# ==========================================
+# 🧠 V26.5 마스터 스코어
+# ==========================================
+def calculate_aegis_master_score_array(current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60,
+                                       dxy_curr, dxy_ma20, target_weight, current_weight, my_krw, day=None):
+    """마스터 스코어를 배열(여러 종목 × 여러 날짜)로 한 번에 계산한다.
+    입력은 스칼라·리스트·NumPy 배열·pandas 컬럼 무엇이든 되고, 서로 브로드캐스트된다.
+    day는 '이번 달 며칠'(1~31). None이면 오늘(KST) 날짜를 쓴다.
+    반환: {'score', 'A', 'B', 'C', 'D', 'E', 'F'} — 각 요소는 상한이 적용된 값이며,
+    score = A + B + C - D + F - E (스칼라 함수와 같은 순서로 더해 결과가 비트 단위로 같다)."""
+    if day is None: day = datetime.now(pytz.timezone('Asia/Seoul')).day
+    (price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20,
+     target_weight, current_weight, my_krw, day) = np.broadcast_arrays(*(
+        np.asarray(x, dtype=float) for x in (current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60,
+                                             dxy_curr, dxy_ma20, target_weight, current_weight, my_krw, day)))
+
+    # Score A: 시장 기회 (RSI는 VIX≥18 교차검증을 통과해야 인정)
+    score_A = np.where((rsi < 50) & (vix >= 18), (50 - rsi) * 1.5, 0.0)
+    score_A = score_A + np.where(vix > 20, (vix - 20) * 1.0, 0.0)
+    score_A = score_A + np.where(price < ma200, 20.0, 0.0)
+    score_A = np.minimum(score_A, 60)
+
+    # Score B: 목표 대비 비중 갭
+    gap = target_weight - current_weight
+    score_B = np.minimum(np.where(gap > 5.0, (gap - 5.0) * 2.5, 0.0), 30)
+
+    # Score C: 매월 5일 기준 시간 압박 (현금이 많을수록 하루당 점수가 부드럽게 증가)
+    days_passed = np.where(day >= 5, day - 5, day + 30 - 5)
+    rate_per_day = 0.8 + np.minimum(1.0, (my_krw - 100000) / 500000) * 1.0
+    score_C = np.minimum(np.where(my_krw >= 100000, days_passed * rate_per_day, 0.0), 50)
+
+    # Score D: 환율 페널티 (달러 강세면 절반으로 완화)
+    blended_base_rate = (my_avg_rate * 0.15) + (krw_ma60 * 0.85)
+    score_D = np.where(curr_rate > blended_base_rate, (curr_rate - blended_base_rate) * 0.5, 0.0)
+    score_D = np.where(dxy_curr > dxy_ma20, score_D * 0.5, score_D)
+    score_D = np.minimum(score_D, 50)
+
+    # Score F: 저환율 보너스 (상한 15점)
+    score_F = np.where(curr_rate < blended_base_rate, np.minimum((blended_base_rate - curr_rate) * 0.25, 15), 0.0)
+
+    # Score E: 과열 페널티 (RSI 낮은 폭락장에서는 0이라 공포매수는 그대로 살아있음)
+    score_E = np.where(rsi > 55, (rsi - 55) * 1.2, 0.0)
+    score_E = score_E + np.where(price > ma200 * 1.10, 15.0, 0.0)
+
+    score = score_A + score_B + score_C - score_D + score_F - score_E
+    return {'score': score, 'A': score_A, 'B': score_B, 'C': score_C,
+            'D': score_D, 'E': score_E, 'F': score_F}
+
+
+def calculate_aegis_master_score(ticker, current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60,
+                                 dxy_curr, dxy_ma20, target_weight, current_weight, my_krw, sim_day=None):
+    """한 종목·하루치 마스터 스코어 (배열 버전의 얇은 래퍼). sim_day는 백테스트용 '이번 달 며칠'."""
+    return float(calculate_aegis_master_score_array(
+        current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20,
+        target_weight, current_weight, my_krw, day=sim_day)['score'])
+
+
+# ==========================================
+# 🤖 봇 규칙 (run_bot과 포트폴리오 백테스트가 같이 쓴다)
+# ==========================================
+MIN_KRW_ACTION = 10000
+MIN_USD_ACTION = 100
+REVERSE_EX_GAP = 15
+SPREAD_RATE = 0.009
+QLD_HARD_CAP = 30.0        # QLD가 전체의 30%를 넘으면 추가 매수 중단
+CASH_CEILING_PCT = 35.0    # 달러 현금이 전체의 35%를 넘으면 과다로 판단
+VOLATILITY_BUFFER = 8.0    # 목표 비중 + 8%p를 넘어야 과열 매도
+PORTFOLIO_TICKERS = ['QQQM', 'SPYM', 'QLD', 'SGOV', 'GMMF']
+
+
+def get_ai_target_ratios(vix, q_rsi, s_rsi):
+    """AI 오토파일럿: 시장 상황(VIX, RSI)에 따른 목표 비중(%)과 모드 이름"""
+    mode = "Normal"; t_qqqm = 40; t_spym = 30; t_sgov = 25; t_qld = 5
+    # 진성 공포장 (Tactical Strike)
+    if vix > 30 or (q_rsi < 30 and vix >= 18) or (s_rsi < 30 and vix >= 18):
+        mode = "Fear (Tactical Strike)"; t_qqqm = 35; t_spym = 25; t_sgov = 20; t_qld = 20
+    # 지수 개편 등으로 인한 과열기 (Profit Take)
+    elif q_rsi > 70 or s_rsi > 70:
+        mode = "Greed (Profit Take)"; t_qqqm = 32; t_spym = 28; t_sgov = 40; t_qld = 0
+    return {'QQQM': t_qqqm, 'SPYM': t_spym, 'SGOV': t_sgov, 'QLD': t_qld, 'GMMF': 0.0, 'mode': mode}
+
+
+def portfolio_weights(qty, price, my_usd):
+    """달러 기준 총자산(주식 + 달러 현금)과 종목별 현재 비중(%)"""
+    values = {t: qty.get(t, 0) * price[t] for t in PORTFOLIO_TICKERS}
+    total = sum(values[t] for t in PORTFOLIO_TICKERS) + my_usd
+    weights = {t: (values[t] / total * 100) if total > 0 else 0 for t in PORTFOLIO_TICKERS}
+    return total, weights
+
+
+def decide_signals(vix, price, rsi, qqqm_ma200, curr_rate, krw_ma60, fx, my_avg_rate, my_krw, my_usd,
+                   qty, weights, total_usd, scores, targets, is_open, is_bank_open):
+    """봇의 매매 규칙을 그대로 평가해서, 보낼 신호를 우선순위 순서대로 돌려준다.
+    각 신호는 {'kind': ..., 실행에 필요한 숫자들} — 문구는 bot.format_signal, 실행은 백테스트가 맡는다.
+    price/rsi/qty/weights/scores/targets는 종목별 dict, fx는 {'ma60', 'downtrend', 'stabilizing'}."""
+    sigs = []
+    pacing_ratio = 0.3 if vix > 30 else 1.0
+
+    # 추세 필터: 핵심 지수(QQQM)가 200일선 아래면 하락 추세로 보고 매수를 더 잘게 분할
+    is_downtrend = price['QQQM'] < qqqm_ma200
+    trend_factor = 0.5 if is_downtrend else 1.0
+
+    # 자동화 2: 100점 돌파 시 3개 종목을 경쟁시켜 가장 저평가된 1개만 매수 지시
+    max_ticker = max(scores, key=scores.get)
+    max_score = scores[max_ticker]
+    if max_score >= 100.0:
+        if my_krw >= MIN_KRW_ACTION and is_bank_open:
+            sigs.append({'kind': 'urgent_exchange', 'ticker': max_ticker, 'score': max_score,
+                         'pacing': pacing_ratio, 'krw': my_krw * pacing_ratio})
+        elif my_usd >= MIN_USD_ACTION and is_open:
+            sigs.append({'kind': 'urgent_buy', 'ticker': max_ticker, 'score': max_score, 'pacing': pacing_ratio,
+                         'usd': my_usd * pacing_ratio, 'price': price[max_ticker]})
+
+    real_buy_rate = curr_rate * (1 + SPREAD_RATE)
+    real_sell_rate = curr_rate * (1 - SPREAD_RATE)
+    gap_vs_ma60 = real_buy_rate - fx['ma60']
+
+    # 환전 추천: 60일 평균 대비 싸면 단계별로 환전
+    if my_krw >= MIN_KRW_ACTION and is_bank_open and not sigs:
+        suggest_percent = 0; tier = 0; notes = []
+        if   gap_vs_ma60 <= -30: suggest_percent = 60; tier = 60
+        elif gap_vs_ma60 <= -15: suggest_percent = 40; tier = 40
+        elif gap_vs_ma60 <=  -5: suggest_percent = 25; tier = 25
+        if suggest_percent > 0:
+            if fx['downtrend'] and not fx['stabilizing']:
+                suggest_percent = int(suggest_percent * 0.5); notes.append('halved')
+            elif fx['stabilizing']:
+                notes.append('stabilizing')
+        if 0 < my_krw <= 300000 and suggest_percent > 0:
+            suggest_percent = 100; notes.append('all_in')
+        if suggest_percent > 0:
+            sigs.append({'kind': 'exchange', 'tier': tier, 'notes': notes, 'rate': real_buy_rate,
+                         'krw': my_krw * (suggest_percent / 100)})
+
+    # 역환전: 내 평단보다 비싸고, 최근 60일 시장 평균보다도 높을 때만
+    sell_diff = real_sell_rate - my_avg_rate
+    is_stock_cheap = (rsi['QQQM'] < 50 or rsi['QLD'] < 50 or vix > 25)
+    is_fx_truly_high = curr_rate > krw_ma60
+    if (my_usd >= 100 and sell_diff >= REVERSE_EX_GAP and not is_stock_cheap
+            and is_fx_truly_high and not sigs and is_bank_open):
+        sigs.append({'kind': 'reverse_exchange', 'gain': sell_diff})
+
+    # 진성 폭락장 매수 (VIX 트리거)
+    if my_usd >= MIN_USD_ACTION and (is_open or vix > 30) and not sigs:
+        qld_w = weights['QLD']
+        if vix >= 25 and rsi['QLD'] < 35 and qld_w < QLD_HARD_CAP:
+            qld_pct = 25 if is_downtrend else 50
+            room_usd = total_usd * ((QLD_HARD_CAP - qld_w) / 100)
+            budget = min(my_usd * (qld_pct / 100), room_usd)
+            if budget >= price['QLD']:
+                sigs.append({'kind': 'crash_buy', 'ticker': 'QLD', 'vix': vix, 'downtrend': is_downtrend,
+                             'weight': qld_w, 'pct': qld_pct, 'usd': budget, 'price': price['QLD']})
+        elif rsi['QQQM'] < 40 and vix >= 18:
+            base_pct = 30 if rsi['QQQM'] >= 30 else 50
+            final_pct = int(base_pct * trend_factor)
+            sigs.append({'kind': 'crash_buy', 'ticker': 'QQQM', 'vix': vix, 'downtrend': is_downtrend,
+                         'pct': final_pct, 'panic': rsi['QQQM'] < 30,
+                         'usd': my_usd * (final_pct / 100), 'price': price['QQQM']})
+        elif rsi['SPYM'] < 40 and vix >= 18:
+            spym_pct = int(30 * trend_factor)
+            sigs.append({'kind': 'crash_buy', 'ticker': 'SPYM', 'vix': vix, 'downtrend': is_downtrend,
+                         'pct': spym_pct, 'usd': my_usd * (spym_pct / 100), 'price': price['SPYM']})
+
+    # 현금 천장 + SGOV 파킹 — '전액'이 아니라 '목표 비중까지만' 채운다 (즉시 되팔기 방지)
+    usd_cash_weight = (my_usd / total_usd * 100) if total_usd > 0 else 0
+    sgov_w = weights['SGOV']
+    sgov_room_pct = targets['SGOV'] - sgov_w
+    sgov_room_usd = total_usd * (sgov_room_pct / 100) if sgov_room_pct > 0 else 0.0
+    park_usd = min(my_usd, sgov_room_usd)
+    if my_usd >= MIN_USD_ACTION and is_open and not sigs:
+        if park_usd < price['SGOV']:
+            pass   # 1주도 못 채울 여유면 지시하지 않음 (잔챙이 매매 방지)
+        elif usd_cash_weight > CASH_CEILING_PCT:
+            sigs.append({'kind': 'sgov_park', 'ceiling': True, 'cash_weight': usd_cash_weight, 'weight': sgov_w,
+                         'target': targets['SGOV'], 'usd': park_usd, 'price': price['SGOV']})
+        elif sgov_w < targets['SGOV']:
+            sigs.append({'kind': 'sgov_park', 'ceiling': False, 'cash_weight': usd_cash_weight, 'weight': sgov_w,
+                         'target': targets['SGOV'], 'usd': park_usd, 'price': price['SGOV']})
+
+    # 자동화 3: 과열 리밸런싱 (수익 실현 / 출구 전략) — QLD는 앞선 신호와 무관하게 먼저 본다
+    if is_open:
+        for t in ('QLD', 'QQQM', 'SPYM'):
+            if t != 'QLD' and sigs: break
+            if rsi[t] > 70 and weights[t] >= (targets[t] + VOLATILITY_BUFFER):
+                excess_pct = weights[t] - targets[t]
+                excess_usd = total_usd * (excess_pct / 100)
+                sell_qty = min(round(excess_usd / price[t]), int(qty.get(t, 0)))   # 실제 보유 수량을 넘지 않게
+                if sell_qty >= 1:
+                    sigs.append({'kind': 'overheat_sell', 'ticker': t, 'rsi': rsi[t], 'weight': weights[t],
+                                 'excess_pct': excess_pct, 'qty': sell_qty,
+                                 'sgov_qty': round(excess_usd / price['SGOV'])})
+                break
+
+    # 자동화 4: SGOV 방어 해제 (공격 자금 장전) — 목표 비중이 줄어 초과된 SGOV를 팔아 달러 확보
+    if is_open and not sigs and sgov_w >= (targets['SGOV'] + VOLATILITY_BUFFER):
+        excess_pct = sgov_w - targets['SGOV']
+        excess_usd = total_usd * (excess_pct / 100)
+        sgov_sell_qty = min(round(excess_usd / price['SGOV']), int(qty.get('SGOV', 0)))
+        if sgov_sell_qty >= 1:
+            sigs.append({'kind': 'sgov_release', 'weight': sgov_w, 'excess_pct': excess_pct, 'qty': sgov_sell_qty})
+
+    return sigs
+
+
+def _sig2(x):
+    # 금액은 유효숫자 두 자리로 (가격·환율이 조금 흔들려 몇 달러 바뀐 건 '같은 신호')
+    return float(f"{float(x):.2g}")
+
+
+# 신호 종류별로 '받는 사람이 할 일'을 바꾸는 값만 — 점수·RSI·비중처럼 매 실행 조금씩 움직이는 설명용 값은 뺀다
+_FINGERPRINT_KEYS = {
+    'urgent_exchange': ('ticker', 'pacing', 'krw'), 'urgent_buy': ('ticker', 'pacing', 'usd'),
+    'exchange': ('tier', 'notes', 'krw'), 'reverse_exchange': (),
+    'crash_buy': ('ticker', 'downtrend', 'pct', 'usd'), 'sgov_park': ('ceiling', 'usd'),
+    'overheat_sell': ('ticker', 'qty', 'sgov_qty'), 'sgov_release': ('qty',),
+}
+
+
+def signal_fingerprint(sig):
+    """decide_signals 신호 하나의 지문 (문자열). 지문이 같으면 이미 알린 신호와 같은 지시로 본다"""
+    parts = [sig['kind']]
+    for k in _FINGERPRINT_KEYS.get(sig['kind'], sorted(set(sig) - {'kind'})):
+        v = sig.get(k)
+        if k in ('krw', 'usd'): v = _sig2(v)
+        elif isinstance(v, list): v = '+'.join(v)
+        parts.append(f"{k}={v}")
+    return '|'.join(parts)
@@ -1,13 +1,19 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
+import numpy as np
+import os
 import time
-import requests
 import altair as alt 
-import ta
 import pytz 
-from streamlit_gsheets import GSheetsConnection
 from datetime import datetime, timedelta
+import price_store
+import ledger
+import sheet_mirror
+import notifier
+import indicators   # RSI·이동평균 (ta 대신, 봇·백테스트와 같은 정의)
+from aegis_core import calculate_aegis_master_score   # 🔥 V26.5 마스터 스코어 (봇과 공용)
+from aegis_core import get_ai_target_ratios as core_target_ratios
+from backtest import bt_run, bt_sweep, bt_portfolio_prepare, bt_portfolio_run, PF_TICKERS
 
 # ==========================================
 # 0. 기본 설정 & 보안 (Security)
@@ -29,7 +35,6 @@ def check_password():
         st.stop()
 
 check_password()
-conn = st.connection("gsheets", type=GSheetsConnection)
 SHEET_URL = "https://docs.google.com/spreadsheets/d/19EidY2HZI2sHzvuchXX5sKfugHLtEG0QY1Iq61kzmbU/edit?gid=0#gid=0"
 SPREAD_BT = 0.009   # 백테스트용 환전 스프레드 (봇의 SPREAD_RATE와 동일)
 
@@ -37,213 +42,103 @@ def send_test_message():
     try:
         token = st.secrets["TELEGRAM_TOKEN"]
         chat_id = st.secrets["TELEGRAM_CHAT_ID"]
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        requests.post(url, data={"chat_id": chat_id, "text": "🔔 [Aegis] 정상 작동 중입니다."})
+    except Exception:
+        st.sidebar.error("⚠️ Secrets 설정을 확인하세요."); return
+    # 화면이 오래 멈추지 않도록 재시도는 짧게
+    if notifier.Notifier(token, chat_id, timeout=10, retries=2).send("🔔 [Aegis] 정상 작동 중입니다."):
         st.sidebar.success("✅ 전송 성공!")
-    except: st.sidebar.error("⚠️ Secrets 설정을 확인하세요.")
+    else: st.sidebar.error("⚠️ 전송 실패 — 토큰/chat_id 또는 네트워크를 확인하세요.")
 
 # ==========================================
 # 1. 데이터 엔진 & AI 분석
 # ==========================================
+# 화면에 필요한 종목은 하나씩 받지 않고 한 번의 일괄 요청으로 (종목끼리는 동시에). 1년치면 현재가·RSI·200일선·
+# 환율 MA60·DXY MA20까지 모두 이 묶음 하나에서 나온다
+APP_TICKERS = ["KRW=X", "^VIX", "QQQM", "SPYM", "QLD", "SGOV", "GMMF", "DX-Y.NYB"]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_market_bundle():
+    return price_store.get_histories(APP_TICKERS, period="1y")   # 실패는 캐시하지 않도록 예외 그대로
+
+def _bundle_or_fetch(ticker, period):
+    try: df = get_market_bundle().get(ticker)
+    except Exception: df = None
+    if df is None or df.empty: return price_store.get_history(ticker, period=period)   # 일괄에서 빠진 종목만 따로
+    return df if period == "1y" else price_store.slice_period(df, period)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_market_context():
+    """리밸런싱 점수 루프(tab3)와 시장 레이더(tab4)가 같이 쓰는 시장 숫자. 봇의 MarketContext와 같은 정의:
+    RSI(14)는 1년치 종가로, 200일선은 200봉이 안 되면 현재가, 환율 MA60, DXY 현재값·MA20.
+    종목별 프레임('frames')에는 차트용 RSI 열이 붙어 있다. 받지 못한 종목은 빠진다."""
+    try: bundle = get_market_bundle()
+    except Exception: bundle = {}
+    ctx = {'frames': {}, 'price': {}, 'rsi': {}, 'ma200': {}}
+    for t, df in bundle.items():
+        df = df.copy()
+        c = df['Close']
+        df['RSI'] = indicators.rsi_wilder(c, 14)
+        ctx['frames'][t] = df
+        ctx['price'][t] = float(c.iloc[-1])
+        ctx['rsi'][t] = float(df['RSI'].iloc[-1]) if len(c) >= 14 else 0.0
+        ctx['ma200'][t] = float(c.tail(200).mean()) if len(c) >= 200 else float(c.iloc[-1])
+    fx, dxy = ctx['frames'].get("KRW=X"), ctx['frames'].get("DX-Y.NYB")
+    ctx['krw_ma60'] = float(fx['Close'].tail(60).mean()) if fx is not None else None
+    ctx['dxy'] = float(dxy['Close'].iloc[-1]) if dxy is not None else 100.0
+    ctx['dxy_ma20'] = float(dxy['Close'].tail(20).mean()) if dxy is not None else 100.0
+    return ctx
+
 @st.cache_data(ttl=300) 
 def get_current_price(ticker):
     try:
-        hist = yf.Ticker(ticker).history(period="5d")
+        hist = _bundle_or_fetch(ticker, "5d")
         if not hist.empty: return float(hist['Close'].iloc[-1])
         return 0.0
     except: return 0.0
 
 @st.cache_data(ttl=300)
 def get_usd_krw():
-    max_retries = 3
-    for attempt in range(max_retries):
-        try: 
-            df = yf.Ticker("KRW=X").history(period="5d")
-            if df.empty: raise ValueError
-            return float(df['Close'].iloc[-1])
-        except:
-            if attempt < max_retries - 1:
-                time.sleep(1.0) 
-                continue
-            else:
-                st.warning("⚠️ 실시간 환율을 못 불러왔습니다. 잠시 후 새로고침 해주세요. (임시 1450원 적용 중)")
-                # 1450을 캐시에 굳히지 않도록, 예외를 던져 캐시 저장 자체를 막음
-                raise RuntimeError("FX fetch failed")
+    # 재시도·예비 공급자는 시세 공급자 체인(price_providers)이 이미 거쳤다
+    try: df = _bundle_or_fetch("KRW=X", "5d")
+    except Exception: df = None
+    if df is None or df.empty:
+        st.warning("⚠️ 실시간 환율을 못 불러왔습니다. 잠시 후 새로고침 해주세요. (임시 1450원 적용 중)")
+        # 1450을 캐시에 굳히지 않도록, 예외를 던져 캐시 저장 자체를 막음
+        raise RuntimeError("FX fetch failed")
+    return float(df['Close'].iloc[-1])
 
-@st.cache_data(ttl=300)
 def get_market_analysis(ticker):
-    try:
-        df = yf.Ticker(ticker).history(period="2mo")
-        if len(df) < 14: return 0, 0, pd.DataFrame()
-        df['RSI'] = ta.momentum.RSIIndicator(df['Close'], window=14).rsi()
-        return df['Close'].iloc[-1], df['RSI'].iloc[-1], df
-    except: return 0, 0, pd.DataFrame()
+    # (현재가, RSI, 최근 2개월 프레임 + RSI 열) — 시장 컨텍스트에서 꺼내기만 한다
+    ctx = get_market_context()
+    df = ctx['frames'].get(ticker)
+    if df is None or len(df) < 14: return 0, 0, pd.DataFrame()
+    return ctx['price'][ticker], ctx['rsi'][ticker], price_store.slice_period(df, "2mo")
 
-@st.cache_data(ttl=300)
 def get_vix_data():
-    try:
-        df = yf.Ticker("^VIX").history(period="2mo")
-        return df['Close'].iloc[-1], df
-    except: return 0, pd.DataFrame()
+    ctx = get_market_context()
+    df = ctx['frames'].get("^VIX")
+    if df is None: return 0, pd.DataFrame()
+    return ctx['price']["^VIX"], price_store.slice_period(df, "2mo")
 
 def get_ai_target_ratios(vix, q_rsi, s_rsi):
-    mode = "Normal"; t_qqqm = 40; t_spym = 30; t_sgov = 25; t_qld = 5
-    if vix > 30 or (q_rsi < 30 and vix >= 18) or (s_rsi < 30 and vix >= 18):
-        mode = "Fear (Tactical Strike)"; t_qqqm = 35; t_spym = 25; t_sgov = 20; t_qld = 20
-    elif q_rsi > 70 or s_rsi > 70:
-        mode = "Greed (Profit Take)"; t_qqqm = 32; t_spym = 28; t_sgov = 40; t_qld = 0
-    return t_qqqm, t_spym, t_sgov, t_qld, mode
-
-def calculate_wallet_balance_detail(df_stock, df_cash):
-    krw_deposit = 0; krw_withdrawn = 0; krw_used_for_usd = 0; krw_gained_from_usd = 0
-    usd_gained = 0; usd_sold = 0
-    
-    if not df_cash.empty:
-        for col in ['Amount_KRW', 'Amount_USD']:
-            if col in df_cash.columns: df_cash[col] = pd.to_numeric(df_cash[col].astype(str).str.replace(',',''), errors='coerce').fillna(0)
-            
-        krw_deposit = df_cash[df_cash['Type'] == 'Deposit']['Amount_KRW'].sum()
-        krw_withdrawn = df_cash[df_cash['Type'] == 'Withdraw']['Amount_KRW'].sum()
-        ex_to_usd = df_cash[df_cash['Type'] == 'Exchange']
-        krw_used_for_usd = ex_to_usd['Amount_KRW'].sum()
-        usd_gained = ex_to_usd['Amount_USD'].sum()
-        ex_to_krw = df_cash[df_cash['Type'] == 'Exchange_USD_to_KRW']
-        krw_gained_from_usd = ex_to_krw['Amount_KRW'].sum()
-        usd_sold = ex_to_krw['Amount_USD'].sum()
-
-    usd_spent = 0; usd_earned_stock = 0; stock_details = []
-    if not df_stock.empty:
-        for col in ['Qty', 'Price', 'Fee']:
-            if col in df_stock.columns: df_stock[col] = pd.to_numeric(df_stock[col].astype(str).str.replace(',',''), errors='coerce').fillna(0)
-        buys = df_stock[df_stock['Action'] == 'BUY']
-        for _, row in buys.iterrows():
-            cost = (row['Qty'] * row['Price']) + row['Fee']
-            usd_spent += cost
-            stock_details.append(f"[-] 매수 {row['Ticker']}: ${cost:.2f}")
-        sells = df_stock[df_stock['Action'] == 'SELL']
-        for _, row in sells.iterrows():
-            revenue = (row['Qty'] * row['Price']) - row['Fee']
-            usd_earned_stock += revenue
-            stock_details.append(f"[+] 매도 {row['Ticker']}: ${revenue:.2f}")
-        divs = df_stock[df_stock['Action'] == 'DIVIDEND']
-        for _, row in divs.iterrows():
-            revenue = row['Price'] - row['Fee']
-            usd_earned_stock += revenue
-            stock_details.append(f"[+] 배당 {row['Ticker']}: ${revenue:.2f}")
-
-    final_krw = (krw_deposit + krw_gained_from_usd) - (krw_used_for_usd + krw_withdrawn)
-    final_usd = (usd_gained + usd_earned_stock) - (usd_spent + usd_sold)
-    net_principal = krw_deposit - krw_withdrawn
-
-    return {'KRW': final_krw, 'USD': final_usd, 'Net_Principal': net_principal,
-            'Detail_USD_In': usd_gained, 'Detail_USD_Out': usd_spent, 'Stock_Log': stock_details}
-
-def calculate_my_avg_exchange_rate(df_cash, df_stock):
-    has_stock = False
-    if not df_stock.empty:
-        df_stock['Qty'] = pd.to_numeric(df_stock['Qty'].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-        total_buy = df_stock[df_stock['Action'] == 'BUY']['Qty'].sum()
-        total_sell = df_stock[df_stock['Action'] == 'SELL']['Qty'].sum()
-        if (total_buy - total_sell) > 0.001: has_stock = True
-
-    if df_cash.empty: return 1450.0
-    df = df_cash.copy()
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values('Date')
-    
-    total_usd_held = 0.0
-    total_krw_spent = 0.0
-    last_valid_rate = 1450.0 
-    
-    for _, row in df.iterrows():
-        try:
-            amt_krw = float(str(row['Amount_KRW']).replace(',', ''))
-            amt_usd = float(str(row['Amount_USD']).replace(',', ''))
-        except: continue
-            
-        if row['Type'] == 'Exchange': 
-            total_usd_held += amt_usd
-            total_krw_spent += amt_krw
-            if total_usd_held > 0: last_valid_rate = total_krw_spent / total_usd_held
-            
-        elif row['Type'] == 'Exchange_USD_to_KRW': 
-            if total_usd_held > 0:
-                current_avg = total_krw_spent / total_usd_held
-                sell_usd = min(amt_usd, total_usd_held) 
-                total_usd_held -= sell_usd
-                total_krw_spent -= (sell_usd * current_avg)
-            
-            if total_usd_held <= 0.1: 
-                total_usd_held = 0
-                total_krw_spent = 0
-
-    if total_usd_held > 0: return total_krw_spent / total_usd_held
-    if has_stock: return last_valid_rate 
-    return 1450.0 
-
-def calculate_tax_guard(df_stock):
-    if df_stock.empty: return {'realized_profit': 0, 'tax_estimated': 0, 'log': [], 'remaining_allowance': 2500000}
-    df = df_stock.copy(); df['Date'] = pd.to_datetime(df['Date'])
-    # 추가: 같은 날짜면 BUY(매수)를 먼저 처리하도록 정렬 (원가 꼬임 방지)
-    df['_order'] = df['Action'].apply(lambda x: 0 if x == 'BUY' else 1)
-    df = df.sort_values(by=['Date', '_order'])
-    # 추가: 시트에서 온 값을 안전하게 숫자로 변환 (쉼표 제거 + 빈값 처리)
-    for col in ['Qty', 'Price', 'Fee', 'Exchange_Rate']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-    # 추가: 환율이 0인 매수 기록은 세금 계산에서 제외 (거짓 폭탄 방지)
-    df = df[~((df['Action'] == 'BUY') & (df['Exchange_Rate'] <= 0))]
+    # 봇·백테스트와 같은 규칙 (aegis_core) — 화면에서는 튜플로 풀어 쓴다
+    t = core_target_ratios(vix, q_rsi, s_rsi)
+    return t['QQQM'], t['SPYM'], t['SGOV'], t['QLD'], t['mode']
+
+# 장부 숫자는 ledger.run_ledger가 두 시트를 한 번 순회해서 만든다. 아래 함수들은 화면이 쓰는 모양으로 꺼내 주기만 한다.
+def calculate_wallet_balance_detail(lg):
+    return {'KRW': lg['krw'], 'USD': lg['usd'], 'Net_Principal': lg['net_principal'],
+            'Detail_USD_In': lg['usd_in'], 'Detail_USD_Out': lg['usd_out'], 'Stock_Log': lg['stock_log']}
+
+def calculate_tax_guard(lg):
     kst = pytz.timezone('Asia/Seoul')
-    holdings = {}; current_year = datetime.now(kst).year; realized_profit_krw = 0; tax_log = []
-    for _, row in df.iterrows():
-        ticker = row['Ticker']; qty = row['Qty']; price = row['Price']; fee = row['Fee']; rate = row['Exchange_Rate']
-        if ticker not in holdings: holdings[ticker] = {'qty': 0, 'total_cost_krw': 0}
-        if row['Action'] == 'BUY':
-            cost_krw = (qty * price * rate) + (fee * rate)
-            holdings[ticker]['qty'] += qty; holdings[ticker]['total_cost_krw'] += cost_krw
-        elif row['Action'] == 'SELL':
-            if holdings[ticker]['qty'] > 0:
-                avg_buy_price_krw = holdings[ticker]['total_cost_krw'] / holdings[ticker]['qty']
-                sell_revenue_krw = (qty * price * rate) - (fee * rate)
-                buy_cost_krw = avg_buy_price_krw * qty
-                profit = sell_revenue_krw - buy_cost_krw
-                holdings[ticker]['qty'] -= qty; holdings[ticker]['total_cost_krw'] -= buy_cost_krw
-                if row['Date'].year == current_year:
-                    realized_profit_krw += profit; tax_log.append(f"{row['Date'].strftime('%Y-%m-%d')} {ticker} 매도: {int(profit):,}원 (수익)")
-    return {'realized_profit': realized_profit_krw, 'tax_estimated': max(0, realized_profit_krw - 2500000) * 0.22, 
-            'remaining_allowance': max(0, 2500000 - realized_profit_krw), 'log': tax_log}
-
-def calculate_tax_loss_harvest(df_stock, krw_rate, realized_profit):
+    return ledger.tax_summary(lg, datetime.now(kst).year)
+
+def calculate_tax_loss_harvest(lg, krw_rate, realized_profit):
     # 보유 종목별 '미실현 손익(원화)'을 계산해서, 절세용 손실 수확 후보를 찾는다
     result = {'candidates': [], 'total_loss': 0, 'over_threshold': 0, 'tax_saveable': 0}
-    if df_stock.empty:
-        return result
-
-    df = df_stock.copy()
-    df['Date'] = pd.to_datetime(df['Date'])
-    # 추가: 같은 날짜면 BUY(매수)를 먼저 처리하도록 정렬 (원가 꼬임 방지)
-    df['_order'] = df['Action'].apply(lambda x: 0 if x == 'BUY' else 1)
-    df = df.sort_values(by=['Date', '_order'])
-    for col in ['Qty', 'Price', 'Fee', 'Exchange_Rate']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-    # 세금 계산과 동일하게, 환율 0짜리 매수는 제외 (거짓 원가 방지)
-    df = df[~((df['Action'] == 'BUY') & (df['Exchange_Rate'] <= 0))]
-
-    # 종목별로 '지금 남아있는 주식의 원화 매입원가'를 추적
-    holdings = {}
-    for _, row in df.iterrows():
-        t = row['Ticker']
-        if t not in holdings: holdings[t] = {'qty': 0, 'cost_krw': 0}
-        if row['Action'] == 'BUY':
-            holdings[t]['qty'] += row['Qty']
-            holdings[t]['cost_krw'] += (row['Qty'] * row['Price'] * row['Exchange_Rate']) + (row['Fee'] * row['Exchange_Rate'])
-        elif row['Action'] == 'SELL':
-            if holdings[t]['qty'] > 0:
-                avg = holdings[t]['cost_krw'] / holdings[t]['qty']
-                holdings[t]['qty'] -= row['Qty']
-                holdings[t]['cost_krw'] -= avg * row['Qty']
+    # 종목별 '지금 남아있는 주식의 원화 매입원가' (세금 계산과 같은 이동평균, 장부 엔진이 추적)
+    holdings = lg['cost_basis']
 
     # 지금 들고 있는 종목 중 '평가손실'인 것만 추려냄
     for t, h in holdings.items():
@@ -262,149 +157,177 @@ def calculate_tax_loss_harvest(df_stock, krw_rate, realized_profit):
     result['tax_saveable'] = offsettable * 0.22
     return result
 
-def calculate_dividend_analytics(df_stock):
-    if df_stock.empty: return pd.DataFrame(), 0.0
-    df_div = df_stock[df_stock['Action'] == 'DIVIDEND'].copy()
-    if df_div.empty: return pd.DataFrame(), 0.0
-    df_div['Net_Dividend'] = df_div['Price'] - df_div['Fee']
-    df_div['Date'] = pd.to_datetime(df_div['Date'])
-    df_div['Month'] = df_div['Date'].dt.strftime('%Y-%m')
-    monthly_div = df_div.groupby('Month')['Net_Dividend'].sum().reset_index()
-    total_div = df_div['Net_Dividend'].sum()
-    return monthly_div, total_div
-
-def log_cash_flow(date, type_, krw, usd, rate):
+def calculate_dividend_analytics(lg):
+    if not lg['div_by_month']: return pd.DataFrame(), 0.0
+    monthly_div = pd.DataFrame(sorted(lg['div_by_month'].items()), columns=['Month', 'Net_Dividend'])
+    return monthly_div, lg['total_div']
+
+# 📝 시트 읽기/쓰기: 로컬 SQLite 사본(sheet_mirror)을 거친다. 시트가 바뀌었을 때만 전체를 다시 받고,
+# 쓰기는 새 줄만 시트 끝에 append 한 뒤 사본에도 반영 (세션당 한 번 워크시트/헤더를 잡아둠)
+STOCK_COLS, CASH_COLS = sheet_mirror.STOCK_COLS, sheet_mirror.CASH_COLS
+
+def open_sheet_source():
+    # 시트에 처음 닿을 때만 불린다 (gspread·구글 인증 포함). 서비스 계정이면 봇처럼 gspread로 직접 열어
+    # 새 줄만 append, 아니면 gsheets 연결의 read/update로 (쓰기는 시트를 통째로 다시 쓴다)
+    info = dict(st.secrets.get("connections", {}).get("gsheets", {}))
+    if info.get("type") == "service_account":
+        import gspread
+        creds = {k: v for k, v in info.items() if k not in ("spreadsheet", "worksheet")}
+        return sheet_mirror.GSheetSource(gspread.service_account_from_dict(creds).open_by_url(SHEET_URL))
+    from streamlit_gsheets import GSheetsConnection
+    return sheet_mirror.ConnSheetSource(st.connection("gsheets", type=GSheetsConnection), SHEET_URL)
+
+def get_mirror():
+    if "_sheet_mirror" not in st.session_state:
+        source = sheet_mirror.source_from_env(sheet_url=SHEET_URL, open_source=open_sheet_source)
+        st.session_state["_sheet_mirror"] = sheet_mirror.SheetMirror(source)
+    return st.session_state["_sheet_mirror"]
+
+def append_sheet_rows(name, rows, cols):
+    return get_mirror().append(name, rows, cols)
+
+# 🗂️ 세션 장부: 시트 두 장(사본에서 읽은 그대로)과 거기서 나온 계산 결과를 세션에 들고 있는다.
+# 이 앱에서 기록·삭제하면 시트에 쓴 것과 같은 변경을 세션 사본에도 바로 반영하고, 그 시트에 기대는 결과만 다시 계산한다.
+# 시트 전체를 다시 읽는 건 '🔄 시트 새로고침'을 눌렀을 때와, SHEET_CHECK_SECONDS마다 하는 신선도 확인에서
+# 다른 곳(봇·다른 기기)의 수정이 보였을 때뿐이다.
+SHEET_CHECK_SECONDS = float(os.environ.get('AEGIS_SHEET_CHECK_SECONDS', 60))
+
+def get_book():
+    return st.session_state.setdefault("_ledger_book", {"raw": None, "gen": {"Sheet1": 0, "CashFlow": 0},
+                                                        "checked": 0.0, "derived": {}})
+
+def _book_changed(*names):
+    book = get_book()
+    for n in names: book["gen"][n] += 1
+
+def reload_book(force=False):
+    """다음 실행 때 시트를 다시 확인하고 사본에서 전부 다시 읽게 한다 (쓰기 도중 다른 곳의 수정).
+    force면 신선도 표시와 상관없이 시트 전체를 다시 받는다 (새로고침 버튼)"""
+    book = get_book()
+    book["raw"] = None
+    if force: book["force"] = True
+
+def derived(name, deps, fn, *extra):
+    """deps 시트(와 extra)가 그대로면 지난번 결과를 돌려주고, 바뀌었을 때만 fn()을 다시 부른다"""
+    book = get_book()
+    key = tuple(book["gen"][d] for d in deps) + extra
+    hit = book["derived"].get(name)
+    if hit is None or hit[0] != key:
+        hit = (key, fn()); book["derived"][name] = hit
+    return hit[1]
+
+def load_book():
+    """세션 장부의 (주식 시트, CashFlow) 원본 프레임. 처음이거나 확인 주기가 지났으면 시트 신선도를 확인한다"""
+    book = get_book()
+    if book["raw"] is not None and time.time() - book["checked"] < SHEET_CHECK_SECONDS: return book["raw"]
+    mirror = None   # 시트와 맞춰졌을 때만 채움 (빈 시트 만들기 = 덮어쓰기라서)
     try:
-        df = conn.read(spreadsheet=SHEET_URL, worksheet="CashFlow", ttl=0)
-        if 'Type' not in df.columns: df = pd.DataFrame(columns=["Date", "Type", "Amount_KRW", "Amount_USD", "Ex_Rate"])
-        date_str = date.strftime("%Y-%m-%d")
-        new_row = pd.DataFrame([{"Date": date_str, "Type": type_, "Amount_KRW": krw, "Amount_USD": usd, "Ex_Rate": rate}])
-        conn.update(spreadsheet=SHEET_URL, worksheet="CashFlow", data=pd.concat([df, new_row], ignore_index=True))
-    except: st.error("CashFlow 오류")
-
-def log_stock_trade(date, ticker, action, qty, price, rate, fee):
+        _m = get_mirror()
+        try: changed = _m.sync(force=book.pop("force", False)); mirror = _m; book["checked"] = time.time()
+        except Exception:
+            st.warning("⚠️ 구글 시트에 연결하지 못해 마지막 로컬 사본을 보여줍니다.")
+            changed = False
+        if book["raw"] is not None and not changed: return book["raw"]
+        raw = {"Sheet1": _m.frame("Sheet1"), "CashFlow": _m.frame("CashFlow")}
+    except Exception:
+        st.warning("⚠️ 구글 시트와 로컬 사본을 모두 읽지 못했습니다. 잔고가 0으로 보일 수 있습니다.")
+        raw = {"Sheet1": pd.DataFrame(), "CashFlow": pd.DataFrame()}
+    # 빈 시트면 헤더만 있는 시트로 만들어 둔다
+    for name, key, cols in (("Sheet1", "Date", STOCK_COLS), ("CashFlow", "Type", CASH_COLS)):
+        if key not in raw[name].columns:
+            raw[name] = pd.DataFrame(columns=cols)
+            if mirror is not None: mirror.rewrite(name, raw[name])
+    book["raw"] = raw
+    _book_changed("Sheet1", "CashFlow")
+    return raw
+
+def book_append(name, rows, cols, fresh):
+    """시트에 붙인 rows를 세션 사본 끝에도 붙인다 (사본이 시트와 어긋났으면 다음 실행에 전부 다시 읽기)"""
+    book = get_book()
+    if not fresh or book["raw"] is None: reload_book(); return
+    df = book["raw"][name]
+    header = list(df.columns) or list(cols)
+    new = pd.DataFrame([[r.get(h, "") for h in header] for r in rows], columns=header)
+    book["raw"][name] = pd.concat([df, new], ignore_index=True) if len(df) else new
+    _book_changed(name)
+
+def book_replace(name, df, fresh):
+    book = get_book()
+    if not fresh or book["raw"] is None: reload_book(); return
+    book["raw"][name] = df.reset_index(drop=True)
+    _book_changed(name)
+
+def clean_stock(df):
     try:
-        sheet_name = "Sheet1"
-        try: conn.read(spreadsheet=SHEET_URL, worksheet="Sheet1", ttl=0, usecols=[0])
-        except: sheet_name = "시트1"
-        df = conn.read(spreadsheet=SHEET_URL, worksheet=sheet_name, ttl=0)
-        date_str = date.strftime("%Y-%m-%d")
-        new_row = pd.DataFrame([{"Date": date_str, "Ticker": ticker, "Action": action, "Qty": qty, "Price": price, "Exchange_Rate": rate, "Fee": fee}])
-        conn.update(spreadsheet=SHEET_URL, worksheet=sheet_name, data=pd.concat([df, new_row], ignore_index=True))
-    except: st.error("시트 오류")
+        df = df.fillna(0)
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime("%Y-%m-%d")
+        return df.sort_values(by="Date", ascending=False)
+    except: return pd.DataFrame(columns=STOCK_COLS)
 
-def delete_data_by_date(target_date_str):
+def clean_cash(df):
     try:
-        sheet_name = "Sheet1"
-        try: conn.read(spreadsheet=SHEET_URL, worksheet="Sheet1", ttl=0, usecols=[0])
-        except: sheet_name = "시트1"
-        df_s = conn.read(spreadsheet=SHEET_URL, worksheet=sheet_name, ttl=0)
-        if not df_s.empty and 'Date' in df_s.columns:
-            df_s['Date'] = df_s['Date'].astype(str); df_s = df_s[df_s['Date'] != target_date_str]
-            conn.update(spreadsheet=SHEET_URL, worksheet=sheet_name, data=df_s)
-        df_c = conn.read(spreadsheet=SHEET_URL, worksheet="CashFlow", ttl=0)
-        if not df_c.empty and 'Date' in df_c.columns:
-            df_c['Date'] = df_c['Date'].astype(str); df_c = df_c[df_c['Date'] != target_date_str]
-            conn.update(spreadsheet=SHEET_URL, worksheet="CashFlow", data=df_c)
-        return True
-    except: return False
-
-def calculate_history(df_stock, df_cash):
-    if df_stock.empty and df_cash.empty: return pd.DataFrame()
-    dates = []
-    if not df_stock.empty and 'Date' in df_stock.columns: dates.append(pd.to_datetime(df_stock['Date']).min())
-    if not df_cash.empty and 'Date' in df_cash.columns: dates.append(pd.to_datetime(df_cash['Date']).min())
-    if not dates: return pd.DataFrame()
-    start_date = min(dates); end_date = datetime.today(); date_range = pd.date_range(start=start_date, end=end_date)
-    history = []; cum_cash_krw = 0; cum_cash_usd = 0; cum_invested_krw = 0; cum_stock_qty = {'SGOV':0, 'SPYM':0, 'QQQM':0, 'QLD':0, 'GMMF':0}
-    df_s = df_stock.copy()
-    if not df_s.empty:
-        df_s['Date'] = pd.to_datetime(df_s['Date'])
-        for col in ['Qty', 'Price', 'Fee']: df_s[col] = pd.to_numeric(df_s[col], errors='coerce').fillna(0)
-    df_c = df_cash.copy()
-    if not df_c.empty:
-        df_c['Date'] = pd.to_datetime(df_c['Date'])
-        for col in ['Amount_KRW', 'Amount_USD']: df_c[col] = pd.to_numeric(df_c[col], errors='coerce').fillna(0)
-    for d in date_range:
-        if not df_c.empty:
-            day_cash = df_c[df_c['Date'] == d]
-            for _, row in day_cash.iterrows():
-                if row['Type'] == 'Deposit': cum_cash_krw += row['Amount_KRW']; cum_invested_krw += row['Amount_KRW']
-                elif row['Type'] == 'Withdraw': cum_cash_krw -= row['Amount_KRW']; cum_invested_krw -= row['Amount_KRW']
-                elif row['Type'] == 'Exchange': cum_cash_krw -= row['Amount_KRW']; cum_cash_usd += row['Amount_USD']
-                elif row['Type'] == 'Exchange_USD_to_KRW': cum_cash_krw += row['Amount_KRW']; cum_cash_usd -= row['Amount_USD']
-        if not df_s.empty:
-            day_stock = df_s[df_s['Date'] == d]
-            for _, row in day_stock.iterrows():
-                cost = (row['Qty'] * row['Price']) + row['Fee']
-                if row['Action'] == 'BUY': cum_cash_usd -= cost; cum_stock_qty[row['Ticker']] += row['Qty']
-                elif row['Action'] == 'SELL': net_gain = (row['Qty'] * row['Price']) - row['Fee']; cum_cash_usd += net_gain; cum_stock_qty[row['Ticker']] -= row['Qty']
-                elif row['Action'] == 'DIVIDEND': net_div = row['Price'] - row['Fee']; cum_cash_usd += net_div
-        history.append({"Date": d, "Total_Invested": cum_invested_krw, "Cash_KRW": cum_cash_krw, "Cash_USD": cum_cash_usd, 
-                        "Stock_SGOV": cum_stock_qty.get('SGOV',0), "Stock_QQQM": cum_stock_qty.get('QQQM',0), "Stock_SPYM": cum_stock_qty.get('SPYM',0), "Stock_QLD": cum_stock_qty.get('QLD',0), "Stock_GMMF": cum_stock_qty.get('GMMF',0)})
-    return pd.DataFrame(history)
-
-# 🔥 [방안 C 적용] 최신 V26.5 마스터 스코어 
-def calculate_aegis_master_score(ticker, current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, target_weight, current_weight, my_krw, sim_day=None):
-    score = 0.0
-    
-    score_A = 0
-    if rsi < 50:
-        if vix >= 18: 
-            score_A += (50 - rsi) * 1.5
+        df = df.fillna(0)
+        df['Date'] = pd.to_datetime(df['Date']).dt.strftime("%Y-%m-%d")
+        return df
+    except: return pd.DataFrame(columns=CASH_COLS)
+
+# 🧺 거래 대기열: 폼 입력은 세션에 쌓아두고, '일괄 기록' 한 번에 시트별 append 1회 + 새로고침 1회
+def get_queue():
+    return st.session_state.setdefault("trade_queue", [])
+
+def queue_cash(date, type_, krw, usd, rate):
+    get_queue().append(("CashFlow", {"Date": date.strftime("%Y-%m-%d"), "Type": type_, "Amount_KRW": krw, "Amount_USD": usd, "Ex_Rate": rate}))
+
+def queue_stock(date, ticker, action, qty, price, rate, fee):
+    get_queue().append(("Sheet1", {"Date": date.strftime("%Y-%m-%d"), "Ticker": ticker, "Action": action, "Qty": qty, "Price": price, "Exchange_Rate": rate, "Fee": fee}))
+
+def queue_balance(wallet, holdings):
+    """대기열을 순서대로 반영한 (KRW, USD, 보유수량) - 장부 엔진과 같은 규칙. 폼 검증은 이 값 기준"""
+    krw, usd, held = wallet['KRW'], wallet['USD'], dict(holdings)
+    for sheet, r in get_queue():
+        if sheet == "CashFlow":
+            kind = r['Type']
+            if kind == 'Deposit': krw += r['Amount_KRW']
+            elif kind == 'Withdraw': krw -= r['Amount_KRW']
+            elif kind == 'Exchange': krw -= r['Amount_KRW']; usd += r['Amount_USD']
+            elif kind == 'Exchange_USD_to_KRW': krw += r['Amount_KRW']; usd -= r['Amount_USD']
         else:
-            pass 
-
-    if vix > 20: score_A += (vix - 20) * 1.0
-    if current_price < ma200: score_A += 20
-    score += min(score_A, 60)
-    
-    score_B = 0
-    gap = target_weight - current_weight
-    if gap > 5.0:  
-        score_B += (gap - 5.0) * 2.5
-    score += min(score_B, 30)
-    
-    score_C = 0
-    kst = pytz.timezone('Asia/Seoul')
-    today = sim_day if sim_day is not None else datetime.now(kst).day
-    days_passed = (today - 5) if today >= 5 else (today + 30 - 5)
-    
-    if my_krw >= 100000:
-        # 현금이 많을수록 하루당 점수가 부드럽게 증가 (60만원에서 최대 1.8)
-        rate_per_day = 0.8 + min(1.0, (my_krw - 100000) / 500000) * 1.0
-        score_C = days_passed * rate_per_day
-        
-    score += min(score_C, 50)
-    
-    score_D = 0
-    blended_base_rate = (my_avg_rate * 0.15) + (krw_ma60 * 0.85)
-
-    if curr_rate > blended_base_rate:
-        score_D += (curr_rate - blended_base_rate) * 0.5
-
-    if dxy_curr > dxy_ma20:
-        score_D = score_D * 0.5
-
-    score -= min(score_D, 50)
-
-    # 🔥 Score F: 저환율 보너스 (상한 15점)
-    score_F = 0
-    if curr_rate < blended_base_rate:
-        score_F = min((blended_base_rate - curr_rate) * 0.25, 15)
-    score += score_F
-
-    # 🔥 Score E: 과열 페널티 (비싼 장에서 줍줍 방지)
-    # RSI가 낮은 폭락장에서는 0이라, 공포매수는 그대로 살아있음
-    score_E = 0
-    if rsi > 55:
-        score_E += (rsi - 55) * 1.2          # 예: RSI 70 → (70-55)*1.2 = 18점 차감
-    if current_price > ma200 * 1.10:          # 현재가가 200일선보다 10% 이상 위
-        score_E += 15
-    score -= score_E
+            t, q, p, fee = r['Ticker'], r['Qty'], r['Price'], r['Fee']
+            if r['Action'] == 'BUY': usd -= (q * p) + fee; held[t] = held.get(t, 0.0) + q
+            elif r['Action'] == 'SELL': usd += (q * p) - fee; held[t] = held.get(t, 0.0) - q
+            elif r['Action'] == 'DIVIDEND': usd += p - fee
+    return krw, usd, held
+
+def commit_queue():
+    """시트별로 모아서 append. 실패하면 아직 안 올라간 줄은 대기열에 남긴다"""
+    q = get_queue()
+    for sheet, cols, err in (("CashFlow", CASH_COLS, "CashFlow 오류"), ("Sheet1", STOCK_COLS, "시트 오류")):
+        rows = [r for s_, r in q if s_ == sheet]
+        if not rows: continue
+        try: fresh = append_sheet_rows(sheet, rows, cols)
+        except:
+            st.error(err); return False
+        book_append(sheet, rows, cols, fresh)
+        q[:] = [x for x in q if x[0] != sheet]
+    return True
 
-    return score
+def delete_data_by_date(target_date_str):
+    try:
+        mirror = get_mirror()
+        if mirror.sync(): reload_book()   # 지운 결과를 세션에 반영하기 전에, 다른 곳의 수정을 받았으면 통째로 다시
+        for name in ("Sheet1", "CashFlow"):
+            df = mirror.frame(name)
+            if not df.empty and 'Date' in df.columns:
+                # 시트에 날짜가 '2024-01-05' 글자 그대로일 수도, 날짜 값일 수도 있어서 정규화해서 비교
+                d = pd.to_datetime(df['Date'], errors='coerce').dt.strftime("%Y-%m-%d").fillna(df['Date'].astype(str))
+                if (d == target_date_str).any():
+                    kept = df[d != target_date_str]
+                    book_replace(name, kept, mirror.rewrite(name, kept))
+        return True
+    except: reload_book(); return False
 
+def calculate_history(lg):
+    return ledger.daily_history(lg)
 
 # ==========================================
 # 🧪 백테스트 엔진
@@ -412,17 +335,29 @@ def calculate_aegis_master_score(ticker, current_price, rsi, vix, ma200, curr_ra
 @st.cache_data(ttl=3600, show_spinner=False)
 def bt_load(proxy, start, end):
     def _c(t):
-        s = yf.Ticker(t).history(start=start, end=end)['Close']
-        s.index = pd.to_datetime(s.index).tz_localize(None).normalize()
-        return s[~s.index.duplicated(keep='last')]
+        # 저장소가 날짜를 이미 tz 없는 일 단위로 정리해서 돌려준다
+        return price_store.get_history(t, start=start, end=end)['Close']
     df = pd.DataFrame({'P': _c(proxy), 'VIX': _c('^VIX'),
                        'FX': _c('KRW=X'), 'DXY': _c('DX-Y.NYB')}).ffill().dropna()
-    df['RSI'] = ta.momentum.RSIIndicator(df['P'], window=14).rsi()
-    df['MA200'] = df['P'].rolling(200, min_periods=60).mean()
-    df['FX_MA60'] = df['FX'].rolling(60, min_periods=20).mean()
-    df['DXY_MA20'] = df['DXY'].rolling(20, min_periods=5).mean()
+    df['RSI'] = indicators.rsi_wilder(df['P'], 14)
+    df['MA200'] = indicators.sma(df['P'], 200, min_periods=60)
+    df['FX_MA60'] = indicators.sma(df['FX'], 60, min_periods=20)
+    df['DXY_MA20'] = indicators.sma(df['DXY'], 20, min_periods=5)
     return df.dropna()
 
+# 포트폴리오 엔진용 장기 대용 종목 (QQQM·SPYM·SGOV는 상장이 짧아 같은 지수를 따르는 형님 ETF로 대신)
+BT_PF_PROXY = {'QQQM': 'QQQ', 'SPYM': 'SPY', 'QLD': 'QLD', 'SGOV': 'BIL'}
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def bt_portfolio_load(start, end, use_proxy=True):
+    # 200일선·RSI가 첫날부터 의미 있도록 1년 앞에서부터 받고, 지표를 붙인 뒤 잘라낸다
+    warm = (pd.Timestamp(start) - pd.DateOffset(years=1)).strftime('%Y-%m-%d')
+    src = {t: (BT_PF_PROXY[t] if use_proxy else t) for t in PF_TICKERS}
+    src.update({'^VIX': '^VIX', 'KRW=X': 'KRW=X', 'DX-Y.NYB': 'DX-Y.NYB'})
+    closes = pd.DataFrame({k: price_store.get_history(t, start=warm, end=end)['Close'] for k, t in src.items()})
+    df = bt_portfolio_prepare(closes)
+    return df[df.index >= pd.Timestamp(start)]
+
 def bt_parse_schedule(text):
     sched = {}
     for line in text.strip().splitlines():
@@ -434,89 +369,21 @@ def bt_parse_schedule(text):
         except: continue
     return sched
 
-def bt_run(df, sched, threshold, spread, target_w, panic_dd=0.20):
-    inject = {}
-    for ym, amt in sched.items():
-        if amt <= 0: continue
-        try: t = pd.Timestamp(ym + '-05')
-        except: continue
-        fut = df.index[df.index >= t]
-        if len(fut): inject[fut[0]] = inject.get(fut[0], 0) + amt
-
-    def blank():
-        return {'krw':0.0,'sh':0.0,'ex_krw':0.0,'ex_usd':0.0,'buys':0,
-                'tot_in':0.0,'dip_in':0.0,'panic':0,'halted':False,'resume_px':0.0}
-    A, B, C = blank(), blank(), blank()
-    hist, idle_days, total_days, peakC = [], 0, 0, 0.0
-
-    def deploy(P, rate, price, vix):
-        if P['krw'] <= 0: return
-        amt = P['krw']
-        usd = amt / (rate * (1 + spread))
-        P['ex_krw'] += amt; P['ex_usd'] += usd
-        P['tot_in'] += amt
-        if vix >= 25: P['dip_in'] += amt
-        P['sh'] += usd / price
-        P['krw'] = 0.0; P['buys'] += 1
-
-    for d, r in df.iterrows():
-        if d in inject:
-            for P in (A, B, C): P['krw'] += inject[d]
-
-        # 전략A: 들어온 날 즉시 전량 매수
-        deploy(A, r['FX'], r['P'], r['VIX'])
-
-        # 전략B: Aegis 점수가 임계점을 넘을 때만 매수
-        if B['krw'] > 0:
-            my_avg = (B['ex_krw']/B['ex_usd']) if B['ex_usd'] > 0 else r['FX']
-            b_stock = B['sh'] * r['P'] * r['FX']
-            b_tot = b_stock + B['krw']
-            cur_w = (b_stock / b_tot * 100) if b_tot > 0 else 0.0
-            sc = calculate_aegis_master_score(
-                'BT', r['P'], r['RSI'], r['VIX'], r['MA200'], r['FX'], my_avg,
-                r['FX_MA60'], r['DXY'], r['DXY_MA20'],
-                target_w, cur_w, B['krw'], sim_day=int(d.day))
-            if sc >= threshold:
-                deploy(B, r['FX'], r['P'], r['VIX'])
-
-        # 전략C: 규칙 없는 인간 — 고점 대비 크게 빠지면 공포 매도, 회복하면 재진입
-        if not C['halted']:
-            deploy(C, r['FX'], r['P'], r['VIX'])
-            eqC = C['sh']*r['P']*r['FX'] + C['krw']
-            peakC = max(peakC, eqC)
-            if C['sh'] > 0 and peakC > 0 and eqC < peakC * (1 - panic_dd):
-                C['krw'] += C['sh'] * r['P'] * r['FX'] * (1 - spread)
-                C['sh'] = 0.0; C['halted'] = True
-                C['resume_px'] = r['P']; C['panic'] += 1
-                C['ex_krw'] = 0.0; C['ex_usd'] = 0.0
-        else:
-            if r['P'] >= C['resume_px']:
-                C['halted'] = False
-                deploy(C, r['FX'], r['P'], r['VIX'])
-            peakC = max(peakC, C['sh']*r['P']*r['FX'] + C['krw'])
-
-        total_days += 1
-        if B['krw'] > 0: idle_days += 1
-        hist.append({'Date': d,
-                     'A': A['sh']*r['P']*r['FX'] + A['krw'],
-                     'B': B['sh']*r['P']*r['FX'] + B['krw'],
-                     'C': C['sh']*r['P']*r['FX'] + C['krw']})
-
-    h = pd.DataFrame(hist).set_index('Date')
-    paid = sum(inject.values())
-
-    def stats(P, col):
-        eq = h[col]; cm = eq.cummax()
-        mdd = ((eq - cm) / cm.where(cm > 0)).min()
-        return {'최종 평가액': eq.iloc[-1],
-                '수익률(%)': (eq.iloc[-1]/paid - 1)*100 if paid else 0,
-                '평균 환율': (P['ex_krw']/P['ex_usd']) if P['ex_usd'] else 0,
-                '매수 횟수': P['buys'],
-                '폭락장 매수 비중(%)': (P['dip_in']/P['tot_in']*100) if P['tot_in'] else 0,
-                'MDD(%)': (mdd*100) if pd.notna(mdd) else 0}
-
-    return (h, paid, stats(A,'A'), stats(B,'B'), stats(C,'C'),
-            (idle_days/total_days*100 if total_days else 0), C['panic'])
+def bt_monthly_deposits(df_cash):
+    """CashFlow의 입금−출금을 월별로 합친 {Period: 원} (순입금이 양수인 달만)"""
+    dep = {}
+    if not df_cash.empty and 'Type' in df_cash.columns:
+        _d = df_cash[df_cash['Type'].isin(['Deposit', 'Withdraw'])].copy()
+        if not _d.empty:
+            _d['Date'] = pd.to_datetime(_d['Date'], errors='coerce')
+            _d['Amount_KRW'] = pd.to_numeric(
+                _d['Amount_KRW'].astype(str).str.replace(',', ''),
+                errors='coerce').fillna(0)
+            _d = _d.dropna(subset=['Date'])
+            _d['Signed'] = _d['Amount_KRW'].where(_d['Type'] == 'Deposit', -_d['Amount_KRW'])
+            g = _d.groupby(_d['Date'].dt.to_period('M'))['Signed'].sum()
+            dep = {p: float(v) for p, v in g.items() if v > 0}
+    return dep
 
 # ==========================================
 # 📖 가이드 팝업 (Strategy Guide Dialog)
@@ -617,40 +484,18 @@ with st.expander("📖 Aegis Master Score 작동 원리 (Introduction)"):
     * **🎯 전술적 타격대(QLD):** 평소엔 방어(SGOV)하다가, 진성 폭락장(VIX 25↑)에만 위성 자금(20%)으로 2배 레버리지를 공격적으로 줍줍합니다.
     """)
 
-sheet_name = "Sheet1"
-try: conn.read(spreadsheet=SHEET_URL, worksheet="Sheet1", ttl=0, usecols=[0])
-except: sheet_name = "시트1"
-
-try:
-    df_stock = conn.read(spreadsheet=SHEET_URL, worksheet=sheet_name, ttl=0).fillna(0)
-    if 'Date' not in df_stock.columns:
-        empty_stock = pd.DataFrame(columns=["Date", "Ticker", "Action", "Qty", "Price", "Exchange_Rate", "Fee"])
-        conn.update(spreadsheet=SHEET_URL, worksheet=sheet_name, data=empty_stock)
-        df_stock = empty_stock
-    else:
-        df_stock['Date'] = pd.to_datetime(df_stock['Date']).dt.strftime("%Y-%m-%d")
-        df_stock = df_stock.sort_values(by="Date", ascending=False)
-except: 
-    df_stock = pd.DataFrame(columns=["Date", "Ticker", "Action", "Qty", "Price", "Exchange_Rate", "Fee"])
-
-try:
-    df_cash = conn.read(spreadsheet=SHEET_URL, worksheet="CashFlow", ttl=0).fillna(0)
-    if 'Type' not in df_cash.columns:
-        empty_cash = pd.DataFrame(columns=["Date", "Type", "Amount_KRW", "Amount_USD", "Ex_Rate"])
-        conn.update(spreadsheet=SHEET_URL, worksheet="CashFlow", data=empty_cash)
-        df_cash = empty_cash
-    else: df_cash['Date'] = pd.to_datetime(df_cash['Date']).dt.strftime("%Y-%m-%d")
-except: 
-    df_cash = pd.DataFrame(columns=["Date", "Type", "Amount_KRW", "Amount_USD", "Ex_Rate"])
-
-my_avg_exchange = calculate_my_avg_exchange_rate(df_cash, df_stock)
-wallet_data = calculate_wallet_balance_detail(df_stock, df_cash)
-tax_info = calculate_tax_guard(df_stock)
+raw = load_book()
+df_stock = derived("stock", ("Sheet1",), lambda: clean_stock(raw["Sheet1"]))
+df_cash = derived("cash", ("CashFlow",), lambda: clean_cash(raw["CashFlow"]))
+# 시트가 바뀌었을 때만, 그것도 새로 붙은 줄만 이어서 계산
+ledger_data = derived("ledger", ("Sheet1", "CashFlow"),
+                      lambda: ledger.run_ledger(df_stock, df_cash, checkpoint=ledger.CHECKPOINT_PATH))
+my_avg_exchange = ledger_data['avg_fx']
+wallet_data = calculate_wallet_balance_detail(ledger_data)
 try:
     krw_rate = get_usd_krw()
 except Exception:
     krw_rate = 1450.0   # 실패해도 화면은 떠야 하므로 임시값, 단 캐시엔 저장 안 됨
-monthly_div, total_div_all = calculate_dividend_analytics(df_stock)
 
 vix_val, vix_hist = get_vix_data()
 q_price, q_rsi, q_hist = get_market_analysis("QQQM")
@@ -658,7 +503,6 @@ s_price, s_rsi, s_hist = get_market_analysis("SPYM")
 
 # 🔥 시각화 버그 해결 1: QLD 데이터 별도 로드
 qld_price, qld_rsi, qld_hist = get_market_analysis("QLD") 
-gov_price = get_current_price("SGOV")
 
 # ==========================================
 # 4. 사이드바
@@ -690,127 +534,148 @@ with st.sidebar.expander("🎯 포트폴리오 목표 설정", expanded=True):
     else: st.success("합계: 100%")
 
 st.sidebar.markdown("---")
-mode = st.sidebar.radio("작업 선택", ["주식 거래", "입금/환전", "역환전/출금", "🗑️ 데이터 관리"], horizontal=True)
-
-if mode == "입금/환전":
-    st.sidebar.subheader("💱 입금 및 환전")
-    act_type = st.sidebar.selectbox("종류", ["원화 입금 (Deposit)", "달러 환전 (Exchange)"])
-    with st.sidebar.form("cash_form"):
-        kst = pytz.timezone('Asia/Seoul')
-        date = st.date_input("날짜", datetime.now(kst).date())
-        label_amt = "입금할 원화 금액" if "Deposit" in act_type else "환전에 쓴 원화 금액"
-        amount_krw = st.number_input(label_amt, step=10000)
-        ex_rate_in = krw_rate
-        if "Exchange" in act_type:
-            ex_rate_in = st.number_input("적용 환율", value=krw_rate, format="%.2f")
-            if ex_rate_in > 0: st.caption(f"💵 예상 획득: ${amount_krw / ex_rate_in:.2f}")
-        if st.form_submit_button("실행"):
-            if "Deposit" in act_type:
-                log_cash_flow(date, "Deposit", amount_krw, 0, 0)
-                st.success("💰 입금 완료!")
-            else:
-                if wallet_data['KRW'] >= amount_krw:
-                    usd_out = amount_krw / ex_rate_in
-                    log_cash_flow(date, "Exchange", amount_krw, usd_out, ex_rate_in)
-                    st.success("💱 환전 완료!")
-                else: st.error("❌ 잔고 부족!")
-            time.sleep(1); st.rerun()
-
-elif mode == "역환전/출금":
-    st.sidebar.subheader("📤 자금 회수 (Exit)")
-    act_type = st.sidebar.selectbox("종류", ["역환전 (달러→원화)", "출금 (내 통장으로)"])
-    
-    if act_type == "역환전 (달러→원화)":
-        if my_avg_exchange > 0:
-            diff = krw_rate - my_avg_exchange
-            pct = (diff / my_avg_exchange) * 100
-            st.sidebar.metric("💵 환차익 예상", f"{krw_rate:,.0f}원", f"{diff:+.0f}원 ({pct:+.2f}%)", delta_color="normal")
-            if diff > 0: st.sidebar.caption("✅ 지금 바꾸면 환전 이득입니다!")
-            else: st.sidebar.caption("⚠️ 지금 바꾸면 환전 손해입니다.")
+# 입력 폼·대기열은 fragment라서, 작업 종류를 바꾸거나 폼을 대기열에 넣을 때는 사이드바의 이 부분만 다시 그린다.
+# 시트에 실제로 기록·삭제했을 때만 앱 전체를 다시 실행해 장부부터 새로 계산한다.
+@st.fragment
+def entry_panel(wallet_data, ledger_data, df_stock, df_cash):
+    mode = st.radio("작업 선택", ["주식 거래", "입금/환전", "역환전/출금", "🗑️ 데이터 관리"], horizontal=True)
+    q_krw, q_usd, q_held = queue_balance(wallet_data, ledger_data['holdings'])   # 대기열까지 반영한 잔고
+
+    if mode == "입금/환전":
+        st.subheader("💱 입금 및 환전")
+        act_type = st.selectbox("종류", ["원화 입금 (Deposit)", "달러 환전 (Exchange)"])
+        with st.form("cash_form"):
+            kst = pytz.timezone('Asia/Seoul')
+            date = st.date_input("날짜", datetime.now(kst).date())
+            label_amt = "입금할 원화 금액" if "Deposit" in act_type else "환전에 쓴 원화 금액"
+            amount_krw = st.number_input(label_amt, step=10000)
+            ex_rate_in = krw_rate
+            if "Exchange" in act_type:
+                ex_rate_in = st.number_input("적용 환율", value=krw_rate, format="%.2f")
+                if ex_rate_in > 0: st.caption(f"💵 예상 획득: ${amount_krw / ex_rate_in:.2f}")
+            if st.form_submit_button("대기열에 추가"):
+                if "Deposit" in act_type:
+                    queue_cash(date, "Deposit", amount_krw, 0, 0)
+                    st.success("💰 입금 대기")
+                else:
+                    if q_krw >= amount_krw:
+                        usd_out = amount_krw / ex_rate_in
+                        queue_cash(date, "Exchange", amount_krw, usd_out, ex_rate_in)
+                        st.success("💱 환전 대기")
+                    else: st.error("❌ 잔고 부족!")
+
+    elif mode == "역환전/출금":
+        st.subheader("📤 자금 회수 (Exit)")
+        act_type = st.selectbox("종류", ["역환전 (달러→원화)", "출금 (내 통장으로)"])
     
-    with st.sidebar.form("exit_form"):
-        kst = pytz.timezone('Asia/Seoul')
-        date = st.date_input("날짜", datetime.now(kst).date())
         if act_type == "역환전 (달러→원화)":
-            usd_amount = st.number_input("매도할 달러($)", step=10.0)
-            ex_rate_out = st.number_input("적용 환율", value=krw_rate, format="%.2f")
-            if ex_rate_out > 0: st.caption(f"🇰🇷 예상 입금: {int(usd_amount * ex_rate_out):,}원")
-            if st.form_submit_button("실행"):
-                if wallet_data['USD'] >= usd_amount:
-                    krw_out = usd_amount * ex_rate_out
-                    log_cash_flow(date, "Exchange_USD_to_KRW", krw_out, usd_amount, ex_rate_out)
-                    st.success("✅ 역환전 완료!"); time.sleep(1); st.rerun()
-                else: st.error("❌ 달러 잔고 부족")
-        else: 
-            krw_amount = st.number_input("출금할 원화(KRW)", step=10000)
-            if st.form_submit_button("실행"):
-                if wallet_data['KRW'] >= krw_amount:
-                    log_cash_flow(date, "Withdraw", krw_amount, 0, 0)
-                    st.success("💸 출금 기록 완료"); time.sleep(1); st.rerun()
-                else: st.error("❌ 원화 잔고 부족")
-
-elif mode == "주식 거래":
-    st.sidebar.subheader("📈 주식 매매 & 배당")
-    ticker = st.sidebar.selectbox("종목", ["SGOV", "SPYM", "QQQM", "QLD", "GMMF"])
-    action = st.sidebar.selectbox("유형", ["BUY", "SELL", "DIVIDEND"])
-    with st.sidebar.form("stock_form"):
-        kst = pytz.timezone('Asia/Seoul')
-        date = st.date_input("날짜", datetime.now(kst).date())
-        qty = 1.0
-        if action != "DIVIDEND": qty = st.number_input("수량 (Qty)", value=1.0, step=0.01)
-        price_label = "배당금 총액 ($)" if action == "DIVIDEND" else "체결 단가 ($)"
-        cur_p = 0.0
-        if action != "DIVIDEND": cur_p = get_current_price(ticker)
-        price = st.number_input(price_label, value=cur_p if cur_p>0 else 0.0, format="%.2f")
-        fee = st.number_input("수수료 ($)", value=0.0, format="%.2f")
-        rate = st.number_input("환율", value=krw_rate, format="%.2f")
-        if st.form_submit_button("기록하기"):
-            if action == "DIVIDEND": qty = 1.0 
-            cost = (qty * price) + fee
-            if action == "BUY":
-                if wallet_data['USD'] >= cost:
-                    log_stock_trade(date, ticker, action, qty, price, rate, fee)
-                    st.success("✅ 매수 완료"); time.sleep(1); st.rerun()
-                else: st.error("❌ 달러 부족!")
-            elif action == "SELL":
-                # current_holdings가 아직 계산 전이면 직접 계산
-                _df = df_stock.copy()
-                _df['Qty'] = pd.to_numeric(_df['Qty'], errors='coerce').fillna(0)
-                _held = (_df[(_df['Ticker']==ticker)&(_df['Action']=='BUY')]['Qty'].sum()
-                         - _df[(_df['Ticker']==ticker)&(_df['Action']=='SELL')]['Qty'].sum())
-                if qty <= _held:
-                    log_stock_trade(date, ticker, action, qty, price, rate, fee)
-                    st.success("✅ 매도 완료"); time.sleep(1); st.rerun()
-                else:
-                    st.error(f"❌ 보유 수량({_held:.2f}주)보다 많이 팔 수 없습니다.")
-            elif action == "DIVIDEND":
-                log_stock_trade(date, ticker, action, 1.0, price, rate, fee)
-                st.success("💰 배당금 입금"); time.sleep(1); st.rerun()
-
-elif mode == "🗑️ 데이터 관리":
-    st.sidebar.subheader("📅 날짜별 삭제")
-    available_dates = set()
-    if not df_stock.empty and 'Date' in df_stock.columns: available_dates.update(df_stock['Date'].unique())
-    if not df_cash.empty and 'Date' in df_cash.columns: available_dates.update(df_cash['Date'].unique())
-    if available_dates:
-        target_date = st.sidebar.selectbox("삭제할 날짜", sorted(list(available_dates), reverse=True))
-        if st.sidebar.button("🚨 해당 날짜 데이터 삭제"):
-            if delete_data_by_date(target_date): st.success("삭제 완료"); time.sleep(2); st.rerun()
-    else: st.sidebar.caption("데이터 없음")
+            if my_avg_exchange > 0:
+                diff = krw_rate - my_avg_exchange
+                pct = (diff / my_avg_exchange) * 100
+                st.metric("💵 환차익 예상", f"{krw_rate:,.0f}원", f"{diff:+.0f}원 ({pct:+.2f}%)", delta_color="normal")
+                if diff > 0: st.caption("✅ 지금 바꾸면 환전 이득입니다!")
+                else: st.caption("⚠️ 지금 바꾸면 환전 손해입니다.")
+    
+        with st.form("exit_form"):
+            kst = pytz.timezone('Asia/Seoul')
+            date = st.date_input("날짜", datetime.now(kst).date())
+            if act_type == "역환전 (달러→원화)":
+                usd_amount = st.number_input("매도할 달러($)", step=10.0)
+                ex_rate_out = st.number_input("적용 환율", value=krw_rate, format="%.2f")
+                if ex_rate_out > 0: st.caption(f"🇰🇷 예상 입금: {int(usd_amount * ex_rate_out):,}원")
+                if st.form_submit_button("대기열에 추가"):
+                    if q_usd >= usd_amount:
+                        krw_out = usd_amount * ex_rate_out
+                        queue_cash(date, "Exchange_USD_to_KRW", krw_out, usd_amount, ex_rate_out)
+                        st.success("✅ 역환전 대기")
+                    else: st.error("❌ 달러 잔고 부족")
+            else: 
+                krw_amount = st.number_input("출금할 원화(KRW)", step=10000)
+                if st.form_submit_button("대기열에 추가"):
+                    if q_krw >= krw_amount:
+                        queue_cash(date, "Withdraw", krw_amount, 0, 0)
+                        st.success("💸 출금 대기")
+                    else: st.error("❌ 원화 잔고 부족")
+
+    elif mode == "주식 거래":
+        st.subheader("📈 주식 매매 & 배당")
+        ticker = st.selectbox("종목", ["SGOV", "SPYM", "QQQM", "QLD", "GMMF"])
+        action = st.selectbox("유형", ["BUY", "SELL", "DIVIDEND"])
+        with st.form("stock_form"):
+            kst = pytz.timezone('Asia/Seoul')
+            date = st.date_input("날짜", datetime.now(kst).date())
+            qty = 1.0
+            if action != "DIVIDEND": qty = st.number_input("수량 (Qty)", value=1.0, step=0.01)
+            price_label = "배당금 총액 ($)" if action == "DIVIDEND" else "체결 단가 ($)"
+            cur_p = 0.0
+            if action != "DIVIDEND": cur_p = get_current_price(ticker)
+            price = st.number_input(price_label, value=cur_p if cur_p>0 else 0.0, format="%.2f")
+            fee = st.number_input("수수료 ($)", value=0.0, format="%.2f")
+            rate = st.number_input("환율", value=krw_rate, format="%.2f")
+            if st.form_submit_button("대기열에 추가"):
+                if action == "DIVIDEND": qty = 1.0 
+                cost = (qty * price) + fee
+                if action == "BUY":
+                    if q_usd >= cost:
+                        queue_stock(date, ticker, action, qty, price, rate, fee)
+                        st.success("✅ 매수 대기")
+                    else: st.error("❌ 달러 부족!")
+                elif action == "SELL":
+                    _held = q_held.get(ticker, 0.0)
+                    if qty <= _held:
+                        queue_stock(date, ticker, action, qty, price, rate, fee)
+                        st.success("✅ 매도 대기")
+                    else:
+                        st.error(f"❌ 보유 수량({_held:.2f}주)보다 많이 팔 수 없습니다.")
+                elif action == "DIVIDEND":
+                    queue_stock(date, ticker, action, 1.0, price, rate, fee)
+                    st.success("💰 배당금 대기")
+
+    elif mode == "🗑️ 데이터 관리":
+        st.subheader("📅 날짜별 삭제")
+        available_dates = set()
+        if not df_stock.empty and 'Date' in df_stock.columns: available_dates.update(df_stock['Date'].unique())
+        if not df_cash.empty and 'Date' in df_cash.columns: available_dates.update(df_cash['Date'].unique())
+        if available_dates:
+            target_date = st.selectbox("삭제할 날짜", sorted(list(available_dates), reverse=True))
+            if st.button("🚨 해당 날짜 데이터 삭제"):
+                if delete_data_by_date(target_date): st.success("삭제 완료"); time.sleep(2); st.rerun()
+        else: st.caption("데이터 없음")
+
+    # 🧺 대기열 패널 (폼 제출 직후 상태로 다시 그림)
+    trade_queue = get_queue()
+    if trade_queue:
+        st.markdown("---")
+        st.subheader(f"🧺 기록 대기열 ({len(trade_queue)}건)")
+        st.dataframe(pd.DataFrame([{"시트": "거래" if s_ == "Sheet1" else "자금", "날짜": r["Date"],
+                                    "내용": f"{r.get('Ticker', '')} {r.get('Action', r.get('Type', ''))}".strip(),
+                                    "금액": r.get("Price", r.get("Amount_KRW"))} for s_, r in trade_queue]),
+                     hide_index=True, use_container_width=True)
+        q_krw, q_usd, _ = queue_balance(wallet_data, ledger_data['holdings'])
+        st.caption(f"반영 후 잔고: {int(q_krw):,}원 / ${q_usd:.2f}")
+        qc1, qc2, qc3 = st.columns(3)
+        if qc1.button("✅ 일괄 기록", use_container_width=True):
+            if commit_queue(): st.rerun()
+        # 취소·비우기는 콜백으로 먼저 반영되므로 다시 실행할 필요가 없다
+        qc2.button("↩️ 마지막 취소", use_container_width=True, on_click=trade_queue.pop)
+        qc3.button("🗑️ 비우기", use_container_width=True, on_click=trade_queue.clear)
+
+with st.sidebar:
+    entry_panel(wallet_data, ledger_data, df_stock, df_cash)
 
 st.sidebar.markdown("---")
+st.sidebar.button("🔄 시트 새로고침", use_container_width=True, on_click=reload_book, kwargs={"force": True},
+                  help=f"다른 기기에서 시트를 고쳤을 때 바로 다시 읽습니다. 그냥 두어도 {SHEET_CHECK_SECONDS:.0f}초마다 "
+                       "바뀐 게 있는지 확인합니다.")
 if st.sidebar.button("📖 전략 가이드 보기", use_container_width=True):
     show_strategy_guide()
 if st.sidebar.button("🔔 텔레그램 테스트"): send_test_message()
 
-# 메인 대시보드 계산
-current_holdings = {}
-total_stock_val_krw = 0
-asset_details = []
-if not df_stock.empty and 'Action' in df_stock.columns:
-    df_stock['Qty'] = pd.to_numeric(df_stock['Qty'], errors='coerce').fillna(0)
-    current_holdings = df_stock.groupby("Ticker").apply(lambda x: x.loc[x['Action']=='BUY','Qty'].sum() - x.loc[x['Action']=='SELL','Qty'].sum()).to_dict()
-    for t, q in current_holdings.items():
+# 메인 대시보드 계산 (📊 자산 탭과 ⚖️ 리밸런싱 탭이 같이 쓴다)
+def portfolio_snapshot():
+    total_stock_val_krw = 0
+    asset_details = []
+    for t, q in ledger_data['holdings'].items():
         if q > 0:
             p = get_current_price(t)
             if p == 0:
@@ -819,18 +684,22 @@ if not df_stock.empty and 'Action' in df_stock.columns:
             val_krw = q * p * krw_rate
             total_stock_val_krw += val_krw
             asset_details.append({"종목": t, "가치": val_krw, "수량": q})
+    total_asset = total_stock_val_krw + wallet_data['KRW'] + (wallet_data['USD'] * krw_rate)
+    return total_stock_val_krw, asset_details, total_asset
 
-total_deposit = wallet_data['Net_Principal']
-total_asset = total_stock_val_krw + wallet_data['KRW'] + (wallet_data['USD'] * krw_rate)
-net_profit = total_asset - total_deposit
-profit_rate = (net_profit / total_deposit * 100) if total_deposit > 0 else 0
-
-# 탭 구성
+# 탭 구성 — 열린 탭 하나만 그린다. 탭을 바꾸면 앱을 다시 실행하고, 그때 고른 탭의 계산만 돈다.
+# 탭 안 위젯 값은 persist_state="session"이라 다른 탭에 다녀와도 유지된다.
 kst = pytz.timezone('Asia/Seoul')
 current_year = datetime.now(kst).year
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(["📊 자산 & 포트폴리오", "💰 배당 & 스노우볼", "⚖️ AI 리밸런싱", "📡 AI 시장 레이더", f"👮‍♂️ {current_year}년 세금 지킴이", "📈 추세 그래프", "📋 상세 기록", "🧪 백테스트"])
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(["📊 자산 & 포트폴리오", "💰 배당 & 스노우볼", "⚖️ AI 리밸런싱", "📡 AI 시장 레이더", f"👮‍♂️ {current_year}년 세금 지킴이", "📈 추세 그래프", "📋 상세 기록", "🧪 백테스트"],
+                                                         key="main_tab", on_change="rerun")
+
+def assets_tab():
+    total_stock_val_krw, asset_details, total_asset = portfolio_snapshot()
+    total_deposit = wallet_data['Net_Principal']
+    net_profit = total_asset - total_deposit
+    profit_rate = (net_profit / total_deposit * 100) if total_deposit > 0 else 0
 
-with tab1:  
     st.subheader("💰 자산 현황")
     col1, col2, col3 = st.columns(3)
     col1.metric("총 자산 (주식+현금)", f"{int(total_asset):,}원", help="주식 평가액 + 원화 잔고 + (달러 잔고 × 환율)")
@@ -887,7 +756,9 @@ with tab1:
             text2 = base2.mark_text(radius=140).encode(text=alt.Text("Percent"), order=alt.Order("가치", sort="descending"), color=alt.value("black"))
             st.altair_chart(pie2 + text2, use_container_width=True)
 
-with tab2:
+def dividend_tab():
+    monthly_div, total_div_all = calculate_dividend_analytics(ledger_data)
+    gov_price = get_current_price("SGOV")
     st.header("💰 Dividend Snowball Effect")
     d1, d2, d3 = st.columns(3)
     d1.metric("총 수령 배당금", f"${total_div_all:.2f}")
@@ -915,7 +786,8 @@ with tab2:
         else: 
             st.caption("기록 없음")
 
-with tab3:
+def rebalance_tab():
+    _, asset_details, _ = portfolio_snapshot()
     st.header("⚖️ AI Portfolio Rebalancer & Master Score")
     if use_autopilot: st.info(f"🧠 **AI 오토파일럿 작동 중: [{ai_mode}]**")
     else: st.caption("수동 목표 비율 설정 모드")
@@ -928,26 +800,18 @@ with tab3:
         targets = {'QQQM': target_qqqm, 'SPYM': target_spym, 'SGOV': target_sgov, 'QLD': target_qld, 'GMMF': 0}
         rebal_df['Target_%'] = rebal_df['종목'].map(targets).fillna(0)
         
-        try:
-            ex_df = yf.Ticker("KRW=X").history(period="3mo")
-            krw_ma60 = ex_df['Close'].tail(60).mean() if not ex_df.empty else krw_rate
-        except: krw_ma60 = krw_rate
-            
-        try:
-            dxy_df = yf.Ticker("DX-Y.NYB").history(period="1mo")
-            dxy_curr = dxy_df['Close'].iloc[-1] if not dxy_df.empty else 100
-            dxy_ma20 = dxy_df['Close'].mean() if not dxy_df.empty else 100
-        except: dxy_curr, dxy_ma20 = 100, 100
+        # 환율 MA60·DXY·종목별 200일선은 미리 받아 둔 시장 컨텍스트에서 (행마다 네트워크를 타지 않는다)
+        mkt = get_market_context()
+        krw_ma60 = mkt['krw_ma60'] if mkt['krw_ma60'] is not None else krw_rate
+        dxy_curr, dxy_ma20 = mkt['dxy'], mkt['dxy_ma20']
         
         my_krw = wallet_data['KRW']
         
         for _, row in rebal_df.iterrows():
             if row['Target_%'] == 0: continue
             
-            try:
-                hist_1y = yf.Ticker(row['종목']).history(period="1y")
-                ma200 = hist_1y['Close'].tail(200).mean() if len(hist_1y) >= 200 else get_current_price(row['종목'])
-            except: ma200 = get_current_price(row['종목'])
+            cur_price = mkt['price'].get(row['종목']) or get_current_price(row['종목'])
+            ma200 = mkt['ma200'].get(row['종목'], cur_price)
             
             # 🔥 시각화 버그 해결 2: 각 종목에 맞는 정확한 RSI 배정
             if row['종목'] == 'QQQM': rsi_val = q_rsi
@@ -956,7 +820,7 @@ with tab3:
             else: rsi_val = 50 
             
             master_score = calculate_aegis_master_score(
-                row['종목'], get_current_price(row['종목']), rsi_val, vix_val, ma200, 
+                row['종목'], cur_price, rsi_val, vix_val, ma200, 
                 krw_rate, my_avg_exchange, krw_ma60, dxy_curr, dxy_ma20, 
                 row['Target_%'], row['Current_%'], my_krw
             )
@@ -977,7 +841,7 @@ with tab3:
             st.markdown("---")
     else: st.info("데이터 부족")
 
-with tab4:
+def radar_tab():
     st.header("📡 AI Market Radar")
     col_vix, col_qqqm, col_spym, col_qld = st.columns(4)
     vix_delta = vix_val - vix_hist['Close'].iloc[-2] if len(vix_hist) > 1 else 0
@@ -991,11 +855,11 @@ with tab4:
         st.metric("QLD RSI", f"{qld_rsi:.1f}")
         
     if not q_hist.empty:
-        q_hist = q_hist.reset_index()
-        chart = alt.Chart(q_hist).mark_line().encode(x='Date', y='RSI', tooltip=['Date', 'RSI']).properties(height=300)
+        chart = alt.Chart(q_hist.reset_index()).mark_line().encode(x='Date', y='RSI', tooltip=['Date', 'RSI']).properties(height=300)
         st.altair_chart(chart, use_container_width=True)
 
-with tab5:
+def tax_tab():
+    tax_info = calculate_tax_guard(ledger_data)
     st.header(f"👮‍♂️ {current_year}년 세금 지킴이")
     t1, t2, t3 = st.columns(3)
     t1.metric("실현 수익", f"{int(tax_info['realized_profit']):,}원")
@@ -1007,7 +871,7 @@ with tab5:
     # 🍂 연말 절세: 손실 수확(Tax-Loss Harvesting) 분석
     st.markdown("---")
     st.subheader("🍂 연말 절세: 손실 수확 검토")
-    harvest = calculate_tax_loss_harvest(df_stock, krw_rate, tax_info['realized_profit'])
+    harvest = calculate_tax_loss_harvest(ledger_data, krw_rate, tax_info['realized_profit'])
     current_month = datetime.now(kst).month
 
     if harvest['over_threshold'] <= 0:
@@ -1030,15 +894,20 @@ with tab5:
 
         st.caption("⚠️ 한국 해외주식 손실은 다음 해로 이월되지 않으니, 한도 초과분을 메울 만큼만 수확하는 게 효율적입니다.")
 
-with tab6:
+# 그래프 선택·백테스트 입력은 fragment 안에서만 다시 그린다 (위젯을 만져도 장부·시세·다른 탭은 그대로)
+@st.fragment
+def history_tab():
     st.subheader("📈 자산 변화 추이")
-    history_df = calculate_history(df_stock, df_cash)
+    # 일별 추이는 장부가 바뀌었거나 날짜가 넘어갔을 때만 다시 편다
+    history_df = derived("history", ("Sheet1", "CashFlow"), lambda: calculate_history(ledger_data),
+                         datetime.now(kst).date())
     
     if not history_df.empty:
-        chart_opt = st.radio("그래프 선택", ["보유 수량", "현금 잔고 (KRW vs USD)", "총 투자원금"], horizontal=True, key="history_chart_opt_v2")
+        chart_opt = st.radio("그래프 선택", ["보유 수량", "현금 잔고 (KRW vs USD)", "총 투자원금"], horizontal=True,
+                             key="history_chart_opt_v2", persist_state="session")
         
         if chart_opt == "보유 수량":
-            long_df = history_df.melt('Date', value_vars=['Stock_SGOV', 'Stock_QQQM', 'Stock_SPYM', 'Stock_QLD', 'Stock_GMMF'], var_name='Ticker', value_name='Qty')
+            long_df = history_df.melt('Date', value_vars=[c for c in history_df.columns if c.startswith('Stock_')], var_name='Ticker', value_name='Qty')
             c = alt.Chart(long_df).mark_line(point=True).encode(
                 x='Date', 
                 y='Qty', 
@@ -1073,38 +942,27 @@ with tab6:
             
     else: st.info("데이터 부족: 거래 내역이 쌓이면 그래프가 표시됩니다.")
         
-with tab7:
+def records_tab():
     st.dataframe(df_stock, use_container_width=True)
     st.dataframe(df_cash, use_container_width=True)
 
-with tab8:
+@st.fragment
+def backtest_tab():
     st.header("🧪 Aegis 엔진 검증")
     st.caption("같은 돈을 같은 날 넣었을 때, 점수 엔진이 '아무 생각 없는 적립식'을 이기는지 비교합니다.")
 
     bc1, bc2, bc3, bc4 = st.columns(4)
-    proxy = bc1.selectbox("기준 종목", ["QQQ", "QQQM", "SPY", "QLD"],
+    proxy = bc1.selectbox("기준 종목", ["QQQ", "QQQM", "SPY", "QLD"], key="bt_proxy", persist_state="session",
                           help="QQQM은 2020년 10월 상장이라 기간이 짧습니다. 장기 검증은 QQQ 권장.")
-    bt_start = bc2.date_input("시작일", pd.Timestamp("2019-01-01").date(), key="bt_s")
-    threshold = bc3.number_input("매수 임계점", value=100, step=5, key="bt_th")
+    bt_start = bc2.date_input("시작일", pd.Timestamp("2019-01-01").date(), key="bt_s", persist_state="session")
+    threshold = bc3.number_input("매수 임계점", value=100, step=5, key="bt_th", persist_state="session")
     panic_dd = bc4.number_input("공포 매도 기준(-%)", value=20, min_value=5, max_value=50,
-                                step=5, key="bt_pd",
+                                step=5, key="bt_pd", persist_state="session",
                                 help="전략C가 '못 참고 파는' 하락률. 20이면 고점 대비 -20%에서 전량 매도.")
 
     st.markdown("**납입 스케줄** — 실제 입금 기록에서 자동 생성됩니다.")
 
-    dep = {}
-    if not df_cash.empty and 'Type' in df_cash.columns:
-        _d = df_cash[df_cash['Type'].isin(['Deposit', 'Withdraw'])].copy()
-        if not _d.empty:
-            _d['Date'] = pd.to_datetime(_d['Date'], errors='coerce')
-            _d['Amount_KRW'] = pd.to_numeric(
-                _d['Amount_KRW'].astype(str).str.replace(',', ''),
-                errors='coerce').fillna(0)
-            _d = _d.dropna(subset=['Date'])
-            _d['Signed'] = _d['Amount_KRW'].where(_d['Type'] == 'Deposit', -_d['Amount_KRW'])
-            g = _d.groupby(_d['Date'].dt.to_period('M'))['Signed'].sum()
-            dep = {p: float(v) for p, v in g.items() if v > 0}
-
+    dep = derived("deposits", ("CashFlow",), lambda: bt_monthly_deposits(df_cash))   # 주식 거래를 기록해도 그대로
     if not dep:
         st.warning("입금 기록이 없습니다. 사이드바에서 입금을 먼저 기록해주세요.")
         default_text = ""
@@ -1112,7 +970,7 @@ with tab8:
         first_p = min(dep.keys())
         max_span = (pd.Period(pd.Timestamp.today(), freq='M') - first_p).n + 1
         max_span = max(int(max_span), 1)
-        n_months = st.slider("관찰 기간 (개월)", 1, max_span, max_span, key="bt_span",
+        n_months = st.slider("관찰 기간 (개월)", 1, max_span, max_span, key="bt_span", persist_state="session",
                              help="입금이 없던 달도 '0원'으로 포함합니다. 길게 잡을수록 "
                                   "이미 넣어둔 돈이 굴러간 결과까지 반영됩니다.")
         periods = [first_p + i for i in range(int(n_months))]
@@ -1125,7 +983,7 @@ with tab8:
 
     sched_text = st.text_area(
         "확인 및 수정 (YYYY-MM=금액) — 여기에 과거 달을 직접 추가하면 긴 기간도 테스트 가능",
-        value=default_text, height=160, key="bt_sched_box")
+        value=default_text, height=160, key="bt_sched_box", persist_state="session")
 
     if st.button("🚀 백테스트 실행", type="primary", key="bt_run"):
         sched = bt_parse_schedule(sched_text)
@@ -1209,11 +1067,136 @@ with tab8:
                 except Exception as e:
                     st.error(f"백테스트 실패: {e}")
 
+    st.markdown("---")
+    st.subheader("🧮 파라미터 스윕")
+    st.caption("같은 데이터·같은 납입 스케줄로 임계점·공포 매도 기준·스프레드·목표 비중의 모든 조합을 한꺼번에 돌립니다.")
+    sw1, sw2, sw3, sw4 = st.columns(4)
+    sw_th = sw1.slider("매수 임계점", 0, 200, (60, 140), 10, key="sw_th", persist_state="session")
+    sw_pd = sw2.slider("공포 매도 기준(-%)", 5, 50, (10, 30), 5, key="sw_pd", persist_state="session")
+    sw_sp = sw3.slider("환전 스프레드(%)", 0.0, 2.0, (0.5, 1.0), 0.25, key="sw_sp", persist_state="session")
+    sw_tw = sw4.slider("목표 비중(%)", 10, 90, (20, 50), 10, key="sw_tw", persist_state="session")
+    grid_th = list(range(sw_th[0], sw_th[1] + 1, 10))
+    grid_pd = list(range(sw_pd[0], sw_pd[1] + 1, 5))
+    grid_sp = [round(x, 2) for x in np.arange(sw_sp[0], sw_sp[1] + 0.001, 0.25)]
+    grid_tw = list(range(sw_tw[0], sw_tw[1] + 1, 10))
+    n_combo = len(grid_th) * len(grid_pd) * len(grid_sp) * len(grid_tw)
+    st.caption(f"조합 {n_combo}개 (임계점 {len(grid_th)} × 공포매도 {len(grid_pd)} × 스프레드 {len(grid_sp)} × 목표비중 {len(grid_tw)})")
+
+    if st.button("🧮 스윕 실행", key="sw_run"):
+        sched = bt_parse_schedule(sched_text)
+        if not sched:
+            st.error("스케줄을 해석하지 못했습니다.")
+        else:
+            with st.spinner(f"{n_combo}개 조합 시뮬레이션 중..."):
+                try:
+                    end = max(pd.Timestamp(k + '-05') for k in sched) + pd.DateOffset(months=2)
+                    end = min(end, pd.Timestamp.today())
+                    df_bt = bt_load(proxy, str(bt_start), end.strftime('%Y-%m-%d'))
+                    if df_bt.empty or len(df_bt) < 200:
+                        st.error("데이터가 부족합니다. 시작일을 앞당기거나 종목을 바꿔보세요.")
+                    else:
+                        t0 = time.perf_counter()
+                        st.session_state["sw_result"] = bt_sweep(
+                            df_bt, sched, grid_th, [p / 100.0 for p in grid_pd],
+                            [sp / 100.0 for sp in grid_sp], grid_tw)
+                        st.session_state["sw_elapsed"] = time.perf_counter() - t0
+                except Exception as e:
+                    st.error(f"스윕 실패: {e}")
+
+    sw_df = st.session_state.get("sw_result")
+    if sw_df is not None and not sw_df.empty:
+        st.caption(f"⏱️ {len(sw_df)}개 조합 / {st.session_state['sw_elapsed']:.1f}초")
+        params = ['임계점', '공포매도(%)', '스프레드(%)', '목표비중(%)']
+        ax1, ax2 = st.columns(2)
+        x_col = ax1.selectbox("가로축", params, index=0, key="sw_x", persist_state="session")
+        y_col = ax2.selectbox("세로축", [p for p in params if p != x_col], index=2, key="sw_y", persist_state="session")
+        # 나머지 두 축은 평균으로 접어서 2차원 히트맵으로 보여준다
+        agg = sw_df.groupby([x_col, y_col], as_index=False)[['B-A(%p)', 'B 유휴(%)']].mean()
+        hm1, hm2 = st.columns(2)
+        with hm1:
+            st.markdown("**B − A 초과 성과 (납입액 대비 %p)**")
+            st.altair_chart(alt.Chart(agg).mark_rect().encode(
+                x=alt.X(f'{x_col}:O'), y=alt.Y(f'{y_col}:O', sort='descending'),
+                color=alt.Color('B-A(%p):Q', scale=alt.Scale(scheme='redblue', domainMid=0)),
+                tooltip=[x_col, y_col, alt.Tooltip('B-A(%p):Q', format='.2f')]), use_container_width=True)
+        with hm2:
+            st.markdown("**B 현금 유휴 기간 (%)**")
+            st.altair_chart(alt.Chart(agg).mark_rect().encode(
+                x=alt.X(f'{x_col}:O'), y=alt.Y(f'{y_col}:O', sort='descending'),
+                color=alt.Color('B 유휴(%):Q', scale=alt.Scale(scheme='oranges')),
+                tooltip=[x_col, y_col, alt.Tooltip('B 유휴(%):Q', format='.1f')]), use_container_width=True)
+        with st.expander("📋 전체 조합 결과"):
+            st.dataframe(sw_df.sort_values('B-A(%p)', ascending=False), hide_index=True, use_container_width=True)
+
+    st.markdown("---")
+    st.subheader("🏦 포트폴리오 엔진 (봇 규칙 그대로)")
+    st.caption("텔레그램 봇이 실제로 쓰는 규칙(긴급 환전·QLD 타격·SGOV 파킹·현금 천장·과열 매도·AI 모드 전환)을 "
+               "QQQM/SPYM/QLD/SGOV + 원화·달러 현금에 하루씩 그대로 적용합니다. 알림은 전부 그대로 실행했다고 가정합니다.")
+    pf1, pf2 = st.columns(2)
+    pf_proxy = pf1.toggle("장기 대용 종목 사용 (QQQ/SPY/QLD/BIL)", value=True, key="pf_proxy", persist_state="session",
+                          help="끄면 실제 QQQM/SPYM/SGOV로 돌리는데, 상장일 이전 구간은 잘립니다.")
+    pf_rev = pf2.number_input("역환전 1회 비율(%)", value=30, min_value=5, max_value=100, step=5, key="pf_rev", persist_state="session",
+                              help="봇은 '달러 일부'라고만 알려주므로, 몇 %를 바꿨다고 볼지 정합니다.")
+
+    if st.button("🏦 포트폴리오 백테스트 실행", key="pf_run"):
+        sched = bt_parse_schedule(sched_text)
+        if not sched:
+            st.error("스케줄을 해석하지 못했습니다.")
+        else:
+            with st.spinner("봇 규칙으로 하루씩 재생 중..."):
+                try:
+                    end = max(pd.Timestamp(k + '-05') for k in sched) + pd.DateOffset(months=2)
+                    end = min(end, pd.Timestamp.today())
+                    df_pf = bt_portfolio_load(str(bt_start), end.strftime('%Y-%m-%d'), pf_proxy)
+                    if df_pf.empty or len(df_pf) < 60:
+                        st.error("데이터가 부족합니다. 시작일을 앞당기거나 대용 종목을 켜보세요.")
+                    else:
+                        t0 = time.perf_counter()
+                        h_pf, paid_pf, s_pf, _ = bt_portfolio_run(df_pf, sched, SPREAD_BT, pf_rev / 100.0)
+                        elapsed = time.perf_counter() - t0
+
+                        p1, p2, p3, p4 = st.columns(4)
+                        p1.metric("총 납입액", f"{int(paid_pf):,}원")
+                        p2.metric("🤖 봇 규칙", f"{int(s_pf['최종 평가액']):,}원", f"{s_pf['수익률(%)']:.1f}%")
+                        p3.metric("QQQM 단순 적립식", f"{int(h_pf['적립식'].iloc[-1]):,}원",
+                                  f"{s_pf['적립식 수익률(%)']:.1f}%")
+                        p4.metric("봇 MDD", f"{s_pf['MDD(%)']:.1f}%")
+                        st.caption(f"⏱️ {len(df_pf):,}거래일 / {elapsed:.2f}초 · 남은 원화 {int(s_pf['원화 현금']):,}원 · "
+                                   f"평균 환율 {s_pf['평균 환율']:,.0f}원")
+
+                        long_pf = h_pf.reset_index().melt('Date', var_name='전략', value_name='평가액')
+                        st.altair_chart(alt.Chart(long_pf).mark_line().encode(
+                            x='Date:T', y=alt.Y('평가액:Q', axis=alt.Axis(format=',d')),
+                            color=alt.Color('전략:N', scale=alt.Scale(domain=['봇', '적립식'],
+                                                                    range=['#ff4b4b', '#888888'])),
+                            tooltip=['Date', '전략', '평가액']).properties(height=340).interactive(),
+                            use_container_width=True)
+
+                        c_sig, c_w = st.columns(2)
+                        with c_sig:
+                            st.markdown("**신호 발생 횟수**")
+                            st.dataframe(pd.Series(s_pf['신호 횟수'], name='횟수').sort_values(ascending=False),
+                                         use_container_width=True)
+                            st.markdown("**AI 모드 일수**")
+                            st.dataframe(pd.Series(s_pf['모드 일수'], name='일수'), use_container_width=True)
+                        with c_w:
+                            st.markdown("**마지막 날 비중 (달러 자산 기준)**")
+                            st.dataframe(pd.Series(s_pf['최종 비중(%)'], name='비중(%)').map('{:.1f}%'.format),
+                                         use_container_width=True)
+                except Exception as e:
+                    st.error(f"포트폴리오 백테스트 실패: {e}")
+
     with st.expander("⚠️ 이 백테스트의 한계 (반드시 읽어주세요)"):
         st.markdown("""
-- **단일 종목 시뮬레이션**입니다. QLD 전술타격, SGOV 파킹, 리밸런싱 매도는 반영되지 않습니다.
+- 위쪽 A/B/C 비교는 **단일 종목 시뮬레이션**입니다. QLD 전술타격, SGOV 파킹, 리밸런싱 매도는 🏦 포트폴리오 엔진에서만 반영됩니다.
+- 포트폴리오 엔진은 하루에 '은행 시간 1번 + 미국장 1번' 봇이 돈 것으로 보고, 모든 체결을 그날 종가로 합니다. 배당·매매 수수료는 빠져 있습니다.
 - **전략B의 유휴 현금은 이자 0%**로 계산했습니다. 실제로는 SGOV에 파킹하므로 전략B가 실제보다 약간 불리하게 나옵니다.
 - **과최적화 위험**: 점수 기준(VIX 18, RSI 40, 100점 등)은 최근 시장을 이미 알고 있는 상태에서 정한 값입니다. 과거에 잘 맞는 게 당연할 수 있습니다.
 - **표본이 작습니다**: 매수 결정이 수십 회 수준이라 통계적 유의성이 없습니다.
 - QQQM은 2020년 10월 상장이라 그 이전 구간은 QQQ로만 검증 가능합니다.
         """)
+
+for tab, draw in ((tab1, assets_tab), (tab2, dividend_tab), (tab3, rebalance_tab), (tab4, radar_tab),
+                  (tab5, tax_tab), (tab6, history_tab), (tab7, records_tab), (tab8, backtest_tab)):
+    if tab.open:
+        with tab: draw()
@@ -0,0 +1,368 @@
+"""
+Aegis 백테스트 엔진 — Streamlit 없이 돌아가는 시뮬레이션 커널.
+
+bt_run은 app.py의 🧪 백테스트 탭이 쓰는 진입점이다. 하루씩 도는 경로 의존 로직
+(전략 B의 점수 매수, 전략 C의 공포 매도)은 그대로 두되, 행마다 DataFrame을 읽고
+dict를 쌓던 방식을 미리 할당한 NumPy 배열 + 파이썬 float 루프로 바꿨다.
+상태와 무관한 점수 요소(A: 시장 기회, E: 과열 페널티)는 한 번에 벡터로 계산한다.
+bt_sweep은 같은 프레임으로 파라미터 조합(그리드)을 프로세스 풀에서 한꺼번에 돌린다.
+bt_portfolio_run은 봇(run_bot)의 실제 규칙(aegis_core.decide_signals)을 QQQM/SPYM/QLD/SGOV + 원화·달러
+현금 포트폴리오에 하루씩 그대로 적용하는 다종목 엔진이다.
+"""
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from indicators import rsi_wilder, sma, rolling_max, rolling_min
+from aegis_core import (calculate_aegis_master_score_array, get_ai_target_ratios, portfolio_weights,
+                        decide_signals, SPREAD_RATE)
+
+
+def bt_injections(index, sched):
+    """납입 스케줄 {'YYYY-MM': 금액}을 '매월 5일 이후 첫 거래일' 납입 배열로 바꾼다"""
+    inject = {}
+    for ym, amt in sched.items():
+        if amt <= 0: continue
+        try: t = pd.Timestamp(ym + '-05')
+        except: continue
+        pos = index.searchsorted(t)   # 정렬된 날짜에서 t 이상인 첫 거래일
+        if pos < len(index): inject[pos] = inject.get(pos, 0) + amt
+    arr = np.zeros(len(index))
+    for pos, amt in inject.items(): arr[pos] = amt
+    return arr, sum(inject.values())
+
+
+def bt_simulate(P, FX, VIX, RSI, MA200, FX_MA60, DXY, DXY_MA20, day, inject,
+                threshold, spread, target_w, panic_dd=0.20):
+    """A(즉시 매수) / B(Aegis 점수 매수) / C(공포 매도하는 인간) 세 전략을 같은 돈으로 굴린다.
+    입력은 모두 같은 길이의 배열. 반환: 전략별 {'eq': 평가액 배열, 'cash', 'shares', 'ex_krw', 'ex_usd', ...}"""
+    n = len(P)
+    # 상태와 무관한 점수 요소는 미리 벡터로 계산 (B/C/D/F는 전략B의 현금·평단에 따라 매일 달라짐)
+    comp = calculate_aegis_master_score_array(P, RSI, VIX, MA200, FX, FX, FX_MA60, DXY, DXY_MA20,
+                                              target_w, 0.0, 0.0, day=day)
+    sc_A = comp['A'].tolist(); sc_E = comp['E'].tolist()
+    P = np.asarray(P, dtype=float).tolist(); FX = np.asarray(FX, dtype=float).tolist()
+    VIX = np.asarray(VIX, dtype=float).tolist(); FX_MA60 = np.asarray(FX_MA60, dtype=float).tolist()
+    DXY = np.asarray(DXY, dtype=float).tolist(); DXY_MA20 = np.asarray(DXY_MA20, dtype=float).tolist()
+    day = np.asarray(day).tolist(); inject = np.asarray(inject, dtype=float).tolist()
+
+    # 전략별 상태: 원화 현금 / 보유 주식 / 환전 누적(원화, 달러) — 매일 끝난 상태를 미리 할당한 배열에 한 줄씩 기록
+    state = np.zeros((n, 4, 3))
+    krw = [0.0, 0.0, 0.0]; sh = [0.0, 0.0, 0.0]; xk = [0.0, 0.0, 0.0]; xu = [0.0, 0.0, 0.0]
+    buys = [0, 0, 0]; tot_in = [0.0, 0.0, 0.0]; dip_in = [0.0, 0.0, 0.0]
+    halted = False; resume_px = 0.0; panics = 0; peakC = 0.0; idle_days = 0
+    buy_mul = 1 + spread
+
+    def deploy(k, rate, price, vix):
+        amt = krw[k]
+        usd = amt / (rate * buy_mul)
+        xk[k] += amt; xu[k] += usd
+        tot_in[k] += amt
+        if vix >= 25: dip_in[k] += amt
+        sh[k] += usd / price
+        krw[k] = 0.0; buys[k] += 1
+
+    for i in range(n):
+        p = P[i]; fx = FX[i]; vix = VIX[i]
+        if inject[i]:
+            krw[0] += inject[i]; krw[1] += inject[i]; krw[2] += inject[i]
+
+        # 전략A: 들어온 날 즉시 전량 매수
+        if krw[0] > 0: deploy(0, fx, p, vix)
+
+        # 전략B: Aegis 점수가 임계점을 넘을 때만 매수 (calculate_aegis_master_score와 같은 순서로 계산)
+        if krw[1] > 0:
+            my_avg = (xk[1] / xu[1]) if xu[1] > 0 else fx
+            b_stock = sh[1] * p * fx
+            b_tot = b_stock + krw[1]
+            cur_w = (b_stock / b_tot * 100) if b_tot > 0 else 0.0
+            gap = target_w - cur_w
+            s_B = min((gap - 5.0) * 2.5, 30) if gap > 5.0 else 0
+            d = day[i]
+            s_C = 0
+            if krw[1] >= 100000:
+                rate_per_day = 0.8 + min(1.0, (krw[1] - 100000) / 500000) * 1.0
+                s_C = min(((d - 5) if d >= 5 else (d + 30 - 5)) * rate_per_day, 50)
+            blended = (my_avg * 0.15) + (FX_MA60[i] * 0.85)
+            s_D = (fx - blended) * 0.5 if fx > blended else 0
+            if DXY[i] > DXY_MA20[i]: s_D = s_D * 0.5
+            s_F = min((blended - fx) * 0.25, 15) if fx < blended else 0
+            sc = sc_A[i] + s_B + s_C - min(s_D, 50) + s_F - sc_E[i]
+            if sc >= threshold: deploy(1, fx, p, vix)
+
+        # 전략C: 규칙 없는 인간 — 고점 대비 크게 빠지면 공포 매도, 회복하면 재진입
+        if not halted:
+            if krw[2] > 0: deploy(2, fx, p, vix)
+            eqC = sh[2] * p * fx + krw[2]
+            peakC = max(peakC, eqC)
+            if sh[2] > 0 and peakC > 0 and eqC < peakC * (1 - panic_dd):
+                krw[2] += sh[2] * p * fx * (1 - spread)
+                sh[2] = 0.0; halted = True
+                resume_px = p; panics += 1
+                xk[2] = 0.0; xu[2] = 0.0
+        else:
+            if p >= resume_px:
+                halted = False
+                if krw[2] > 0: deploy(2, fx, p, vix)
+            peakC = max(peakC, sh[2] * p * fx + krw[2])
+
+        if krw[1] > 0: idle_days += 1
+        state[i] = (krw, sh, xk, xu)
+
+    # 평가액 = 주식 × 가격 × 환율 + 원화 현금 (루프 밖에서 한 번에)
+    cash, shares, ex_krw, ex_usd = (state[:, j, :].T for j in range(4))
+    eq = shares * np.asarray(P) * np.asarray(FX) + cash
+    res = {}
+    for k, name in enumerate('ABC'):
+        res[name] = {'eq': eq[k], 'cash': cash[k], 'shares': shares[k], 'ex_krw': ex_krw[k], 'ex_usd': ex_usd[k],
+                     'buys': buys[k], 'tot_in': tot_in[k], 'dip_in': dip_in[k]}
+    res['idle'] = (idle_days / n * 100) if n else 0
+    res['panics'] = panics
+    return res
+
+
+def bt_stats(S, paid):
+    """전략 하나의 결과 요약 (탭 화면의 비교표 그대로)"""
+    eq = S['eq']
+    cm = np.maximum.accumulate(eq)
+    dd = (eq - cm) / np.where(cm > 0, cm, np.nan)
+    mdd = np.nan if np.isnan(dd).all() else np.nanmin(dd)
+    xk = S['ex_krw'][-1]; xu = S['ex_usd'][-1]
+    return {'최종 평가액': eq[-1],
+            '수익률(%)': (eq[-1]/paid - 1)*100 if paid else 0,
+            '평균 환율': (xk/xu) if xu else 0,
+            '매수 횟수': S['buys'],
+            '폭락장 매수 비중(%)': (S['dip_in']/S['tot_in']*100) if S['tot_in'] else 0,
+            'MDD(%)': (mdd*100) if pd.notna(mdd) else 0}
+
+
+def bt_run(df, sched, threshold, spread, target_w, panic_dd=0.20):
+    """bt_load 프레임 + 납입 스케줄로 세 전략을 돌린다.
+    반환: (평가액 프레임 h, 총 납입액, A 통계, B 통계, C 통계, B 현금 유휴율(%), C 공포 매도 횟수)"""
+    inject, paid = bt_injections(df.index, sched)
+    res = bt_simulate(df['P'].values, df['FX'].values, df['VIX'].values, df['RSI'].values, df['MA200'].values,
+                      df['FX_MA60'].values, df['DXY'].values, df['DXY_MA20'].values, df.index.day.values,
+                      inject, threshold, spread, target_w, panic_dd)
+    h = pd.DataFrame({'A': res['A']['eq'], 'B': res['B']['eq'], 'C': res['C']['eq']},
+                     index=pd.Index(df.index, name='Date'))
+    return (h, paid, bt_stats(res['A'], paid), bt_stats(res['B'], paid), bt_stats(res['C'], paid),
+            res['idle'], res['panics'])
+
+
+# ==========================================
+# 🧮 파라미터 스윕 (프로세스 풀)
+# ==========================================
+_SWEEP = {}   # 워커 프로세스마다 한 번만 채우는 공용 입력 (프레임을 조합마다 다시 보내지 않기 위해)
+
+
+def _sweep_init(df, sched):
+    inject, paid = bt_injections(df.index, sched)
+    _SWEEP['cols'] = (df['P'].values, df['FX'].values, df['VIX'].values, df['RSI'].values, df['MA200'].values,
+                      df['FX_MA60'].values, df['DXY'].values, df['DXY_MA20'].values, df.index.day.values, inject)
+    _SWEEP['paid'] = paid
+
+
+def _sweep_one(params):
+    threshold, panic_dd, spread, target_w = params
+    paid = _SWEEP['paid']
+    res = bt_simulate(*_SWEEP['cols'], threshold, spread, target_w, panic_dd)
+    sA, sB, sC = bt_stats(res['A'], paid), bt_stats(res['B'], paid), bt_stats(res['C'], paid)
+    return {'임계점': threshold, '공포매도(%)': panic_dd * 100, '스프레드(%)': spread * 100, '목표비중(%)': target_w,
+            'B-A(%p)': (sB['최종 평가액'] - sA['최종 평가액']) / paid * 100 if paid else 0.0,
+            'B 유휴(%)': res['idle'],
+            'A 수익률(%)': sA['수익률(%)'], 'B 수익률(%)': sB['수익률(%)'], 'C 수익률(%)': sC['수익률(%)'],
+            'B 매수 횟수': sB['매수 횟수'], '공포매도 횟수': res['panics']}
+
+
+def bt_sweep(df, sched, thresholds, panic_dds, spreads, target_ws, max_workers=None):
+    """임계점 × 공포매도 기준(비율) × 스프레드(비율) × 목표 비중(%)의 모든 조합을 한 줄씩 요약한다.
+    A·B는 공포매도 기준과 무관하고 C는 임계점·목표 비중과 무관하므로, 필요한 시뮬레이션만 돌려서 조합을 맞춘다.
+    돌릴 게 적으면 풀을 띄우는 비용이 더 크므로 현재 프로세스에서 바로 돈다."""
+    b_keys = list(itertools.product(thresholds, spreads, target_ws))
+    c_keys = list(itertools.product(panic_dds, spreads))
+    jobs = ([(th, panic_dds[0], sp, tw) for th, sp, tw in b_keys]
+            + [(thresholds[0], pdd, sp, target_ws[0]) for pdd, sp in c_keys])
+    workers = max_workers or multiprocessing.cpu_count()
+    if len(jobs) < 16 or workers <= 1:
+        _sweep_init(df, sched)
+        results = [_sweep_one(j) for j in jobs]
+    else:
+        # spawn: Streamlit 서버(멀티스레드)를 fork하지 않고, 워커는 이 모듈만 새로 import한다
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_sweep_init, initargs=(df, sched)) as ex:
+            results = list(ex.map(_sweep_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    b_res = dict(zip(b_keys, results[:len(b_keys)]))
+    c_res = dict(zip(c_keys, results[len(b_keys):]))
+
+    rows = []
+    for th, pdd, sp, tw in itertools.product(thresholds, panic_dds, spreads, target_ws):
+        row = dict(b_res[(th, sp, tw)])
+        c = c_res[(pdd, sp)]
+        row['공포매도(%)'] = pdd * 100
+        row['C 수익률(%)'] = c['C 수익률(%)']; row['공포매도 횟수'] = c['공포매도 횟수']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# ==========================================
+# 🏦 포트폴리오 엔진 (봇 규칙 그대로)
+# ==========================================
+PF_TICKERS = ['QQQM', 'SPYM', 'QLD', 'SGOV']
+
+
+def bt_portfolio_prepare(closes):
+    """종가 프레임(컬럼: QQQM, SPYM, QLD, SGOV, ^VIX, KRW=X, DX-Y.NYB)에 봇이 보는 지표를 붙인다.
+    봇의 MarketContext와 같은 정의: RSI(14), 200일선(200봉 미만이면 현재가), 환율 MA5/20/60,
+    5일 변동폭 < 현재가 0.5%(바닥 다지기), DXY MA20. 이동평균은 봉이 모자라면 있는 만큼으로 구한다."""
+    df = closes.ffill().dropna().copy()
+    for t in PF_TICKERS:
+        df[t + '_RSI'] = rsi_wilder(df[t], 14)
+        ma = sma(df[t], 200)
+        df[t + '_MA200'] = np.where(np.isnan(ma), df[t], ma)
+    fx = df['KRW=X'].values
+    for w in (5, 20, 60): df[f'FX_MA{w}'] = sma(fx, w, min_periods=1)
+    df['FX_STAB'] = (rolling_max(fx, 5, min_periods=1) - rolling_min(fx, 5, min_periods=1)) < fx * 0.005
+    df['DXY_MA20'] = sma(df['DX-Y.NYB'], 20, min_periods=1)
+    return df.dropna()
+
+
+def bt_portfolio_simulate(px, rsi, ma200, FX, FX_MA5, FX_MA20, FX_MA60, FX_STAB, VIX, DXY, DXY_MA20, day, inject,
+                          spread=SPREAD_RATE, reverse_pct=0.3):
+    """하루에 두 번 봇을 돌린 것처럼 재생한다: 은행 시간(환전 판단) → 미국장(매매 판단).
+    px/rsi/ma200은 PF_TICKERS별 배열 dict, 나머지는 같은 길이의 배열. 신호는 알림대로 전부 실행하고
+    (소수점 매수, 당일 종가 체결), 역환전은 달러의 reverse_pct만큼 한다.
+    반환: {'krw', 'usd', 'qty'(n×4), 'eq'(원화 평가액), 'counts'(신호 종류별 횟수), 'modes', 'log'}"""
+    n = len(FX)
+    # 시장 데이터만으로 정해지는 점수 요소(A, E)는 종목별로 미리 벡터 계산
+    sc_A, sc_E = {}, {}
+    for t in ('QQQM', 'SPYM', 'QLD'):
+        comp = calculate_aegis_master_score_array(px[t], rsi[t], VIX, ma200[t], FX, FX, FX_MA60, DXY, DXY_MA20,
+                                                  0.0, 0.0, 0.0, day=day)
+        sc_A[t] = comp['A'].tolist(); sc_E[t] = comp['E'].tolist()
+    px = {t: np.asarray(px[t], dtype=float).tolist() for t in PF_TICKERS}
+    rsi = {t: np.asarray(rsi[t], dtype=float).tolist() for t in PF_TICKERS}
+    q_ma200 = np.asarray(ma200['QQQM'], dtype=float).tolist()
+    FX, FX_MA5, FX_MA20, FX_MA60, VIX, DXY, DXY_MA20, inject = (
+        np.asarray(a, dtype=float).tolist() for a in (FX, FX_MA5, FX_MA20, FX_MA60, VIX, DXY, DXY_MA20, inject))
+    FX_STAB = np.asarray(FX_STAB, dtype=bool).tolist(); day = np.asarray(day).tolist()
+
+    krw = 0.0; usd = 0.0
+    qty = {t: 0.0 for t in PF_TICKERS}
+    # 환전 평단 (bot.calculate_my_avg_exchange_rate와 같은 이동평균 방식)
+    held_usd = 0.0; spent_krw = 0.0; last_rate = 1450.0
+    state = np.zeros((n, 2 + len(PF_TICKERS)))
+    counts = {}; modes = {}; log = []
+
+    def avg_rate():
+        if held_usd > 0: return spent_krw / held_usd
+        if any(q > 0.001 for q in qty.values()): return last_rate
+        return 1450.0
+
+    def score(t, i, w, target, my_avg):
+        # calculate_aegis_master_score와 같은 식·같은 순서 (B/C/D/F는 그날의 잔고·비중에 따라 달라짐)
+        fx = FX[i]; d = day[i]
+        gap = target - w
+        s_B = min((gap - 5.0) * 2.5, 30) if gap > 5.0 else 0
+        s_C = 0
+        if krw >= 100000:
+            s_C = min(((d - 5) if d >= 5 else (d + 30 - 5)) * (0.8 + min(1.0, (krw - 100000) / 500000) * 1.0), 50)
+        blended = (my_avg * 0.15) + (FX_MA60[i] * 0.85)
+        s_D = (fx - blended) * 0.5 if fx > blended else 0
+        if DXY[i] > DXY_MA20[i]: s_D = s_D * 0.5
+        s_F = min((blended - fx) * 0.25, 15) if fx < blended else 0
+        return sc_A[t][i] + s_B + s_C - min(s_D, 50) + s_F - sc_E[t][i]
+
+    for i in range(n):
+        fx = FX[i]; vix = VIX[i]
+        if inject[i]: krw += inject[i]
+        price = {t: px[t][i] for t in PF_TICKERS}; price['GMMF'] = 0.0
+        r = {t: rsi[t][i] for t in ('QQQM', 'SPYM', 'QLD')}
+        targets = get_ai_target_ratios(vix, r['QQQM'], r['SPYM'])
+        modes[targets['mode']] = modes.get(targets['mode'], 0) + 1
+        fx_trend = {'ma60': FX_MA60[i], 'stabilizing': FX_STAB[i],
+                    'downtrend': FX_MA5[i] < FX_MA20[i] < FX_MA60[i]}
+
+        for is_open, is_bank_open in ((False, True), (True, False)):
+            my_avg = avg_rate()
+            total, weights = portfolio_weights(qty, price, usd)
+            scores = {t: score(t, i, weights[t], targets[t], my_avg) for t in ('QQQM', 'SPYM', 'QLD')}
+            sigs = decide_signals(vix, price, r, q_ma200[i], fx, FX_MA60[i], fx_trend, my_avg, krw, usd,
+                                  qty, weights, total, scores, targets, is_open, is_bank_open)
+            for sig in sigs:
+                kind = sig['kind']
+                counts[kind] = counts.get(kind, 0) + 1
+                log.append((i, kind, sig.get('ticker', 'SGOV' if kind.startswith('sgov') else '')))
+                if kind in ('urgent_exchange', 'exchange'):
+                    amt = min(sig['krw'], krw)
+                    got = amt / (fx * (1 + spread))
+                    krw -= amt; usd += got
+                    held_usd += got; spent_krw += amt
+                    last_rate = spent_krw / held_usd
+                    if kind == 'urgent_exchange':   # "환전 후 매수"까지 한 번에
+                        qty[sig['ticker']] += got / price[sig['ticker']]; usd -= got
+                elif kind in ('urgent_buy', 'crash_buy', 'sgov_park'):
+                    t = sig.get('ticker', 'SGOV')
+                    amt = min(sig['usd'], usd)
+                    qty[t] += amt / price[t]; usd -= amt
+                elif kind == 'reverse_exchange':
+                    amt = usd * reverse_pct
+                    krw += amt * fx * (1 - spread); usd -= amt
+                    if held_usd > 0:
+                        sold = min(amt, held_usd)
+                        spent_krw -= sold * (spent_krw / held_usd); held_usd -= sold
+                    if held_usd <= 0.1: held_usd = 0.0; spent_krw = 0.0
+                elif kind == 'overheat_sell':
+                    t = sig['ticker']
+                    q = min(sig['qty'], qty[t])
+                    qty[t] -= q; usd += q * price[t]
+                    amt = min(sig['sgov_qty'] * price['SGOV'], usd)
+                    qty['SGOV'] += amt / price['SGOV']; usd -= amt
+                elif kind == 'sgov_release':
+                    q = min(sig['qty'], qty['SGOV'])
+                    qty['SGOV'] -= q; usd += q * price['SGOV']
+
+        state[i] = (krw, usd, qty['QQQM'], qty['SPYM'], qty['QLD'], qty['SGOV'])
+
+    Q = state[:, 2:]
+    P = np.column_stack([px[t] for t in PF_TICKERS])
+    eq = ((Q * P).sum(axis=1) + state[:, 1]) * np.asarray(FX) + state[:, 0]
+    return {'krw': state[:, 0], 'usd': state[:, 1], 'qty': Q, 'eq': eq,
+            'counts': counts, 'modes': modes, 'log': log,
+            'avg_rate': (spent_krw / held_usd) if held_usd > 0 else 0.0}
+
+
+def bt_portfolio_run(df, sched, spread=SPREAD_RATE, reverse_pct=0.3):
+    """bt_portfolio_prepare 프레임 + 납입 스케줄로 봇 규칙 포트폴리오를 돌리고,
+    같은 돈을 들어온 날 QQQM에 바로 넣는 단순 적립식과 비교한다.
+    반환: (평가액 프레임 h[봇, 적립식], 총 납입액, 요약 dict, 시뮬레이션 결과)"""
+    inject, paid = bt_injections(df.index, sched)
+    res = bt_portfolio_simulate({t: df[t].values for t in PF_TICKERS},
+                                {t: df[t + '_RSI'].values for t in PF_TICKERS},
+                                {t: df[t + '_MA200'].values for t in PF_TICKERS},
+                                df['KRW=X'].values, df['FX_MA5'].values, df['FX_MA20'].values, df['FX_MA60'].values,
+                                df['FX_STAB'].values, df['^VIX'].values, df['DX-Y.NYB'].values,
+                                df['DXY_MA20'].values, df.index.day.values, inject, spread, reverse_pct)
+    fx = df['KRW=X'].values
+    dca = np.cumsum(inject / (fx * (1 + spread)) / df['QQQM'].values) * df['QQQM'].values * fx
+    h = pd.DataFrame({'봇': res['eq'], '적립식': dca}, index=pd.Index(df.index, name='Date'))
+
+    eq = res['eq']
+    cm = np.maximum.accumulate(eq)
+    dd = (eq - cm) / np.where(cm > 0, cm, np.nan)
+    mdd = np.nan if np.isnan(dd).all() else np.nanmin(dd)
+    last_px = np.array([df[t].values[-1] for t in PF_TICKERS])
+    hold = res['qty'][-1] * last_px
+    total_usd = hold.sum() + res['usd'][-1]
+    summary = {'최종 평가액': eq[-1],
+               '수익률(%)': (eq[-1]/paid - 1)*100 if paid else 0,
+               '적립식 수익률(%)': (dca[-1]/paid - 1)*100 if paid else 0,
+               'MDD(%)': (mdd*100) if pd.notna(mdd) else 0,
+               '평균 환율': res['avg_rate'],
+               '원화 현금': res['krw'][-1],
+               '최종 비중(%)': {t: (hold[k] / total_usd * 100) if total_usd > 0 else 0
+                             for k, t in enumerate(PF_TICKERS)},
+               '신호 횟수': res['counts'], '모드 일수': res['modes']}
+    return h, paid, summary, res
@@ -0,0 +1,158 @@
+"""
+대시보드(app.py) 한 번 그리기(rerun)의 지연 벤치마크 — streamlit AppTest로, 로컬 스텁 서버(stub_services.py) 상대로.
+
+앱을 처음 여는 콜드 실행과, 캐시가 찬 뒤 아무 위젯이나 건드렸을 때 생기는 재실행을 따로 잰다.
+그다음 위젯 종류별로(사이드바 작업 선택, 탭 전환, 📈 그래프 선택, 🧪 백테스트 입력) 한 번 바꿨을 때와,
+대기열에 넣어 둔 입금 1건을 '✅ 일괄 기록'으로 시트에 쓸 때(쓰기 + 다시 그리기까지)의 재실행 시간을 잰다. 위젯이 st.fragment 안에 있으면 브라우저처럼 그 fragment만 다시 실행한다
+(AppTest는 항상 전체를 다시 실행하므로 여기서 fragment id를 실어 보낸다).
+요청마다 같은 지연을 넣고, 실행마다 서비스별 요청 수도 같이 보여준다.
+
+    python benchmarks/bench_app.py                 # 지연 0.2초, 재실행 5번
+    python benchmarks/bench_app.py --latency 0.5 --reruns 10
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import logging
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+from stub_services import StubServices
+from bench_pipeline import STOCK, CASH, configure
+
+
+# 브라우저는 fragment 안 위젯을 바꾸면 그 fragment id만 실어 재실행을 요청한다. AppTest에는 그 길이 없어서
+# AppTest가 만드는 RerunData에 끼워 넣는다
+_fragment_queue = []
+
+
+def _fragment_aware_runs():
+    import streamlit.testing.v1.local_script_runner as lsr
+    from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+    lsr.RerunData = lambda **kw: RerunData(fragment_id_queue=list(_fragment_queue), **kw)
+
+
+def fragment_id(at, name):
+    """이번 화면에 등록된 fragment 중 함수 이름이 name인 것의 id (없으면 None → 전체 재실행)"""
+    for fid, frag in at._fragment_storage._fragments.items():
+        if any(getattr(c.cell_contents, '__name__', None) == name for c in frag.__closure__ or ()): return fid
+    return None
+
+
+def open_app():
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=300)
+    at.secrets['APP_PASSWORD'] = 'bench'
+    at.session_state['authenticated'] = True   # 로그인 화면 건너뛰기
+    return at
+
+
+def timed(stub, fn):
+    before = dict(stub.hits)
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    return dt, {k: v - before.get(k, 0) for k, v in stub.hits.items() if v - before.get(k, 0)}
+
+
+def tab_label(at, prefix):
+    return next((t.label for t in at.tabs if t.label.startswith(prefix)), None)
+
+
+def open_tab(at, prefix):
+    # 탭이 '열린 탭만 그리기'(key=main_tab)면 그 탭을 골라 한 번 실행해 둔다. 예전 앱은 모든 탭이 늘 그려져 있다
+    label = tab_label(at, prefix)
+    if label and 'main_tab' in at.session_state and at.session_state['main_tab'] != label:
+        at.session_state['main_tab'] = label; at.run()
+
+
+# (이름, 준비로 열어 둘 탭, 값 바꾸기(at, i), 위젯이 들어 있는 fragment 함수 이름)
+def _flip(widget, a, b):
+    return lambda at, i: widget(at).set_value(a if i % 2 == 0 else b)
+
+
+def _commit_one(at, i):
+    # 입금 1건을 대기열에 넣고 한 번 그려 둔 뒤(재지 않음) 일괄 기록 버튼을 누른다
+    at.session_state['trade_queue'] = [("CashFlow", {"Date": "2026-03-05", "Type": "Deposit", "Amount_KRW": 100000 + i,
+                                                     "Amount_USD": 0, "Ex_Rate": 0})]
+    at.run()
+    next(b for b in at.sidebar.button if b.label == "✅ 일괄 기록").click()
+
+
+SCENARIOS = [
+    ('사이드바 작업 선택', None, _flip(lambda at: next(r for r in at.sidebar.radio if r.label == "작업 선택"),
+                                      "입금/환전", "주식 거래"), 'entry_panel'),
+    ('탭 전환', None, None, None),
+    ('📈 그래프 선택', '📈', _flip(lambda at: at.radio(key="history_chart_opt_v2"), "총 투자원금", "보유 수량"), 'history_tab'),
+    ('🧪 백테스트 입력', '🧪', _flip(lambda at: at.number_input(key="bt_th"), 105, 100), 'backtest_tab'),
+    ('✅ 입금 1건 기록', '📊', _commit_one, 'entry_panel'),
+]
+
+
+def interact(stub, at, name, prep, change, frag, reps):
+    if name == '탭 전환':
+        if 'main_tab' not in at.session_state: return None, {}   # 예전 앱: 브라우저 안에서만 바뀌고 서버 실행이 없다
+        labels = [tab_label(at, '📊'), tab_label(at, '📈')]
+        change = lambda at, i: at.session_state.__setitem__('main_tab', labels[(i + 1) % 2])
+    if prep: open_tab(at, prep)
+    times, hits = [], {}
+    for i in range(reps):
+        change(at, i)
+        fid = fragment_id(at, frag) if frag else None
+        _fragment_queue[:] = [fid] if fid else []
+        tab = at.session_state['main_tab'] if 'main_tab' in at.session_state else None
+        dt, h = timed(stub, at.run)
+        _fragment_queue.clear()
+        if at.exception: print("❌ 앱 예외:", name, at.exception[0].value); sys.exit(1)
+        if fid:
+            # AppTest는 fragment만 돈 뒤 화면 트리·위젯 상태에 그 fragment만 남긴다 (브라우저는 나머지를 그대로 둠).
+            # 다음 회차를 위해 재지 않고 전체를 한 번 다시 그려 둔다
+            if tab: at.session_state['main_tab'] = tab
+            at.run()
+        times.append(dt)
+        for k, v in h.items(): hits[k] = hits.get(k, 0) + v
+    return sorted(times)[len(times) // 2], {k: v / reps for k, v in hits.items()}
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--latency', type=float, default=0.2)
+    p.add_argument('--reruns', type=int, default=5)
+    args = p.parse_args()
+    logging.disable(logging.WARNING)   # AppTest의 bare mode·사용 중단 경고는 빼고 본다
+
+    stub = StubServices(args.latency, sheets={'Sheet1': [r[:] for r in STOCK], 'CashFlow': [r[:] for r in CASH]}).start()
+    work = tempfile.mkdtemp()
+    try:
+        configure(stub, work)   # app이 import하는 모듈들이 환경변수를 읽기 전에
+        _fragment_aware_runs()
+        at = open_app()
+        print(f"스텁 지연 {args.latency:.2f}초/요청")
+        dt, hits = timed(stub, at.run)
+        if at.exception: print("❌ 앱 예외:", at.exception[0].value); sys.exit(1)
+        print(f"{'콜드 실행':<10} {dt:6.2f}초  요청 {hits}")
+        times = []
+        for i in range(args.reruns):
+            dt, hits = timed(stub, at.run)
+            times.append(dt)
+            print(f"{f'재실행 {i + 1}':<10} {dt:6.2f}초  요청 {hits}")
+        print(f"재실행 중앙값: {sorted(times)[len(times) // 2]:.2f}초")
+        print(f"\n위젯 하나 바꿨을 때 (각 {args.reruns}번 중앙값, 요청 수는 1번 평균)")
+        for name, prep, change, frag in SCENARIOS:
+            dt, hits = interact(stub, at, name, prep, change, frag, args.reruns)
+            if dt is None: print(f"{name:<14} {'—':>6}   (서버 실행 없음: 모든 탭을 미리 다 그려 둠)"); continue
+            scope = 'fragment만' if frag and fragment_id(at, frag) else '앱 전체'
+            if name.startswith('✅'): scope = '기록 후 앱 전체'   # 기록에 성공하면 st.rerun()으로 전체를 다시 그린다
+            print(f"{name:<14} {dt:6.2f}초  {scope:<10} 요청 {hits}")
+    finally:
+        stub.stop()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
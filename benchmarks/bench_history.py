@@ -0,0 +1,85 @@
+"""
+추세 그래프(calculate_history) 스케일링 벤치마크.
+
+예전 방식(달력의 하루마다 두 시트를 마스크로 거르고 iterrows)과 지금 방식(장부 엔진의 날짜별 변화량 →
+누적합 → 날짜 범위로 펼치기)을 같은 가짜 장부에서 잰다. 10년치 기간에 장부 행 수만 늘려 가며 본다.
+
+    python benchmarks/bench_history.py              # 1k / 10k / 50k 행
+    python benchmarks/bench_history.py 1000 100000  # 원하는 행 수
+예전 방식은 느려서 LEGACY_MAX_ROWS 행까지만 잰다.
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ledger
+
+YEARS = 10
+LEGACY_MAX_ROWS = 10000
+TICKERS = ['QQQM', 'SPYM', 'QLD', 'SGOV', 'GMMF']
+
+
+def fake_ledger(n_rows, seed=0):
+    """10년에 걸쳐 흩어진 입금·환전·매수·매도·배당 기록 (Sheet1, CashFlow 모양 그대로)"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.today().normalize()
+    days = pd.date_range(end - pd.DateOffset(years=YEARS), end).strftime('%Y-%m-%d').values
+    n_cash = n_rows // 3; n_stock = n_rows - n_cash
+    df_cash = pd.DataFrame({'Date': rng.choice(days, n_cash),
+                            'Type': rng.choice(['Deposit', 'Exchange', 'Exchange_USD_to_KRW', 'Withdraw'],
+                                               n_cash, p=[.4, .4, .1, .1]),
+                            'Amount_KRW': rng.integers(10000, 3000000, n_cash),
+                            'Amount_USD': rng.uniform(10, 2000, n_cash).round(2), 'Ex_Rate': 1400})
+    df_stock = pd.DataFrame({'Date': rng.choice(days, n_stock), 'Ticker': rng.choice(TICKERS, n_stock),
+                             'Action': rng.choice(['BUY', 'SELL', 'DIVIDEND'], n_stock, p=[.6, .25, .15]),
+                             'Qty': rng.integers(1, 20, n_stock).astype(float),
+                             'Price': rng.uniform(20, 300, n_stock).round(2),
+                             'Exchange_Rate': rng.uniform(1250, 1480, n_stock), 'Fee': rng.uniform(0, 2, n_stock)})
+    return df_stock, df_cash
+
+
+def legacy_history(df_stock, df_cash):
+    """예전 calculate_history 그대로 (비교 기준)"""
+    start_date = min(pd.to_datetime(df_stock['Date']).min(), pd.to_datetime(df_cash['Date']).min())
+    history = []; cum_cash_krw = 0; cum_cash_usd = 0; cum_invested_krw = 0
+    cum_stock_qty = {t: 0 for t in TICKERS}
+    df_s = df_stock.copy(); df_s['Date'] = pd.to_datetime(df_s['Date'])
+    df_c = df_cash.copy(); df_c['Date'] = pd.to_datetime(df_c['Date'])
+    for d in pd.date_range(start=start_date, end=pd.Timestamp.today()):
+        for _, row in df_c[df_c['Date'] == d].iterrows():
+            if row['Type'] == 'Deposit': cum_cash_krw += row['Amount_KRW']; cum_invested_krw += row['Amount_KRW']
+            elif row['Type'] == 'Withdraw': cum_cash_krw -= row['Amount_KRW']; cum_invested_krw -= row['Amount_KRW']
+            elif row['Type'] == 'Exchange': cum_cash_krw -= row['Amount_KRW']; cum_cash_usd += row['Amount_USD']
+            elif row['Type'] == 'Exchange_USD_to_KRW': cum_cash_krw += row['Amount_KRW']; cum_cash_usd -= row['Amount_USD']
+        for _, row in df_s[df_s['Date'] == d].iterrows():
+            if row['Action'] == 'BUY': cum_cash_usd -= row['Qty'] * row['Price'] + row['Fee']; cum_stock_qty[row['Ticker']] += row['Qty']
+            elif row['Action'] == 'SELL': cum_cash_usd += row['Qty'] * row['Price'] - row['Fee']; cum_stock_qty[row['Ticker']] -= row['Qty']
+            elif row['Action'] == 'DIVIDEND': cum_cash_usd += row['Price'] - row['Fee']
+        history.append({'Date': d, 'Total_Invested': cum_invested_krw, 'Cash_KRW': cum_cash_krw,
+                        'Cash_USD': cum_cash_usd, **{f'Stock_{t}': q for t, q in cum_stock_qty.items()}})
+    return pd.DataFrame(history)
+
+
+def main(sizes):
+    print(f"기간 {YEARS}년 (일별 {YEARS * 365 + 2:,}행 내외)")
+    print(f"{'장부 행':>8} | {'예전(초)':>9} | {'지금(초)':>9} | {'배율':>7} | 일치")
+    for n in sizes:
+        df_stock, df_cash = fake_ledger(n)
+        t0 = time.perf_counter()
+        new = ledger.daily_history(ledger.run_ledger(df_stock, df_cash))
+        t_new = time.perf_counter() - t0
+        if n <= LEGACY_MAX_ROWS:
+            t0 = time.perf_counter()
+            old = legacy_history(df_stock, df_cash)
+            t_old = time.perf_counter() - t0
+            same = np.allclose(old.drop(columns='Date').values, new[old.columns].drop(columns='Date').values)
+            print(f"{n:>8,} | {t_old:>9.3f} | {t_new:>9.3f} | {t_old / t_new:>6.0f}x | {'✅' if same else '❌'}")
+        else:
+            print(f"{n:>8,} | {'-':>9} | {t_new:>9.3f} | {'-':>7} | -")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,72 @@
+"""
+봇 기동(import) 시간 예산 검사.
+
+`import bot`을 새 파이썬 프로세스에서 여러 번 재서 가장 빠른 값을 예산과 비교하고,
+기동 때 불러오면 안 되는 무거운 모듈(네트워크·화면·지표 라이브러리)이 딸려 오지 않았는지 본다.
+둘 중 하나라도 어기면 종료 코드 1 — CI나 커밋 전에 돌리는 용도.
+
+    python benchmarks/bench_import.py                 # 예산 0.75초
+    python benchmarks/bench_import.py --budget 0.7
+    python benchmarks/bench_import.py --module aegis_core --budget 0.3
+    python benchmarks/bench_import.py --top 15        # 느린 import 상위 15개 (python -X importtime)
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 봇이 실제로 시트/시장/텔레그램을 부를 때 함수 안에서 불러오는 것들
+FORBIDDEN = ['gspread', 'oauth2client', 'yfinance', 'requests', 'ta', 'streamlit', 'altair']
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t0
+print(json.dumps({{'seconds': dt, 'modules': sorted(m for m in {forbidden!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module, runs):
+    code = PROBE.format(module=module, forbidden=FORBIDDEN)
+    out = []
+    for _ in range(runs):
+        r = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+        out.append(json.loads(r.stdout.strip().splitlines()[-1]))
+    return min(o['seconds'] for o in out), out[0]['modules']
+
+
+def slowest(module, top):
+    """python -X importtime 결과에서 module이 직접 불러온 것 중 누적 시간이 큰 순서"""
+    r = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                       capture_output=True, text=True, check=True)
+    rows = []
+    for line in r.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line: continue
+        _, cum_us, name = line[len('import time:'):].split('|')
+        # 들여쓰기 한 단계(공백 3칸) = module이 직접 import한 것
+        if name.startswith('   ') and not name.startswith('    '): rows.append((int(cum_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    p = argparse.ArgumentParser(description="import 시간 예산 검사")
+    p.add_argument('--module', default='bot')
+    p.add_argument('--budget', type=float, default=float(os.environ.get('AEGIS_IMPORT_BUDGET', 0.75)), help="초")
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--top', type=int, default=0)
+    args = p.parse_args()
+
+    best, loaded = measure(args.module, args.runs)
+    ok_time, ok_mods = best <= args.budget, not loaded
+    print(f"import {args.module}: {best:.3f}초 (최소 / {args.runs}회) — 예산 {args.budget:.2f}초 {'✅' if ok_time else '❌'}")
+    print(f"딸려 온 무거운 모듈: {', '.join(loaded) if loaded else '없음'} {'✅' if ok_mods else '❌'}")
+    if args.top:
+        for us, name in slowest(args.module, args.top): print(f"  {us / 1e6:7.3f}초  {name}")
+    sys.exit(0 if ok_time and ok_mods else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+지표 모듈(indicators.py) 벤치마크: '봉 하나 추가'마다 드는 시간.
+스트리밍 update vs 전체 다시 계산(일괄 / ta / pandas). 값이 같은지는 tests/test_indicators.py가 본다.
+
+    python benchmarks/bench_indicators.py            # 1천 / 1만 봉
+    python benchmarks/bench_indicators.py 5000 50000
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators as ind
+
+try: import ta
+except ImportError: ta = None
+
+
+def rsi_reference(s):
+    if ta is not None: return ta.momentum.RSIIndicator(s, window=14).rsi().values
+    # ta가 없을 때: ta의 정의 그대로 (pandas ewm, alpha=1/14, adjust=False, min_periods=14)
+    d = s.diff()
+    up, dn = d.where(d > 0, 0.0), -d.where(d < 0, 0.0)
+    eu = up.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    ed = dn.ewm(alpha=1 / 14, min_periods=14, adjust=False).mean()
+    return np.where(ed == 0, 100, 100 - (100 / (1 + eu / ed)))
+
+
+def series(n, seed):
+    # 종가 같은 값: 양수, 가끔 같은 값이 이어짐(무변동 봉), 가끔 큰 점프
+    rng = np.random.default_rng(seed)
+    r = rng.normal(0, 0.015, n) * (rng.random(n) > 0.05) + (rng.random(n) < 0.01) * rng.normal(0, 0.1, n)
+    return pd.Series(100 * np.exp(np.cumsum(r)))
+
+
+def per_bar(n):
+    """n봉이 쌓인 상태에서 봉 하나를 더했을 때 RSI14 + SMA200 + MAX/MIN5를 얻는 시간 (마이크로초)"""
+    s = series(n + 200, 1)
+    x = s.values
+    objs = [ind.WilderRSI(14), ind.SMA(200), ind.RollingMax(5, 1), ind.RollingMin(5, 1)]
+    for v in x[:n]:
+        for o in objs: o.update(v)
+    t0 = time.perf_counter()
+    for v in x[n:]:
+        for o in objs: o.update(v)
+    stream = (time.perf_counter() - t0) / 200
+
+    def bench(fn, reps=5):
+        t0 = time.perf_counter()
+        for k in range(reps): fn(x[:n + k + 1], s.iloc[:n + k + 1])
+        return (time.perf_counter() - t0) / reps
+
+    batch = bench(lambda a, _: (ind.rsi_wilder(a, 14), ind.sma(a, 200), ind.rolling_max(a, 5, 1), ind.rolling_min(a, 5, 1)))
+    pdref = bench(lambda _, ss: (rsi_reference(ss), ss.rolling(200).mean(), ss.rolling(5, min_periods=1).max(),
+                                 ss.rolling(5, min_periods=1).min()))
+    return stream * 1e6, batch * 1e6, pdref * 1e6
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000]
+    print("봉 하나 추가당 RSI14+SMA200+MAX5+MIN5 (마이크로초)")
+    print(f"{'봉 수':>8} | {'스트리밍':>8} | {'전체 일괄':>9} | {'ta+pandas':>10} | 배율(ta/스트리밍)")
+    for n in sizes:
+        st_us, b_us, p_us = per_bar(n)
+        print(f"{n:>8,} | {st_us:>8.1f} | {b_us:>9.0f} | {p_us:>10.0f} | {p_us / st_us:,.0f}x")
+
+
+if __name__ == '__main__':
+    main()
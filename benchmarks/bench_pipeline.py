@@ -0,0 +1,93 @@
+"""
+봇 한 번 실행(run_bot)의 끝-끝 지연 벤치마크 — 로컬 스텁 서버(stub_services.py) 상대로.
+
+시트·시세(8종목)·텔레그램 응답마다 같은 지연을 넣고, 입력 파이프라인의 동시 실행 수를
+1(예전처럼 하나씩 차례로)과 기본값(AEGIS_IO_CONCURRENCY)으로 바꿔 가며 잰다.
+가격 저장소가 빈 콜드 실행과, 저장소·시트 사본이 이미 있는 웜 실행을 따로 본다.
+
+    python benchmarks/bench_pipeline.py                 # 지연 0.2초
+    python benchmarks/bench_pipeline.py --latency 0.5 --concurrency 8
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from stub_services import StubServices
+
+STOCK = [["Date", "Ticker", "Action", "Qty", "Price", "Exchange_Rate", "Fee"],
+         ["2026-01-07", "QQQM", "BUY", "2", "200", "1400", "0"],
+         ["2026-02-03", "SGOV", "BUY", "5", "100.5", "1410", "0"]]
+CASH = [["Date", "Type", "Amount_KRW", "Amount_USD", "Ex_Rate"],
+        ["2026-01-05", "Deposit", "5000000", "0", "0"],
+        ["2026-01-06", "Exchange", "4200000", "3000", "1400"]]
+
+
+def configure(stub, workdir):
+    # bot/price_store/sheet_mirror는 import할 때 환경변수를 읽으므로 import 전에 설정
+    os.environ.update({'AEGIS_YAHOO_URL': stub.url, 'AEGIS_SHEETS_API': stub.url, 'AEGIS_TELEGRAM_API': stub.url,
+                       'AEGIS_PRICE_STORE': os.path.join(workdir, 'prices'),
+                       'AEGIS_SHEET_MIRROR': os.path.join(workdir, 'mirror.sqlite'),
+                       'AEGIS_LEDGER_CHECKPOINT': os.path.join(workdir, 'ledger.pkl'),
+                       'AEGIS_NOTIFY_STATE': os.path.join(workdir, 'sent.json'),
+                       'AEGIS_RUN_STATE': os.path.join(workdir, 'inputs.json')})
+
+
+def timed_run(bot, concurrency):
+    bot.IO_CONCURRENCY = concurrency
+    # 같은 신호는 한 번만 보내므로, 매번 전송까지 재려면 보낸 신호 기록을 지우고 돈다
+    with contextlib.suppress(FileNotFoundError): os.remove(bot.notifier.STATE_PATH)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): bot.run_bot()
+    return time.perf_counter() - t0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--latency', type=float, default=0.2)
+    p.add_argument('--concurrency', type=int, default=0, help="0이면 봇 기본값")
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    stub = StubServices(args.latency, sheets={'Sheet1': [r[:] for r in STOCK], 'CashFlow': [r[:] for r in CASH]}).start()
+    import shutil
+    roots = []
+    try:
+        configure(stub, tempfile.mkdtemp())
+        import bot
+        conc = args.concurrency or bot.IO_CONCURRENCY
+        # 시각에 따라 신호가 달라지지 않도록 장·은행 시간으로 고정 (텔레그램 전송까지 포함해 재기)
+        bot.is_market_open = lambda now=None: (True, "장 운영 중 🟢")
+        bot.is_banking_hours = lambda now=None: True
+        print(f"스텁 지연 {args.latency:.2f}초/요청, 시세 {len(bot.SNAPSHOT_TICKERS)}종목")
+        print(f"{'':>6} | {'동시 1(차례로)':>14} | {f'동시 {conc}':>10} | 배율")
+        for label in ['콜드', '웜']:
+            res = {}
+            for c in (1, conc):
+                best = float('inf')
+                for _ in range(args.repeat if label == '웜' else 1):
+                    if label == '콜드':
+                        # 매번 빈 저장소·빈 사본에서 시작
+                        d = tempfile.mkdtemp(); roots.append(d); configure(stub, d)
+                        bot.price_store.STORE_DIR = os.environ['AEGIS_PRICE_STORE']
+                        bot.sheet_mirror.DB_PATH = os.environ['AEGIS_SHEET_MIRROR']
+                        bot.ledger.CHECKPOINT_PATH = os.environ['AEGIS_LEDGER_CHECKPOINT']
+                        bot.notifier.STATE_PATH = os.environ['AEGIS_NOTIFY_STATE']
+                        bot.RUN_STATE_PATH = os.environ['AEGIS_RUN_STATE']
+                    best = min(best, timed_run(bot, c))
+                res[c] = best
+            print(f"{label:>6} | {res[1]:>13.2f}초 | {res[conc]:>9.2f}초 | {res[1] / res[conc]:.1f}x")
+        print(f"요청 수: {stub.hits}, 텔레그램 메시지 {len(stub.messages)}건")
+    finally:
+        stub.stop()
+        for d in roots: shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
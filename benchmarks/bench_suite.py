@@ -0,0 +1,219 @@
+"""
+장부·점수·백테스트 핫패스의 스케일링 벤치마크 + 회귀 검사 (네트워크 없이, 노트북에서).
+
+장부는 계속 늘어나기만 하므로 가짜 장부 1천 / 1만 / 10만 행, 가격은 가짜 일봉 5 / 10 / 25년(synthetic.py)에서
+각 경로의 시간(REPEAT번 중 최소)과 최대 메모리(tracemalloc, 한 번 따로)를 재서 JSON 기준선과 비교한다.
+- calculate_wallet_balance_detail · 환전 평단(calculate_my_avg_exchange_rate → lg['avg_fx']) · 세금 원가는
+  전부 ledger.run_ledger 한 번의 순회에서 나온다 → 'run_ledger'로 잰다. 봇처럼 체크포인트 뒤에 한 줄 붙은 경우도 따로.
+- calculate_tax_guard → ledger.tax_summary, calculate_history → ledger.daily_history (run_ledger 결과에서)
+- calculate_aegis_master_score: 하루 한 번씩 부르는 스칼라 함수 × 일수, 백테스트가 쓰는 배열 버전 한 번
+- bt_run: bt_load 모양의 프레임 + 매월 납입 스케줄
+
+시간이 기준보다 --tolerance(비율) 넘게, 그리고 MIN_DELTA_SEC 넘게 느려졌거나 메모리가 --mem-tolerance 넘게 늘면
+회귀로 표시하고 종료 코드 1. 기준선은 기계마다 다르므로 저장소에 넣지 않는다 (.gitignore).
+
+    python benchmarks/bench_suite.py --save            # 지금 결과를 기준선으로 저장 (전부 1분 안팎)
+    python benchmarks/bench_suite.py                   # 기준선과 비교
+    python benchmarks/bench_suite.py --rows 1000 10000 --years 5 --only run_ledger bt_run
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+import ledger
+import indicators
+from aegis_core import calculate_aegis_master_score, calculate_aegis_master_score_array
+from backtest import bt_run
+import synthetic
+
+BASELINE_PATH = os.path.join(HERE, 'baseline.json')
+ROWS = [1000, 10000, 100000]
+YEARS = [5, 10, 25]
+REPEAT = 3
+MIN_DELTA_SEC = 0.005   # 이보다 작은 차이는 잡음으로 보고 회귀로 치지 않는다
+MONTHLY_DEPOSIT = 1000000
+
+
+def fake_market(years, seed=0):
+    """bt_load 모양(P, VIX, FX, DXY + RSI, MA200, FX_MA60, DXY_MA20)의 가짜 영업일 시계열 (P는 QQQ)"""
+    paths = synthetic.market_paths(years, seed)
+    df = pd.DataFrame({'P': paths['QQQ'], 'VIX': paths['^VIX'], 'FX': paths['KRW=X'], 'DXY': paths['DX-Y.NYB']})
+    df['RSI'] = indicators.rsi_wilder(df['P'], 14)
+    df['MA200'] = indicators.sma(df['P'], 200, min_periods=60)
+    df['FX_MA60'] = indicators.sma(df['FX'], 60, min_periods=20)
+    df['DXY_MA20'] = indicators.sma(df['DXY'], 20, min_periods=5)
+    return df.dropna()
+
+
+# ==========================================
+# 📒 장부 (행 수 축)
+# ==========================================
+def ledger_case(fn):
+    def setup(n):
+        df_stock, df_cash = synthetic.ledger(n)
+        return fn(df_stock, df_cash)
+    return setup
+
+
+def _run_ledger(df_stock, df_cash):
+    return lambda: ledger.run_ledger(df_stock, df_cash)
+
+
+def _run_ledger_append(df_stock, df_cash):
+    # 봇 실행처럼: 체크포인트가 앞 n-1줄까지 있고 매수 한 줄이 새로 붙었다
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, 'ledger.pkl')
+    ledger.run_ledger(df_stock.iloc[:-1], df_cash, checkpoint=path)
+    tail = pd.DataFrame([{'Date': pd.Timestamp.today().strftime('%Y-%m-%d'), 'Ticker': 'QQQM', 'Action': 'BUY',
+                          'Qty': 1.0, 'Price': 200.0, 'Exchange_Rate': 1400.0, 'Fee': 0.0}])
+    grown = pd.concat([df_stock.iloc[:-1], tail], ignore_index=True)
+
+    def run():
+        # 매번 '한 줄 붙은 직후' 상태에서 시작하도록 체크포인트를 되돌려 둔다
+        shutil.copyfile(path + '.base', path)
+        return ledger.run_ledger(grown, df_cash, checkpoint=path)
+    shutil.copyfile(path, path + '.base')
+    return run
+
+
+def _tax_summary(df_stock, df_cash):
+    lg = ledger.run_ledger(df_stock, df_cash)
+    year = max(lg['realized'], default=pd.Timestamp.today().year)
+    return lambda: ledger.tax_summary(lg, year)
+
+
+def _daily_history(df_stock, df_cash):
+    lg = ledger.run_ledger(df_stock, df_cash)
+    return lambda: ledger.daily_history(lg)
+
+
+# ==========================================
+# 📈 점수·백테스트 (기간 축)
+# ==========================================
+def _score_scalar(years):
+    df = fake_market(years)
+    rows = list(zip(df['P'], df['RSI'], df['VIX'], df['MA200'], df['FX'], df['FX_MA60'], df['DXY'],
+                    df['DXY_MA20'], df.index.day))
+    return lambda: [calculate_aegis_master_score('QQQM', p, r, v, m, fx, fx, fm, d, dm, 30.0, 20.0, 500000, sim_day=day)
+                    for p, r, v, m, fx, fm, d, dm, day in rows]
+
+
+def _score_array(years):
+    df = fake_market(years)
+    return lambda: calculate_aegis_master_score_array(df['P'].values, df['RSI'].values, df['VIX'].values,
+                                                      df['MA200'].values, df['FX'].values, df['FX'].values,
+                                                      df['FX_MA60'].values, df['DXY'].values, df['DXY_MA20'].values,
+                                                      30.0, 20.0, 500000, day=df.index.day.values)
+
+
+def _bt_run(years):
+    df = fake_market(years)
+    sched = {p.strftime('%Y-%m'): MONTHLY_DEPOSIT for p in pd.period_range(df.index[0], df.index[-1], freq='M')}
+    return lambda: bt_run(df, sched, 70, 0.01, 30.0, 0.20)
+
+
+# (이름, 축, 크기 → 잴 함수)
+CASES = [
+    ('run_ledger', 'rows', ledger_case(_run_ledger)),
+    ('run_ledger +1행', 'rows', ledger_case(_run_ledger_append)),
+    ('calculate_tax_guard', 'rows', ledger_case(_tax_summary)),
+    ('calculate_history', 'rows', ledger_case(_daily_history)),
+    ('master_score 스칼라×일수', 'years', _score_scalar),
+    ('master_score 배열', 'years', _score_array),
+    ('bt_run', 'years', _bt_run),
+]
+
+
+def measure(fn, repeat):
+    fn()   # 첫 호출(지연 import·캐시 채우기)은 빼고 잰다
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'sec': best, 'peak_mb': peak / 2 ** 20}
+
+
+def run_all(rows, years, only, repeat):
+    results = {}
+    for name, axis, setup in CASES:
+        if only and name not in only: continue
+        for size in (rows if axis == 'rows' else years):
+            results[f"{name} @ {size:,}{'행' if axis == 'rows' else '년'}"] = measure(setup(size), repeat)
+    return results
+
+
+def compare(results, baseline, tol, mem_tol):
+    """(키, 지금, 기준, 회귀 표시 목록) — 기준에 없는 키는 기준 None"""
+    out = []
+    for key, r in results.items():
+        b = baseline.get(key)
+        flags = []
+        if b:
+            if r['sec'] > b['sec'] * (1 + tol) and r['sec'] - b['sec'] > MIN_DELTA_SEC: flags.append('시간')
+            if r['peak_mb'] > b['peak_mb'] * (1 + mem_tol): flags.append('메모리')
+        out.append((key, r, b, flags))
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument('--rows', type=int, nargs='+', default=ROWS)
+    p.add_argument('--years', type=int, nargs='+', default=YEARS)
+    p.add_argument('--only', nargs='+', default=None, help="잴 경우 이름 (기본: 전부)")
+    p.add_argument('--repeat', type=int, default=REPEAT)
+    p.add_argument('--baseline', default=BASELINE_PATH)
+    p.add_argument('--save', action='store_true', help="결과를 기준선으로 저장 (같은 키만 덮어쓴다)")
+    p.add_argument('--tolerance', type=float, default=0.25, help="시간 회귀 기준 (비율)")
+    p.add_argument('--mem-tolerance', type=float, default=0.10, help="메모리 회귀 기준 (비율)")
+    args = p.parse_args()
+
+    base = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f: base = json.load(f)
+    results = run_all(args.rows, args.years, args.only, args.repeat)
+    rows = compare(results, base.get('results', {}), args.tolerance, args.mem_tolerance)
+
+    if base: print(f"기준선: {args.baseline} ({base['meta']['saved']}, {base['meta']['machine']})")
+    else: print("기준선 없음 — --save로 먼저 저장하세요")
+    print(f"{'경우':<34} | {'시간(초)':>9} | {'기준':>9} | {'배율':>6} | {'메모리(MB)':>10} | {'기준':>8} | 회귀")
+    for key, r, b, flags in rows:
+        ratio = f"{r['sec'] / b['sec']:.2f}x" if b and b['sec'] else '-'
+        b_sec, b_mb = (f"{b['sec']:.4f}", f"{b['peak_mb']:.1f}") if b else ('-', '-')
+        print(f"{key:<34} | {r['sec']:>9.4f} | {b_sec:>9} | {ratio:>6} | {r['peak_mb']:>10.1f} | {b_mb:>8} | "
+              f"{'❌ ' + '·'.join(flags) if flags else ('✅' if b else '-')}")
+
+    if args.save:
+        saved = dict(base.get('results', {}), **results)
+        meta = {'saved': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M'),
+                'machine': f"{platform.machine()} / {platform.processor() or platform.system()}",
+                'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+        tmp = args.baseline + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump({'meta': meta, 'results': saved}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, args.baseline)
+        print(f"기준선 저장: {args.baseline} ({len(results)}건)")
+    regressed = [key for key, _, _, flags in rows if flags]
+    if regressed: print(f"\n❌ 회귀 {len(regressed)}건: {', '.join(regressed)}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+봇이 부르는 외부 서비스 3종(Yahoo 시세, 구글 시트/드라이브, 텔레그램)의 로컬 스텁 서버.
+
+실제 응답 모양만 흉내 내고, 서비스별로 지연(초)을 줄 수 있다. 봇은 환경변수로 이 서버를 가리킨다:
+    AEGIS_YAHOO_URL=http://127.0.0.1:8765      (price_providers → /v8/finance/chart/{종목})
+    AEGIS_SHEETS_API=http://127.0.0.1:8765     (sheet_mirror → /v4/spreadsheets/.., /drive/v3/files/..)
+    AEGIS_TELEGRAM_API=http://127.0.0.1:8765   (notifier → /bot{토큰}/sendMessage)
+
+    python benchmarks/stub_services.py --port 8765 --latency 0.2   # 띄워두고 손으로 봇 돌려보기
+코드에서는 StubServices(latency=...).start() → .url, .messages, .hits, .stop()
+텔레그램은 실제처럼 4096자(UTF-16) 넘는 글을 400으로 거절하고, .telegram_faults에 넣어 둔 실패를 차례로 돌려준다:
+    stub.telegram_faults += [(429, 1), 500, 400]   # 429(1초 뒤 재시도) → 500 → 400 다음부터 정상
+"""
+import re
+import zlib
+import json
+import time
+import threading
+import argparse
+from functools import lru_cache
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+import numpy as np
+import pandas as pd
+
+BASE_PRICE = {'^VIX': 18.0, 'QQQM': 200.0, 'SPYM': 70.0, 'QLD': 100.0, 'SGOV': 100.5, 'GMMF': 100.0,
+              'KRW=X': 1400.0, 'DX-Y.NYB': 100.0, 'QQQ': 480.0, 'SPY': 560.0, 'BIL': 91.5}
+
+
+ANCHOR = pd.Timestamp('2000-01-03')
+ALL_DAYS = pd.bdate_range(ANCHOR, '2040-12-31')
+
+
+@lru_cache(maxsize=None)
+def _path(ticker):
+    # 종목 이름으로 시드를 정한 2000~2040년 가짜 종가 (같은 종목·날짜는 언제 불러도 같은 값)
+    # 기준가 근처를 맴도는 AR(1) 로그 가격 (랜덤워크처럼 멀리 떠내려가지 않게)
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    noise, x = rng.normal(0, 0.01, len(ALL_DAYS)), np.empty(len(ALL_DAYS))
+    x[0] = 0.0
+    for i in range(1, len(x)): x[i] = 0.99 * x[i - 1] + noise[i]
+    return BASE_PRICE.get(ticker, 100.0) * np.exp(x)
+
+
+def fake_bars(ticker, p1, p2):
+    lo, hi = ALL_DAYS.searchsorted(pd.Timestamp(p1, unit='s').normalize()), \
+        ALL_DAYS.searchsorted(pd.Timestamp(p2, unit='s').normalize(), side='right')
+    days = ALL_DAYS[lo:hi]
+    ts = [int((d + pd.Timedelta(hours=14, minutes=30)).timestamp()) for d in days]   # 뉴욕 장 시작 = 14:30 UTC
+    return ts, _path(ticker)[lo:hi]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *a): pass
+
+    def _reply(self, body, code=200):
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        n = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(n).decode() if n else ''
+        if self.headers.get('Content-Type', '').startswith('application/json'): return json.loads(raw or '{}')
+        return {k: v[0] for k, v in parse_qs(raw).items()}
+
+    def _route(self, method):
+        st = self.server.stub
+        u = urlparse(self.path)
+        path, q = unquote(u.path), {k: v[0] for k, v in parse_qs(u.query).items()}
+        if path.startswith('/v8/finance/chart/'): service = 'yahoo'
+        elif path.startswith('/bot'): service = 'telegram'
+        else: service = 'sheets'
+        with st.lock: st.hits[service] = st.hits.get(service, 0) + 1
+        time.sleep(st.latency.get(service, 0.0))
+
+        if service == 'yahoo':
+            t = path.rsplit('/', 1)[1]
+            ts, close = fake_bars(t, int(q['period1']), int(q['period2']))
+            c = [round(float(x), 4) for x in close]
+            return self._reply({'chart': {'result': [{
+                'meta': {'symbol': t, 'exchangeTimezoneName': 'America/New_York'}, 'timestamp': ts,
+                'indicators': {'quote': [{'open': c, 'high': c, 'low': c, 'close': c, 'volume': [0] * len(c)}],
+                               'adjclose': [{'adjclose': c}]}}], 'error': None}})
+        if service == 'telegram':
+            text = self._body().get('text', '')
+            with st.lock:
+                fault = st.telegram_faults.pop(0) if st.telegram_faults else None
+                if fault is None and len(text.encode('utf-16-le')) // 2 > 4096: fault = (400, 'message is too long')
+                if fault is None:
+                    st.messages.append(text)
+                    return self._reply({'ok': True, 'result': {'message_id': len(st.messages)}})
+            code, extra = fault if isinstance(fault, tuple) else (fault, None)
+            desc = {429: 'Too Many Requests', 500: 'Internal Server Error'}.get(code, 'Bad Request')
+            body = {'ok': False, 'error_code': code, 'description': desc}
+            if code == 429:
+                wait = 1 if extra is None else extra
+                body.update(description=f"{desc}: retry after {wait}", parameters={'retry_after': wait})
+            elif extra: body['description'] = f"{desc}: {extra}"
+            return self._reply(body, code)
+
+        m = re.match(r'/drive/v3/files/[^/]+$', path)
+        if m: return self._reply({'modifiedTime': st.modified})
+        m = re.match(r'/v4/spreadsheets/[^/]+/values/([^!:]+)(![^:]*:?[^:]*)?(:append|:clear)?$', path)
+        if not m: return self._reply({'error': 'not found'}, 404)
+        name, rng, op = m.group(1), m.group(2), m.group(3)
+        with st.lock:
+            if name not in st.sheets: return self._reply({'error': f'Unable to parse range: {name}'}, 400)
+            if method == 'GET':
+                vals = st.sheets[name][:1] if rng == '!1:1' else st.sheets[name]
+                return self._reply({'range': name, 'values': vals})
+            if op == ':append':
+                rows = [[str(v) for v in r] for r in self._body()['values']]
+                st.sheets[name].extend(rows); st.touch()
+                return self._reply({'updates': {'updatedRows': len(rows)}})
+            if op == ':clear':
+                st.sheets[name] = []; st.touch()
+                return self._reply({'clearedRange': name})
+            if method == 'PUT':
+                st.sheets[name] = [[str(v) for v in r] for r in self._body()['values']]; st.touch()
+                return self._reply({'updatedRows': len(st.sheets[name])})
+        return self._reply({'error': 'bad request'}, 400)
+
+    def do_GET(self): self._route('GET')
+    def do_POST(self): self._route('POST')
+    def do_PUT(self): self._route('PUT')
+
+
+class StubServices:
+    """sheets: {'Sheet1': [[헤더..], [값..]], 'CashFlow': [...]} (모든 값은 시트처럼 글자)"""
+    def __init__(self, latency=0.0, sheets=None, port=0):
+        self.latency = latency if isinstance(latency, dict) else {k: latency for k in ('yahoo', 'sheets', 'telegram')}
+        self.sheets = sheets if sheets is not None else {'Sheet1': [], 'CashFlow': []}
+        self.messages, self.hits = [], {}
+        self.telegram_faults = []   # 다음 텔레그램 요청들이 돌려받을 실패: 상태 코드 또는 (429, retry_after초)
+        self.lock = threading.Lock()
+        self.touch()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self.server.stub = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def touch(self):
+        self.modified = datetime.now(timezone.utc).isoformat(timespec='microseconds').replace('+00:00', 'Z')
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description="Yahoo/Sheets/Telegram 로컬 스텁 서버")
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--latency', type=float, default=0.0, help="모든 응답 앞에 넣을 지연(초)")
+    args = p.parse_args()
+    stub = StubServices(args.latency, port=args.port).start()
+    print(f"스텁 서버: {stub.url} (Ctrl-C로 종료)")
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt: stub.stop()
@@ -0,0 +1,229 @@
+"""
+가짜 장부 + 가짜 시장 생성기 — 라이브 구글 시트·Yahoo 없이 app.py/bot.py/백테스트를 돌리고 부하를 주기 위한 것.
+
+- market_paths(years): 국면(calm / normal / crisis)이 바뀌는 상관된 일별 종가. 국면은 마르코프 체인으로
+  평균 지속 기간만큼 이어지고, 국면마다 기대수익·변동성·VIX 수준·원달러 추세와 요인 간 상관(주식↓ → VIX↑·원달러↑,
+  원달러 ~ 달러인덱스)이 다르다. 앱·봇·백테스트가 쓰는 종목(대용 ETF 포함) + ^VIX, KRW=X, DX-Y.NYB
+- market(years): 위 종가를 종목별 OHLCV 프레임(price_store 모양)으로
+- ledger(n_rows): Sheet1·CashFlow와 같은 컬럼·같은 유형(Deposit/Exchange/Exchange_USD_to_KRW/Withdraw,
+  BUY/SELL/DIVIDEND)의 두 프레임. 가격·환율은 market_paths에서 그날 값을 가져오고, 매도는 앞선 매수 한 건의
+  물량 안에서만 해서 보유 수량이 음수가 되지 않는다. 시트처럼 날짜순
+같은 seed면 같은 결과. 전부 NumPy 배열 연산이라(국면 구간 수만큼만 파이썬 루프) 100만 행에 2초 안팎이다.
+
+    python benchmarks/synthetic.py OUT --rows 100000 --years 10 --seed 0
+    → OUT/sheets/{Sheet1,CashFlow}.csv, OUT/prices/{종목}.csv. 이걸로 네트워크 없이:
+      AEGIS_SHEET_DIR=OUT/sheets AEGIS_PRICE_FIXTURES=OUT/prices python bot.py
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import price_providers
+from sheet_mirror import STOCK_COLS, CASH_COLS
+
+TRADING_DAYS = 252
+LEDGER_TICKERS = ['QQQM', 'SPYM', 'QLD', 'SGOV', 'GMMF']
+LEDGER_WEIGHTS = [.35, .25, .15, .15, .10]
+
+# 국면: (주식 연 기대수익, 주식 연 변동성, VIX 수준, 원달러 연 추세, 원달러 연 변동성, 평균 지속 영업일)
+REGIMES = ['calm', 'normal', 'crisis']
+REGIME_PARAMS = np.array([[0.14, 0.12, 14.0, -0.02, 0.05, 250],
+                          [0.08, 0.18, 19.0, 0.00, 0.07, 120],
+                          [-0.35, 0.45, 38.0, 0.15, 0.14, 40]])
+# 국면이 끝날 때 다음 국면으로 넘어갈 확률 (자기 자신으로는 안 감)
+TRANSITION = np.array([[0.0, 0.8, 0.2],
+                       [0.6, 0.0, 0.4],
+                       [0.3, 0.7, 0.0]])
+# 요인 순서: 주식, VIX, 원달러(KRW=X), 달러인덱스(DXY). 위기일수록 서로 더 강하게 묶인다
+FACTOR_CORR = np.array([
+    [[1, -.60, -.20, .00], [-.60, 1, .20, .00], [-.20, .20, 1, .40], [.00, .00, .40, 1]],
+    [[1, -.70, -.35, .10], [-.70, 1, .30, .05], [-.35, .30, 1, .50], [.10, .05, .50, 1]],
+    [[1, -.80, -.50, .10], [-.80, 1, .40, .05], [-.50, .40, 1, .60], [.10, .05, .60, 1]]])
+# 종목: (주식 요인 베타, 고유 일 변동성, 시작가). 현금성 ETF는 연 CASH_YIELD로 거의 직선
+EQUITIES = {'QQQ': (1.15, 0.004, 100.0), 'SPY': (1.0, 0.0015, 120.0)}
+SHARE_CLASS = {'QQQM': ('QQQ', 1 / 2.3), 'SPYM': ('SPY', 1 / 8.0)}   # 같은 지수를 따르는 싼 주식
+LEVERAGED = {'QLD': ('QQQ', 2.0, 0.0095)}                            # (기초, 배수, 연 보수)
+CASH_LIKE = {'SGOV': 100.0, 'BIL': 91.0, 'GMMF': 50.0}
+CASH_YIELD = 0.045
+VIX_PERSISTENCE = 0.9   # 로그 VIX의 AR(1) 계수
+FX_SPREAD = 0.00175
+
+
+def regime_path(n, rng):
+    """n일 동안의 국면 번호 배열. 구간 길이는 국면별 평균 지속일의 기하분포"""
+    mean_len = REGIME_PARAMS[:, 5]
+    states, lengths, s, total = [], [], 1, 0
+    while total < n:
+        # 한 번에 여러 구간씩 뽑아 두고 체인만 파이썬으로 잇는다
+        u, g = rng.random(64), rng.random(64)
+        for k in range(64):
+            length = int(np.ceil(np.log1p(-g[k]) / np.log1p(-1 / mean_len[s])))
+            states.append(s); lengths.append(length); total += length
+            s = int(np.searchsorted(np.cumsum(TRANSITION[s]), u[k], side='right'))
+            if total >= n: break
+    return np.repeat(states, lengths)[:n]
+
+
+def market_paths(years=10, seed=0, end=None, start_fx=1150.0, start_dxy=95.0):
+    """영업일 인덱스의 종가 프레임 (종목 컬럼 + ^VIX, KRW=X, DX-Y.NYB + Regime)"""
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range(end=pd.Timestamp(end or pd.Timestamp.today()).normalize(), periods=int(years * TRADING_DAYS))
+    n = len(idx)
+    reg = regime_path(n, rng)
+    p = REGIME_PARAMS[reg]
+    chol = np.linalg.cholesky(FACTOR_CORR)[reg]                  # (n, 4, 4)
+    e = np.einsum('nij,nj->ni', chol, rng.standard_normal((n, 4)))
+    dt = 1 / TRADING_DAYS
+
+    mkt = (p[:, 0] - p[:, 1] ** 2 / 2) * dt + p[:, 1] * np.sqrt(dt) * e[:, 0]
+    out = {}
+    for t, (beta, idio, s0) in EQUITIES.items():
+        out[t] = s0 * np.exp(np.cumsum(beta * mkt + idio * rng.standard_normal(n)))
+    for t, (base, scale) in SHARE_CLASS.items():
+        out[t] = out[base] * scale
+    for t, (base, lev, fee) in LEVERAGED.items():
+        r = np.concatenate([[0.0], out[base][1:] / out[base][:-1] - 1])
+        out[t] = 50.0 * np.cumprod(np.maximum(1 + lev * r - fee * dt, 0.01))
+    for t, s0 in CASH_LIKE.items():
+        out[t] = s0 * np.exp(np.cumsum(CASH_YIELD * dt + 0.0001 * rng.standard_normal(n)))
+
+    # VIX: 국면 수준으로 돌아가려는 로그 AR(1). ewm(adjust=False)이 바로 그 점화식이라 C 루프 한 번
+    target = np.log(p[:, 2]) + 0.8 * e[:, 1]
+    log_vix = pd.Series(target).ewm(alpha=1 - VIX_PERSISTENCE, adjust=False).mean().values
+    out['^VIX'] = np.clip(np.exp(log_vix), 9.0, 85.0)
+    out['KRW=X'] = start_fx * np.exp(np.cumsum(p[:, 3] * dt + p[:, 4] * np.sqrt(dt) * e[:, 2]))
+    out['DX-Y.NYB'] = start_dxy * np.exp(np.cumsum(p[:, 4] * 0.9 * np.sqrt(dt) * e[:, 3]))
+    df = pd.DataFrame(out, index=pd.Index(idx, name='Date'))
+    df['Regime'] = pd.Categorical.from_codes(reg, REGIMES)
+    return df
+
+
+def market(years=10, seed=0, end=None, paths=None):
+    """{종목: OHLCV 프레임} — 시가는 전날 종가에서 작은 갭, 고가·저가는 그날 변동성만큼 벌린다"""
+    paths = market_paths(years, seed, end) if paths is None else paths
+    rng = np.random.default_rng(seed + 1)
+    vol = REGIME_PARAMS[paths['Regime'].cat.codes.values, 1] / np.sqrt(TRADING_DAYS)
+    frames = {}
+    for t in paths.columns.drop('Regime'):
+        close = paths[t].values
+        n = len(close)
+        open_ = np.concatenate([[close[0]], close[:-1]]) * np.exp(0.25 * vol * rng.standard_normal(n))
+        high = np.maximum(open_, close) * np.exp(0.5 * vol * np.abs(rng.standard_normal(n)))
+        low = np.minimum(open_, close) * np.exp(-0.5 * vol * np.abs(rng.standard_normal(n)))
+        volume = 0.0 if t in ('^VIX', 'KRW=X', 'DX-Y.NYB') else np.round(1e6 * np.exp(rng.normal(0, .3, n)) * vol / vol.min())
+        frames[t] = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                                 index=paths.index)
+    return frames
+
+
+def _dates(rng, index, size):
+    return rng.integers(0, len(index), size)
+
+
+def _str_dates(index, pos):
+    return np.datetime_as_string(index.values[pos].astype('datetime64[D]'))
+
+
+def ledger(n_rows, years=10, seed=0, end=None, paths=None):
+    """(df_stock, df_cash): 시트에서 읽은 것과 같은 모양. 행의 1/3이 CashFlow, 나머지가 Sheet1"""
+    paths = market_paths(years, seed, end) if paths is None else paths
+    rng = np.random.default_rng(seed + 2)
+    idx = paths.index
+    fx = paths['KRW=X'].values
+    n_cash = n_rows // 3
+    n_stock = n_rows - n_cash
+
+    # 💵 CashFlow
+    kind = rng.choice(['Deposit', 'Exchange', 'Exchange_USD_to_KRW', 'Withdraw'], n_cash, p=[.4, .4, .1, .1])
+    pos = _dates(rng, idx, n_cash)
+    krw = np.round(np.exp(rng.normal(np.log(1e6), .6, n_cash)), -4)
+    rate = np.where(kind == 'Exchange', fx[pos] * (1 + FX_SPREAD),
+                    np.where(kind == 'Exchange_USD_to_KRW', fx[pos] * (1 - FX_SPREAD), 0.0)).round(2)
+    krw = np.where(kind == 'Withdraw', np.round(krw / 4, -4), krw)
+    usd = np.where(rate > 0, np.round(krw / np.where(rate > 0, rate, 1), 2), 0.0)
+    df_cash = pd.DataFrame({'Date': _str_dates(idx, pos), 'Type': kind, 'Amount_KRW': krw,
+                            'Amount_USD': usd, 'Ex_Rate': rate})
+
+    # 📈 Sheet1: 매수 → (그 매수 물량 안에서) 나중 매도, 배당
+    n_sell = int(n_stock * .25)
+    n_div = int(n_stock * .15)
+    n_buy = n_stock - n_sell - n_div
+    tick = rng.choice(len(LEDGER_TICKERS), n_buy, p=LEDGER_WEIGHTS)
+    close = paths[LEDGER_TICKERS].values
+    b_pos = _dates(rng, idx, n_buy)
+    b_qty = rng.integers(1, 20, n_buy).astype(float)
+    lot = rng.choice(n_buy, min(n_sell, n_buy), replace=False)
+    s_pos = np.minimum(b_pos[lot] + rng.geometric(1 / 120, len(lot)), len(idx) - 1)
+    s_qty = np.ceil(rng.random(len(lot)) * b_qty[lot])
+    d_tick = rng.choice(len(LEDGER_TICKERS), n_div, p=LEDGER_WEIGHTS)
+    d_pos = _dates(rng, idx, n_div)
+
+    pos = np.concatenate([b_pos, s_pos, d_pos])
+    t = np.concatenate([tick, tick[lot], d_tick])
+    qty = np.concatenate([b_qty, s_qty, np.ones(n_div)])
+    price = np.concatenate([close[b_pos, tick] * (1 + .002 * rng.standard_normal(n_buy)),
+                            close[s_pos, tick[lot]] * (1 + .002 * rng.standard_normal(len(lot))),
+                            np.exp(rng.normal(np.log(20), .5, n_div))]).round(2)
+    fee = np.where(np.arange(len(pos)) < n_buy + len(lot), np.round(qty * price * 0.0007, 2), 0.0)
+    df_stock = pd.DataFrame({'Date': _str_dates(idx, pos), 'Ticker': np.array(LEDGER_TICKERS)[t],
+                             'Action': np.repeat(['BUY', 'SELL', 'DIVIDEND'], [n_buy, len(lot), n_div]),
+                             'Qty': qty, 'Price': price, 'Exchange_Rate': fx[pos].round(2), 'Fee': fee})
+
+    # 시트는 적은 순서(날짜순)로 쌓인다
+    df_stock = df_stock.iloc[np.argsort(pos, kind='stable')].reset_index(drop=True)[STOCK_COLS]
+    df_cash = df_cash.iloc[np.argsort(df_cash['Date'].values, kind='stable')].reset_index(drop=True)[CASH_COLS]
+    return df_stock, df_cash
+
+
+# ==========================================
+# 💾 오프라인 실행용 폴더
+# ==========================================
+class SyntheticProvider(price_providers.PriceProvider):
+    """market()이 만든 프레임을 돌려주는 공급자 (price_providers.record로 fixture 폴더를 뜨는 데 쓴다)"""
+    name = 'synthetic'
+    remote = False
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def fetch(self, tickers, start, end, timeout):
+        out = {}
+        for t in tickers:
+            if t not in self.frames: continue
+            df = self.frames[t]
+            df = df[df.index >= start]
+            if end is not None: df = df[df.index < end]
+            if not df.empty: out[t] = df
+        return out
+
+
+def write(folder, n_rows, years=10, seed=0):
+    """folder/sheets(AEGIS_SHEET_DIR)와 folder/prices(AEGIS_PRICE_FIXTURES)를 채운다"""
+    paths = market_paths(years, seed)
+    df_stock, df_cash = ledger(n_rows, seed=seed, paths=paths)
+    sheets = os.path.join(folder, 'sheets')
+    os.makedirs(sheets, exist_ok=True)
+    df_stock.to_csv(os.path.join(sheets, 'Sheet1.csv'), index=False)
+    df_cash.to_csv(os.path.join(sheets, 'CashFlow.csv'), index=False)
+    frames = market(seed=seed, paths=paths)
+    price_providers.record(os.path.join(folder, 'prices'), list(frames), paths.index[0], source=SyntheticProvider(frames))
+    return df_stock, df_cash, paths
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description="가짜 시트(CSV) + 가짜 시세 fixture 폴더 만들기")
+    ap.add_argument('folder')
+    ap.add_argument('--rows', type=int, default=10000)
+    ap.add_argument('--years', type=float, default=10)
+    ap.add_argument('--seed', type=int, default=0)
+    a = ap.parse_args()
+    t0 = time.perf_counter()
+    df_stock, df_cash, paths = write(a.folder, a.rows, a.years, a.seed)
+    share = paths['Regime'].value_counts(normalize=True).reindex(REGIMES).fillna(0) * 100
+    print(f"장부 {len(df_stock):,}+{len(df_cash):,}행, 시세 {paths.shape[1] - 1}종목 × {len(paths):,}일 "
+          f"({' / '.join(f'{r} {v:.0f}%' for r, v in share.items())}) — {time.perf_counter() - t0:.1f}초")
+    print(f"AEGIS_SHEET_DIR={os.path.join(a.folder, 'sheets')} AEGIS_PRICE_FIXTURES={os.path.join(a.folder, 'prices')}")
@@ -1,179 +1,192 @@
 import os
 import json
-import gspread
-import pandas as pd
-import yfinance as yf
-import requests
-import ta
+import hashlib
+import asyncio
 import pytz 
 import traceback
 import time
-from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+import sys
+import signal
+import argparse
+from datetime import datetime, timedelta
+import price_store
+import ledger
+import sheet_mirror
+import notifier
+from aegis_core import (calculate_aegis_master_score, get_ai_target_ratios, portfolio_weights, decide_signals,
+                        signal_fingerprint, QLD_HARD_CAP, CASH_CEILING_PCT)
+from indicators import rsi_last
+# 🪶 gspread·oauth2client·requests·yfinance는 실제로 쓰는 함수 안에서 불러온다 (봇 기동 시간 단축,
+#    benchmarks/bench_import.py가 예산을 지키는지 확인). 지표는 ta 대신 indicators.rsi_wilder
 
 # ==========================================
 # 1. 환경 설정 및 전역 변수
 # ==========================================
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN', '')
 CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', '')
+IO_CONCURRENCY = int(os.environ.get('AEGIS_IO_CONCURRENCY', 4))   # 시트·시세 요청을 동시에 몇 개까지
+IO_TIMEOUT = float(os.environ.get('AEGIS_IO_TIMEOUT', 30))        # 요청 하나의 제한 시간(초)
+# 지난 실행의 입력 지문과 생략 통계 (보낸 신호 기록과 같은 폴더)
+RUN_STATE_PATH = os.environ.get('AEGIS_RUN_STATE', os.path.join(os.path.dirname(notifier.STATE_PATH), 'inputs.json'))
 SHEET_URL = "https://docs.google.com/spreadsheets/d/19EidY2HZI2sHzvuchXX5sKfugHLtEG0QY1Iq61kzmbU/edit?gid=0#gid=0"
 
-# 🔥 [설정] 봇 행동 기준
-MIN_KRW_ACTION = 10000   
-MIN_USD_ACTION = 100     
-REVERSE_EX_GAP = 15      
-SPREAD_RATE = 0.009 
-
-# 🔥 기존의 고정 TARGET_WEIGHTS는 삭제하고, 프론트엔드와 동일한 AI 오토파일럿 로직을 장착합니다.
-def get_ai_target_ratios(vix, q_rsi, s_rsi):
-    t_qqqm = 40; t_spym = 30; t_sgov = 25; t_qld = 5
-    
-    # 진성 공포장 (Tactical Strike)
-    if vix > 30 or (q_rsi < 30 and vix >= 18) or (s_rsi < 30 and vix >= 18):
-        t_qqqm = 35; t_spym = 25; t_sgov = 20; t_qld = 20
-    # 지수 개편 등으로 인한 과열기 (Profit Take)
-    elif q_rsi > 70 or s_rsi > 70:
-        t_qqqm = 32; t_spym = 28; t_sgov = 40; t_qld = 0
-        
-    return {'QQQM': t_qqqm, 'SPYM': t_spym, 'SGOV': t_sgov, 'QLD': t_qld, 'GMMF': 0.0}
+# 🔥 [설정] 봇 행동 기준 (MIN_KRW_ACTION 등)과 AI 오토파일럿 목표 비중(get_ai_target_ratios)은
+# 백테스트도 똑같이 쓰도록 aegis_core에 있습니다.
 
 
 # ==========================================
 # 2. 기본 유틸리티 함수
 # ==========================================
+_notifier = None
+
 def send_telegram(message):
+    # 세션(연결 풀)은 프로세스에 하나 — 데몬 모드에서 매시간 새로 연결하지 않는다. 재시도·나눠 보내기는 notifier가
+    global _notifier
     try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        data = {"chat_id": CHAT_ID, "text": message}
-        requests.post(url, data=data)
-    except Exception as e: print(f"전송 실패: {e}")
+        if _notifier is None: _notifier = notifier.Notifier(TELEGRAM_TOKEN, CHAT_ID, timeout=IO_TIMEOUT)
+        return _notifier.send(message)
+    except Exception as e:
+        print(f"전송 실패: {e}")
+        return False
 
-def is_market_open():
+def is_market_open(now=None):
     nyc_tz = pytz.timezone('America/New_York')
-    now_nyc = datetime.now(nyc_tz)
+    now_nyc = now.astimezone(nyc_tz) if now else datetime.now(nyc_tz)
     if now_nyc.weekday() >= 5: return False, "주말 (휴장)"
     market_start = now_nyc.replace(hour=9, minute=0, second=0, microsecond=0)
     market_end = now_nyc.replace(hour=16, minute=30, second=0, microsecond=0)
     if market_start <= now_nyc <= market_end: return True, "장 운영 중 🟢"
     return False, "장 마감 🔴"
 
-def is_banking_hours():
+def is_banking_hours(now=None):
     kst_tz = pytz.timezone('Asia/Seoul')
-    now_kst = datetime.now(kst_tz)
+    now_kst = now.astimezone(kst_tz) if now else datetime.now(kst_tz)
     if now_kst.weekday() >= 5: return False
     if 9 <= now_kst.hour < 16: return True
     return False
 
-def get_sheet_data():
+def open_sheet_book():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+    creds_dict = json.loads(os.environ['GCP_SERVICE_ACCOUNT'])
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    return gspread.authorize(creds).open_by_url(SHEET_URL)
+
+def get_sheet_data(warm=None):
+    # 로컬 SQLite 사본을 읽는다. 시트가 지난 실행 이후 바뀌었을 때만 전체를 다시 받음
+    # (데몬이면 인증된 클라이언트와 사본 객체를 warm에 살려두고 재사용)
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-            creds_dict = json.loads(os.environ['GCP_SERVICE_ACCOUNT'])
-            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-            client = gspread.authorize(creds)
-            sheet = client.open_by_url(SHEET_URL)
-            
-            sheet_name = "Sheet1"
-            try: sheet.worksheet("Sheet1")
-            except: sheet_name = "시트1"
-            
-            df_stock = pd.DataFrame(sheet.worksheet(sheet_name).get_all_records())
-            time.sleep(1) 
-            df_cash = pd.DataFrame(sheet.worksheet("CashFlow").get_all_records())
-            
+            mirror = warm.mirror if warm and warm.mirror else \
+                sheet_mirror.SheetMirror(sheet_mirror.source_from_env(open_sheet_book, SHEET_URL))
+            if warm: warm.mirror = mirror
+            synced = mirror.synced
+            df_stock, df_cash = mirror.read()
+            print(f"📄 시트: {'새로 동기화' if mirror.synced > synced else '변경 없음 (로컬 사본)'}")
             return df_stock, df_cash
         except Exception as e:
+            if warm: warm.mirror = None   # 인증 만료 등: 다음 시도에서 새로 연결
             if attempt < max_retries - 1:
                 time.sleep(5)
                 continue
             else:
                 raise e
 
-def calculate_balances(df_cash, df_stock):
-    krw = 0; usd = 0
-    if not df_cash.empty:
-        df_cash['Amount_KRW'] = pd.to_numeric(df_cash['Amount_KRW'].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-        df_cash['Amount_USD'] = pd.to_numeric(df_cash['Amount_USD'].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-        krw += df_cash[df_cash['Type'] == 'Deposit']['Amount_KRW'].sum()
-        krw -= df_cash[df_cash['Type'] == 'Exchange']['Amount_KRW'].sum()
-        usd += df_cash[df_cash['Type'] == 'Exchange']['Amount_USD'].sum()
-        krw += df_cash[df_cash['Type'] == 'Exchange_USD_to_KRW']['Amount_KRW'].sum()
-        usd -= df_cash[df_cash['Type'] == 'Exchange_USD_to_KRW']['Amount_USD'].sum()
-        krw -= df_cash[df_cash['Type'] == 'Withdraw']['Amount_KRW'].sum()
-    if not df_stock.empty:
-        for col in ['Qty', 'Price', 'Fee']:
-            df_stock[col] = pd.to_numeric(df_stock[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-        buys = df_stock[df_stock['Action'] == 'BUY']
-        usd -= ((buys['Qty'] * buys['Price']) + buys['Fee']).sum()
-        sells = df_stock[df_stock['Action'] == 'SELL']
-        usd += ((sells['Qty'] * sells['Price']) - sells['Fee']).sum()
-        divs = df_stock[df_stock['Action'] == 'DIVIDEND']
-        usd += (divs['Price'] - divs['Fee']).sum()
-    return krw, usd
-
-def calculate_my_avg_exchange_rate(df_cash, df_stock):
-    has_stock = False
-    if not df_stock.empty:
-        df_stock['Qty'] = pd.to_numeric(df_stock['Qty'].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
-        total_buy = df_stock[df_stock['Action'] == 'BUY']['Qty'].sum()
-        total_sell = df_stock[df_stock['Action'] == 'SELL']['Qty'].sum()
-        if (total_buy - total_sell) > 0.001: has_stock = True
-
-    if df_cash.empty: return 1450.0
-    df = df_cash.copy()
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'])
-        df = df.sort_values('Date')
-    
-    total_usd_held = 0.0
-    total_krw_spent = 0.0
-    last_valid_rate = 1450.0 
-    
-    for _, row in df.iterrows():
-        try:
-            amt_krw = float(str(row['Amount_KRW']).replace(',', ''))
-            amt_usd = float(str(row['Amount_USD']).replace(',', ''))
-        except: continue
-            
-        if row['Type'] == 'Exchange': 
-            total_usd_held += amt_usd
-            total_krw_spent += amt_krw
-            if total_usd_held > 0: last_valid_rate = total_krw_spent / total_usd_held
-            
-        elif row['Type'] == 'Exchange_USD_to_KRW': 
-            if total_usd_held > 0:
-                current_avg = total_krw_spent / total_usd_held
-                sell_usd = min(amt_usd, total_usd_held) 
-                total_usd_held -= sell_usd
-                total_krw_spent -= (sell_usd * current_avg)
-            
-            if total_usd_held <= 0.1: 
-                total_usd_held = 0
-                total_krw_spent = 0
-
-    if total_usd_held > 0: return total_krw_spent / total_usd_held
-    if has_stock: return last_valid_rate 
-    return 1450.0 
-
-def get_market_data_safe(ticker, period="2mo"):
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            df = yf.Ticker(ticker).history(period=period)
-            if df.empty: raise ValueError(f"{ticker} 데이터 없음")
-            return df
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(2)
-                continue
-            # 수정: 0이나 빈 값을 반환하지 않고 에러를 던져서 계산을 차단함
-            raise ConnectionError(f"{ticker} 데이터 수신 최종 실패") 
+# 🔥 봇이 한 번 실행될 때 필요한 모든 종목
+SNAPSHOT_TICKERS = ["^VIX", "QQQM", "SPYM", "QLD", "SGOV", "GMMF", "KRW=X", "DX-Y.NYB"]
 
-def analyze_market(ticker):
-    df = get_market_data_safe(ticker, "2mo")
-    # if len(df) < 14: return 0, 50 (삭제: 위에서 에러로 차단되므로 불필요)
-    return df['Close'].iloc[-1], ta.momentum.RSIIndicator(df['Close'], window=14).rsi().iloc[-1]
+# ==========================================
+# 🔀 입력 파이프라인 (asyncio)
+# ==========================================
+# 시트와 시세는 점수 계산 전까지 서로 기다릴 필요가 없다. 시세는 price_store 일괄 요청 하나(한 작업)로,
+# 시트 읽기와 동시에 돈다. 블로킹 라이브러리(gspread·yfinance)는 전용 스레드 풀에서 돌리고,
+# 동시 실행 수(IO_CONCURRENCY)와 호출마다의 제한 시간(IO_TIMEOUT)을 건다.
+async def _bounded(io, fn, *args, retries=3, pause=2.0):
+    """fn(*args) 하나를 io['sem'] 안에서, IO_TIMEOUT초 제한으로. 실패하면 pause초 쉬고 retries번까지"""
+    loop = asyncio.get_running_loop()
+    for attempt in range(retries):
+        try:
+            async with io['sem']:
+                return await asyncio.wait_for(loop.run_in_executor(io['pool'], fn, *args), IO_TIMEOUT)
+        except Exception:
+            if attempt == retries - 1: raise
+            await asyncio.sleep(pause)
+
+def _io_context(concurrency=None):
+    from concurrent.futures import ThreadPoolExecutor
+    n = concurrency or IO_CONCURRENCY
+    return {'sem': asyncio.Semaphore(n), 'pool': ThreadPoolExecutor(max_workers=n + 1)}
+
+def _fetch_all(tickers, period):
+    # 모든 종목을 한 번에: 디스크 저장소에서 꺼내고, 마지막 봉 이후의 꼬리만 일괄로 새로 받는다
+    # (재시도·예비 공급자는 price_providers가)
+    return price_store.get_histories(tickers, period=period)
+
+async def fetch_market(io, tickers=SNAPSHOT_TICKERS, period="1y"):
+    """모든 종목을 일괄 요청 하나로 받아 {종목: OHLCV 프레임}. 받지 못한 종목이 있으면 ConnectionError로 계산을 차단"""
+    # 재시도·백오프·예비 공급자는 price_providers의 체인이 맡으므로 여기서는 한 번만 (IO_TIMEOUT은 전체 상한)
+    try: got = await _bounded(io, _fetch_all, list(tickers), period, retries=1)
+    except Exception as e: raise ConnectionError(f"시세 일괄 수신 실패 ({type(e).__name__}: {e})")
+    # 0이나 빈 값으로 계산하지 않도록, 한 종목이라도 못 받으면 에러를 던져 판정 자체를 막는다
+    missing = [t for t in tickers if got.get(t) is None or got[t].empty]
+    if missing: raise ConnectionError(f"{', '.join(missing)} 데이터 수신 최종 실패")
+    return {t: got[t] for t in tickers}
+
+async def _run_io(make, concurrency=None):
+    io = _io_context(concurrency)
+    try: return await make(io)
+    finally: io['pool'].shutdown(wait=False, cancel_futures=True)   # 제한 시간에 걸린 스레드를 기다리지 않는다
+
+def get_market_snapshot(tickers=SNAPSHOT_TICKERS, period="1y", concurrency=None):
+    return asyncio.run(_run_io(lambda io: fetch_market(io, tickers, period), concurrency))
+
+def gather_inputs(warm=None, concurrency=None, sheets=None):
+    """(df_stock, df_cash, MarketContext) — 시트와 시세를 동시에. 데몬이 미리 받아둔 시세가 있으면 그걸 쓴다.
+    sheets=(df_stock, df_cash)를 주면 시트는 다시 읽지 않는다"""
+    ctx = warm.fresh_ctx() if warm else None
+    async def _all(io):
+        if sheets is not None:
+            return (*sheets, ctx if ctx is not None else MarketContext(await fetch_market(io)))
+        sheet = _bounded(io, get_sheet_data, warm, retries=1)   # get_sheet_data가 자체 재시도
+        if ctx is not None: return (*(await sheet), ctx)
+        (df_stock, df_cash), frames = await asyncio.gather(sheet, fetch_market(io))
+        return df_stock, df_cash, MarketContext(frames)
+    df_stock, df_cash, out = asyncio.run(_run_io(_all, concurrency))
+    if warm: warm.keep(out)
+    return df_stock, df_cash, out
+
+class MarketContext:
+    """종목마다 가장 긴 구간(1y)의 일봉 하나만 들고, 지표는 처음 물어볼 때 계산해서 기억한다.
+    가격·RSI·MA200·환율 MA·DXY MA가 모두 같은 봉 묶음에서 나오므로 서로 어긋나지 않는다."""
+    def __init__(self, frames):
+        self.frames = frames
+        self._memo = {}
+
+    @classmethod
+    def load(cls, tickers=SNAPSHOT_TICKERS, period="1y"):
+        return cls(get_market_snapshot(tickers, period))
+
+    def _cached(self, key, fn):
+        if key not in self._memo: self._memo[key] = fn()
+        return self._memo[key]
+
+    def close(self, ticker):
+        return self.frames[ticker]['Close']
+
+    def price(self, ticker):
+        return self._cached(('price', ticker), lambda: float(self.close(ticker).iloc[-1]))
+
+    def rsi(self, ticker, window=14):
+        return self._cached(('rsi', ticker, window), lambda: rsi_last(self.close(ticker), window))
+
+    def ma(self, ticker, window):
+        return self._cached(('ma', ticker, window), lambda: float(self.close(ticker).tail(window).mean()))
+
+    def ma200(self, ticker):
+        # 상장 1년 미만이라 200봉이 안 되면 현재가로 대신한다 (200일선 조건이 켜지지 않게)
+        return self.ma(ticker, 200) if len(self.close(ticker)) >= 200 else self.price(ticker)
 
 def calc_buyable(usd_budget, price):
     # 주어진 달러 예산으로 살 수 있는 주식 수를 '온전한 정수 주'와 '소수점 포함'으로 계산
@@ -182,14 +195,14 @@ def calc_buyable(usd_budget, price):
     fractional = usd_budget / price         # 소수점까지 포함한 수량
     return whole, fractional
 
-def get_fx_trend(ex_df):
+def get_fx_trend(ctx, ticker="KRW=X"):
     """환율 추세 판정: '떨어지는 칼날'과 '바닥 다지기'를 구분"""
-    curr = ex_df['Close'].iloc[-1]
-    ma5  = ex_df['Close'].tail(5).mean()
-    ma20 = ex_df['Close'].tail(20).mean()
-    ma60 = ex_df['Close'].tail(60).mean()
+    curr = ctx.price(ticker)
+    ma5  = ctx.ma(ticker, 5)
+    ma20 = ctx.ma(ticker, 20)
+    ma60 = ctx.ma(ticker, 60)
     is_downtrend = (ma5 < ma20 < ma60)
-    recent = ex_df['Close'].tail(5)
+    recent = ctx.close(ticker).tail(5)
     is_stabilizing = (recent.max() - recent.min()) < (curr * 0.005)
     return {'ma20': ma20, 'ma60': ma60,
             'downtrend': is_downtrend, 'stabilizing': is_stabilizing}
@@ -202,328 +215,177 @@ def buy_guide(usd_budget, price, ticker):
     else:
         return f"💵 예산 ${usd_budget:.2f} → {ticker} 1주(${price:.2f})에 못 미침. **소수점 {frac:.2f}주** 매수"
 
+def format_signal(sig):
+    # decide_signals가 고른 신호 하나를 텔레그램 문구로 만든다
+    kind = sig['kind']
+    if kind == 'urgent_exchange':
+        msg = f"🔥 **[전략적 긴급 환전]** 최고점({sig['score']:.0f}점) 돌파!\n"
+        if sig['pacing'] < 1.0: msg += f"⚠️ VIX 급등으로 현금 소진 속도를 조절합니다 (30% 분할).\n"
+        return msg + f"👉 추천: {int(sig['krw']):,}원 환전 후 **{sig['ticker']} 매수**\n\n"
+    if kind == 'urgent_buy':
+        return f"📈 **[전략적 긴급 매수]** 최고점({sig['score']:.0f}점) 돌파!\n👉 달러의 {sig['pacing']*100:.0f}% 투입\n{buy_guide(sig['usd'], sig['price'], sig['ticker'])}\n\n"
+    if kind == 'exchange':
+        strategy_msg = {60: "💎 60일 평균 대비 크게 저렴", 40: "📉📉 시장 평균 대비 매력적", 25: "📉 소폭 저렴"}.get(sig['tier'], "")
+        if 'halved' in sig['notes']: strategy_msg += "\n⚠️ 하락 추세 진행 중 → 강도 절반 분할"
+        if 'stabilizing' in sig['notes']: strategy_msg += "\n✅ 5일 변동 축소(바닥 다지기) → 정상 강도"
+        if 'all_in' in sig['notes']: strategy_msg += "\n💡 잔액 소액 → 분할 실익 없어 전액 집행"
+        return f"💵 **[환전 추천]** (예상 {sig['rate']:,.0f}원)\n{strategy_msg}\n👉 추천: {int(sig['krw']):,}원\n\n"
+    if kind == 'reverse_exchange':
+        return f"🇰🇷 **[역환전 기회]**\n• 수수료 떼고도 {sig['gain']:+.0f}원 이득!\n👉 달러 일부 원화 환전.\n\n"
+    if kind == 'crash_buy':
+        t = sig['ticker']
+        trend_note = "\n📉 하락 추세(200일선 아래): 강도 절반으로 분할 진입" if sig['downtrend'] else ""
+        if t == 'QLD':
+            msg = f"🎯 **[전술적 타격: QLD 줍줍]**\n• 듀얼 검증: VIX {sig['vix']:.1f} 폭등 (진성 공포장){trend_note}\n"
+            msg += f"• QLD 비중: {sig['weight']:.1f}% (상한 {QLD_HARD_CAP:.0f}%)\n"
+            return msg + f"👉 위성 자금의 {sig['pct']}% 투입\n{buy_guide(sig['usd'], sig['price'], 'QLD')}\n\n"
+        if t == 'QQQM':
+            label = "공포매수" if sig['panic'] else ""
+            return f"📈 **[진성 하락장: QQQM 매수]**\n• 듀얼 검증: VIX {sig['vix']:.1f} 돌파{trend_note}\n👉 달러의 {sig['pct']}% {label} 투입\n{buy_guide(sig['usd'], sig['price'], 'QQQM')}\n\n"
+        return f"🛡️ **[진성 하락장: SPYM 매수]**\n• 듀얼 검증: VIX {sig['vix']:.1f} 돌파{trend_note}\n👉 달러의 {sig['pct']}% 투입\n{buy_guide(sig['usd'], sig['price'], 'SPYM')}\n\n"
+    if kind == 'sgov_park':
+        if sig['ceiling']:
+            msg = f"💰 **[현금 과다 경고: SGOV 파킹 권장]**\n"
+            msg += f"• 달러 현금 비중: {sig['cash_weight']:.1f}% (천장 {CASH_CEILING_PCT:.0f}% 초과)\n"
+            msg += f"• SGOV 비중: {sig['weight']:.1f}% → 목표 {sig['target']:.0f}%까지만 채웁니다.\n"
+        else:
+            msg = f"🛡️ **[SGOV 파킹 (안전 자산 충전)]**\n"
+            msg += f"• SGOV 비중: 현재 {sig['weight']:.1f}% (목표 {sig['target']:.0f}%)\n"
+            msg += f"• 목표선까지만 채웁니다. 남는 달러는 폭락장 실탄으로 보유.\n"
+        return msg + f"{buy_guide(sig['usd'], sig['price'], 'SGOV')}\n\n"
+    if kind == 'overheat_sell':
+        t = sig['ticker']
+        if t == 'QLD':
+            msg = f"🔴 **[QLD 과열 익절 (위성 수익 실현)]** (RSI {sig['rsi']:.1f})\n"
+            msg += f"• 현재 비중: {sig['weight']:.1f}% (+{sig['excess_pct']:.1f}% 초과)\n"
+            return msg + f"👉 **실행 가이드:** QLD **{sig['qty']}주** 매도 후, SGOV **{sig['sgov_qty']}주** 안전 파킹\n\n"
+        msg = f"🔴 **[{t} 과열 리밸런싱]** (RSI {sig['rsi']:.1f})\n"
+        msg += f"• 현재 비중: {sig['weight']:.1f}% (+{sig['excess_pct']:.1f}% 초과)\n"
+        return msg + f"👉 **실행 가이드:** {t} **{sig['qty']}주** 매도 후, SGOV **{sig['sgov_qty']}주** 파킹\n\n"
+    if kind == 'sgov_release':
+        msg = f"⚔️ **[SGOV 방어 해제 (공격 자금 장전)]**\n"
+        msg += f"• SGOV 비중: {sig['weight']:.1f}% (+{sig['excess_pct']:.1f}% 초과)\n"
+        return msg + f"👉 **실행 가이드:** 초과된 파킹 자산 SGOV **{sig['qty']}주**를 매도하여 달러($)를 확보하세요. (이 달러는 폭락장 타격에 사용됩니다.)\n\n"
+    return ""
+
 # ==========================================
 # 3. 🧠 최신 V26.5 마스터 스코어 (단일 통제 시스템)
 # ==========================================
-def calculate_aegis_master_score(ticker, current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, target_weight, current_weight, my_krw):
-    score = 0.0
-    
-    score_A = 0
-    if rsi < 50:
-        if vix >= 18: 
-            score_A += (50 - rsi) * 1.5
-        else:
-            pass 
+# 점수 엔진은 대시보드와 똑같은 것을 쓰도록 aegis_core 한곳에만 둔다 (상단 import 참고)
 
-    if vix > 20: score_A += (vix - 20) * 1.0
-    if current_price < ma200: score_A += 20
-    score += min(score_A, 60)
-    
-    score_B = 0
-    gap = target_weight - current_weight
-    if gap > 5.0:  
-        score_B += (gap - 5.0) * 2.5
-    score += min(score_B, 30)
-    
-    score_C = 0
-    kst = pytz.timezone('Asia/Seoul')
-    today = datetime.now(kst).day
-    days_passed = (today - 5) if today >= 5 else (today + 30 - 5)
-    
-    if my_krw >= 100000:
-        # 현금이 많을수록 하루당 점수가 부드럽게 증가 (60만원에서 최대 1.8)
-        rate_per_day = 0.8 + min(1.0, (my_krw - 100000) / 500000) * 1.0
-        score_C = days_passed * rate_per_day
-        
-    score += min(score_C, 50)
-    
-    score_D = 0
-    blended_base_rate = (my_avg_rate * 0.15) + (krw_ma60 * 0.85)
-
-    if curr_rate > blended_base_rate:
-        score_D += (curr_rate - blended_base_rate) * 0.5
-
-    if dxy_curr > dxy_ma20:
-        score_D = score_D * 0.5
-
-    score -= min(score_D, 50)
-
-    # 🔥 Score F: 저환율 보너스 (상한 15점)
-    score_F = 0
-    if curr_rate < blended_base_rate:
-        score_F = min((blended_base_rate - curr_rate) * 0.25, 15)
-    score += score_F
-    # 🔥 Score E: 과열 페널티 (비싼 장에서 줍줍 방지)
-    # RSI가 낮은 폭락장에서는 0이라, 공포매수는 그대로 살아있음
-    score_E = 0
-    if rsi > 55:
-        score_E += (rsi - 55) * 1.2          # 예: RSI 70 → (70-55)*1.2 = 18점 차감
-    if current_price > ma200 * 1.10:          # 현재가가 200일선보다 10% 이상 위
-        score_E += 15
-    score -= score_E
-
-    return score
 # ==========================================
 # 4. 메인 봇 실행 로직
 # ==========================================
-def run_bot():
+def input_fingerprint(is_open, is_bank_open, df_stock, df_cash):
+    """판정 입력의 싼 지문: 장·은행 여부, 오늘 날짜(KST, 스코어가 날짜를 씀), 장부 줄 해시, 종목별 저장된 마지막 봉"""
+    parts = {'open': is_open, 'bank': is_bank_open,
+             'day': datetime.now(pytz.timezone('Asia/Seoul')).strftime('%Y-%m-%d'),
+             'ledger': ledger.events_hash(df_stock, df_cash), 'bars': price_store.last_bars(SNAPSHOT_TICKERS)}
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def load_run_state():
+    try:
+        with open(RUN_STATE_PATH, encoding='utf-8') as f: return {'fingerprint': None, 'runs': 0, 'skipped': 0, **json.load(f)}
+    except (OSError, ValueError, TypeError): return {'fingerprint': None, 'runs': 0, 'skipped': 0}
+
+def save_run_state(st, fingerprint, skipped):
+    st['runs'] += 1
+    st['skipped'] += int(skipped)
+    st['fingerprint'] = fingerprint
+    try:
+        os.makedirs(os.path.dirname(RUN_STATE_PATH) or '.', exist_ok=True)
+        tmp = RUN_STATE_PATH + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(st, f)
+        os.replace(tmp, RUN_STATE_PATH)
+    except OSError as e: print(f"실행 기록 저장 실패: {e}")   # 기록은 캐시일 뿐 — 다음 실행이 전체 판정을 할 뿐이다
+    rate = f"누적 {st['skipped']}/{st['runs']}회 생략 ({st['skipped'] / st['runs'] * 100:.0f}%)"
+    print(f"⏭️ 입력 변화 없음 → 판정 생략, {rate}" if skipped else f"🧮 전체 판정 완료, {rate}")
+
+def run_bot(warm=None):
     try:
         is_open, status_msg = is_market_open()
         is_bank_open = is_banking_hours()
-        
-        df_stock, df_cash = get_sheet_data()
-        
-        # 여기서 통신 에러가 나면 0으로 계산하지 않고 즉시 아래 except ConnectionError 로 빠짐
-        vix_df = get_market_data_safe("^VIX", "5d")
-        vix = vix_df['Close'].iloc[-1]
-        time.sleep(1)
-        
-        qqqm_price, qqqm_rsi = analyze_market("QQQM")
-        time.sleep(1)
-        spym_price, spym_rsi = analyze_market("SPYM")
-        time.sleep(1)
-        qld_price, qld_rsi = analyze_market("QLD")
-        time.sleep(1)
-        sgov_df = get_market_data_safe("SGOV", "5d")
-        sgov_price = sgov_df['Close'].iloc[-1]
-        gmmf_df = get_market_data_safe("GMMF", "5d")
-        gmmf_price = gmmf_df['Close'].iloc[-1] if not gmmf_df.empty else 100.0
-        time.sleep(1)
-        
-        ex_df = get_market_data_safe("KRW=X", "3mo")
-        curr_rate = ex_df['Close'].iloc[-1]
-        ma_20 = ex_df['Close'].tail(20).mean() 
-        krw_ma60 = ex_df['Close'].tail(60).mean()
+
+        # ⏭️ 장·은행이 모두 닫혀 있으면 시세가 움직여도 판정에 쓰이지 않는다 → 시트만 (싼 신선도 확인으로) 보고
+        # 지난 실행과 입력 지문이 같으면 시세 수신·장부·스코어 계산 없이 끝낸다 (신호도 지난번과 같으니 보낼 것도 없음)
+        run_state, sheets = load_run_state(), None
+        if not is_open and not is_bank_open:
+            sheets = get_sheet_data(warm)
+            fp = input_fingerprint(is_open, is_bank_open, *sheets)
+            if fp == run_state['fingerprint']:
+                save_run_state(run_state, fp, skipped=True)
+                return
+
+        # 시트와 시세를 동시에 받는다. 시세 통신 에러가 나면 0으로 계산하지 않고 즉시 아래 except ConnectionError 로 빠짐
+        t0 = time.perf_counter()
+        df_stock, df_cash, ctx = gather_inputs(warm, sheets=sheets)
+        print(f"입력 수신 (시트 ∥ 시세 {len(ctx.frames)}종목 일괄): {time.perf_counter() - t0:.2f}초")
+
+        vix = ctx.price("^VIX")
+        qqqm_price, qqqm_rsi = ctx.price("QQQM"), ctx.rsi("QQQM")
+        spym_price, spym_rsi = ctx.price("SPYM"), ctx.rsi("SPYM")
+        qld_price, qld_rsi = ctx.price("QLD"), ctx.rsi("QLD")
+        sgov_price = ctx.price("SGOV")
+        gmmf_price = ctx.price("GMMF")
+
+        curr_rate = ctx.price("KRW=X")
+        krw_ma60 = ctx.ma("KRW=X", 60)
         
         if curr_rate == 0 or qqqm_price == 0: raise ValueError("시장 데이터 수신 실패")
 
         # 🔥 [수정] 실시간 시장 상황(VIX, RSI)을 반영하여 목표 비중을 동적으로 먼저 계산합니다.
         dynamic_targets = get_ai_target_ratios(vix, qqqm_rsi, spym_rsi)
 
-        my_avg_rate = calculate_my_avg_exchange_rate(df_cash, df_stock)
-        my_krw, my_usd = calculate_balances(df_cash, df_stock)
-        
-        total_div = 0.0
-        current_holdings = {}
-        if not df_stock.empty:
-            df_stock['Qty'] = pd.to_numeric(df_stock['Qty'], errors='coerce').fillna(0)
-            df_stock['Price'] = pd.to_numeric(df_stock['Price'], errors='coerce').fillna(0)
-            df_stock['Fee'] = pd.to_numeric(df_stock['Fee'], errors='coerce').fillna(0)
-            
-            divs = df_stock[df_stock['Action'] == 'DIVIDEND']
-            total_div = (divs['Price'] - divs['Fee']).sum()
-            current_holdings = df_stock.groupby("Ticker").apply(lambda x: x.loc[x['Action']=='BUY','Qty'].sum() - x.loc[x['Action']=='SELL','Qty'].sum()).to_dict()
-
-        qqqm_qty = current_holdings.get('QQQM', 0)
-        spym_qty = current_holdings.get('SPYM', 0)
-        qld_qty  = current_holdings.get('QLD', 0)
-        sgov_qty = current_holdings.get('SGOV', 0)
-        gmmf_qty = current_holdings.get('GMMF', 0)
-        
-        qqqm_value = qqqm_qty * qqqm_price
-        spym_value = spym_qty * spym_price
-        qld_value  = qld_qty * qld_price
-        sgov_value = sgov_qty * sgov_price
-        gmmf_value = gmmf_qty * gmmf_price
-        
-        total_portfolio_usd = qqqm_value + spym_value + qld_value + sgov_value + gmmf_value + my_usd
-        
-        qqqm_current_weight = (qqqm_value / total_portfolio_usd * 100) if total_portfolio_usd > 0 else 0
-        spym_current_weight = (spym_value / total_portfolio_usd * 100) if total_portfolio_usd > 0 else 0
-        qld_current_weight  = (qld_value / total_portfolio_usd * 100) if total_portfolio_usd > 0 else 0
-        sgov_current_weight = (sgov_value / total_portfolio_usd * 100) if total_portfolio_usd > 0 else 0
-
-        dxy_df = get_market_data_safe("DX-Y.NYB", "1mo")
-        dxy_curr = dxy_df['Close'].iloc[-1] if not dxy_df.empty else 100
-        dxy_ma20 = dxy_df['Close'].mean() if not dxy_df.empty else 100
-        
-        qqqm_1y = get_market_data_safe("QQQM", "1y")
-        qqqm_ma200 = qqqm_1y['Close'].tail(200).mean() if len(qqqm_1y) >= 200 else qqqm_price
-        spym_1y = get_market_data_safe("SPYM", "1y")
-        spym_ma200 = spym_1y['Close'].tail(200).mean() if len(spym_1y) >= 200 else spym_price
-        qld_1y = get_market_data_safe("QLD", "1y")
-        qld_ma200 = qld_1y['Close'].tail(200).mean() if len(qld_1y) >= 200 else qld_price
+        # 잔고·보유 수량·환전 평단·배당을 장부 엔진이 시트를 한 번 순회해서 만든다
+        lg = ledger.run_ledger(df_stock, df_cash, checkpoint=ledger.CHECKPOINT_PATH)
+        my_avg_rate = lg['avg_fx']
+        my_krw, my_usd = lg['krw'], lg['usd']
+        total_div = lg['total_div']
+        current_holdings = lg['holdings']
 
-        # 🔥 자동화 1: 봇이 모든 종목의 마스터 스코어를 똑같이 계산
-        qqqm_score = calculate_aegis_master_score("QQQM", qqqm_price, qqqm_rsi, vix, qqqm_ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, dynamic_targets['QQQM'], qqqm_current_weight, my_krw)
-        spym_score = calculate_aegis_master_score("SPYM", spym_price, spym_rsi, vix, spym_ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, dynamic_targets['SPYM'], spym_current_weight, my_krw)
-        qld_score = calculate_aegis_master_score("QLD", qld_price, qld_rsi, vix, qld_ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, dynamic_targets['QLD'], qld_current_weight, my_krw)
+        price = {'QQQM': qqqm_price, 'SPYM': spym_price, 'QLD': qld_price, 'SGOV': sgov_price, 'GMMF': gmmf_price}
+        rsi = {'QQQM': qqqm_rsi, 'SPYM': spym_rsi, 'QLD': qld_rsi}
+        total_portfolio_usd, weights = portfolio_weights(current_holdings, price, my_usd)
 
-        real_buy_rate = curr_rate * (1 + SPREAD_RATE)  
-        real_sell_rate = curr_rate * (1 - SPREAD_RATE) 
+        dxy_curr = ctx.price("DX-Y.NYB")
+        dxy_ma20 = ctx.ma("DX-Y.NYB", 20)
+
+        qqqm_ma200 = ctx.ma200("QQQM")
+        spym_ma200 = ctx.ma200("SPYM")
+        qld_ma200 = ctx.ma200("QLD")
+
+        # 🔥 자동화 1: 봇이 모든 종목의 마스터 스코어를 똑같이 계산
+        qqqm_score = calculate_aegis_master_score("QQQM", qqqm_price, qqqm_rsi, vix, qqqm_ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, dynamic_targets['QQQM'], weights['QQQM'], my_krw)
+        spym_score = calculate_aegis_master_score("SPYM", spym_price, spym_rsi, vix, spym_ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, dynamic_targets['SPYM'], weights['SPYM'], my_krw)
+        qld_score = calculate_aegis_master_score("QLD", qld_price, qld_rsi, vix, qld_ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20, dynamic_targets['QLD'], weights['QLD'], my_krw)
 
         kst = pytz.timezone('Asia/Seoul')
         msg = f"📡 **[Aegis Smart Strategy]**\n📅 {datetime.now(kst).strftime('%m/%d %H:%M')} ({status_msg})\n💰 잔고: ￦{int(my_krw):,} / ${my_usd:.2f}\n❄️ 배당 스노우볼: ${total_div:.2f}\n📊 지표: VIX {vix:.1f} / Q-RSI {qqqm_rsi:.1f} / QLD-RSI {qld_rsi:.1f}\n🧠 **AI Score**: QQQM {qqqm_score:.0f} | SPYM {spym_score:.0f} | QLD {qld_score:.0f}\n\n"
 
-        should_send = False
-        pacing_ratio = 0.3 if vix > 30 else 1.0
-
-        # 🔥 추세 필터: 핵심 지수(QQQM)가 200일선 아래면 하락 추세로 보고 매수를 더 잘게 분할
-        is_downtrend = qqqm_price < qqqm_ma200
-        trend_factor = 0.5 if is_downtrend else 1.0   # 하락 추세면 매수 강도를 절반으로
-
-        # 🔥 자동화 2: 100점 돌파 시 봇이 3개 종목을 경쟁시켜 가장 저평가된 1개만 매수 지시
-        scores = {'QQQM': qqqm_score, 'SPYM': spym_score, 'QLD': qld_score}
-        max_ticker = max(scores, key=scores.get)
-        max_score = scores[max_ticker]
-
-        if max_score >= 100.0:
-            target_ticker = max_ticker
-            if my_krw >= MIN_KRW_ACTION and is_bank_open:
-                amount_to_exchange = my_krw * pacing_ratio
-                msg += f"🔥 **[전략적 긴급 환전]** 최고점({max_score:.0f}점) 돌파!\n"
-                if pacing_ratio < 1.0: msg += f"⚠️ VIX 급등으로 현금 소진 속도를 조절합니다 (30% 분할).\n"
-                msg += f"👉 추천: {int(amount_to_exchange):,}원 환전 후 **{target_ticker} 매수**\n\n"
-                should_send = True
-            elif my_usd >= MIN_USD_ACTION and is_open:
-                budget = my_usd * pacing_ratio
-                target_price = {'QQQM': qqqm_price, 'SPYM': spym_price, 'QLD': qld_price}[target_ticker]
-                msg += f"📈 **[전략적 긴급 매수]** 최고점({max_score:.0f}점) 돌파!\n👉 달러의 {pacing_ratio*100:.0f}% 투입\n{buy_guide(budget, target_price, target_ticker)}\n\n"
-                should_send = True
-
-        fx = get_fx_trend(ex_df)
-        gap_vs_ma60 = real_buy_rate - fx['ma60']
-
-        if my_krw >= MIN_KRW_ACTION and is_bank_open and not should_send:
-            suggest_percent = 0
-            strategy_msg = ""
-            if   gap_vs_ma60 <= -30: suggest_percent = 60; strategy_msg = "💎 60일 평균 대비 크게 저렴"
-            elif gap_vs_ma60 <= -15: suggest_percent = 40; strategy_msg = "📉📉 시장 평균 대비 매력적"
-            elif gap_vs_ma60 <=  -5: suggest_percent = 25; strategy_msg = "📉 소폭 저렴"
-
-            if suggest_percent > 0:
-                if fx['downtrend'] and not fx['stabilizing']:
-                    suggest_percent = int(suggest_percent * 0.5)
-                    strategy_msg += "\n⚠️ 하락 추세 진행 중 → 강도 절반 분할"
-                elif fx['stabilizing']:
-                    strategy_msg += "\n✅ 5일 변동 축소(바닥 다지기) → 정상 강도"
-
-            if 0 < my_krw <= 300000 and suggest_percent > 0:
-                suggest_percent = 100
-                strategy_msg += "\n💡 잔액 소액 → 분할 실익 없어 전액 집행"
-
-            if suggest_percent > 0:
-                amount_to_exchange = my_krw * (suggest_percent / 100)
-                msg += f"💵 **[환전 추천]** (예상 {real_buy_rate:,.0f}원)\n{strategy_msg}\n👉 추천: {int(amount_to_exchange):,}원\n\n"
-                should_send = True
-
-        sell_diff = real_sell_rate - my_avg_rate
-        is_stock_cheap = (qqqm_rsi < 50 or qld_rsi < 50 or vix > 25)
-        is_fx_truly_high = curr_rate > krw_ma60   # 추가: 내 평단이 아니라 '최근 60일 시장 평균'보다도 높을 때만
-
-        if (my_usd >= 100 and sell_diff >= REVERSE_EX_GAP and not is_stock_cheap
-                and is_fx_truly_high and not should_send and is_bank_open):
-            msg += f"🇰🇷 **[역환전 기회]**\n• 수수료 떼고도 {sell_diff:+.0f}원 이득!\n👉 달러 일부 원화 환전.\n\n"
-            should_send = True
-
-        # 🔥 진성 폭락장 직관적 매수 지시 (VIX 트리거)
-        if my_usd >= MIN_USD_ACTION and (is_open or vix > 30) and not should_send:
-            trend_note = "\n📉 하락 추세(200일선 아래): 강도 절반으로 분할 진입" if is_downtrend else ""
-            QLD_HARD_CAP = 30.0   # QLD가 전체의 30%를 넘으면 추가 매수 중단
-            if vix >= 25 and qld_rsi < 35 and qld_current_weight < QLD_HARD_CAP:
-                qld_pct = 25 if is_downtrend else 50
-                room_usd = total_portfolio_usd * ((QLD_HARD_CAP - qld_current_weight) / 100)
-                budget = min(my_usd * (qld_pct / 100), room_usd)
-                if budget >= qld_price:
-                    msg += f"🎯 **[전술적 타격: QLD 줍줍]**\n• 듀얼 검증: VIX {vix:.1f} 폭등 (진성 공포장){trend_note}\n"
-                    msg += f"• QLD 비중: {qld_current_weight:.1f}% (상한 {QLD_HARD_CAP:.0f}%)\n"
-                    msg += f"👉 위성 자금의 {qld_pct}% 투입\n{buy_guide(budget, qld_price, 'QLD')}\n\n"
-                    should_send = True
-            elif qqqm_rsi < 40 and vix >= 18:
-                base_pct = 30 if qqqm_rsi >= 30 else 50
-                final_pct = int(base_pct * trend_factor)
-                label = "공포매수" if qqqm_rsi < 30 else ""
-                budget = my_usd * (final_pct / 100)
-                msg += f"📈 **[진성 하락장: QQQM 매수]**\n• 듀얼 검증: VIX {vix:.1f} 돌파{trend_note}\n👉 달러의 {final_pct}% {label} 투입\n{buy_guide(budget, qqqm_price, 'QQQM')}\n\n"
-                should_send = True
-            elif spym_rsi < 40 and vix >= 18: 
-                spym_pct = int(30 * trend_factor)
-                budget = my_usd * (spym_pct / 100)
-                msg += f"🛡️ **[진성 하락장: SPYM 매수]**\n• 듀얼 검증: VIX {vix:.1f} 돌파{trend_note}\n👉 달러의 {spym_pct}% 투입\n{buy_guide(budget, spym_price, 'SPYM')}\n\n"
-                should_send = True
-                
-        # 🔥 현금 천장: 달러 현금이 포트폴리오의 일정 비율을 넘으면 경고 (현금이 노는 것 방지)
-        CASH_CEILING_PCT = 35.0   # 달러 현금이 전체의 35%를 넘으면 과다로 판단
-        usd_cash_weight = (my_usd / total_portfolio_usd * 100) if total_portfolio_usd > 0 else 0
-
-        # 🔥 SGOV 파킹 — '전액'이 아니라 '목표 비중까지만' 채운다 (즉시 되팔기 방지)
-        sgov_room_pct = dynamic_targets['SGOV'] - sgov_current_weight
-        sgov_room_usd = total_portfolio_usd * (sgov_room_pct / 100) if sgov_room_pct > 0 else 0.0
-        park_usd = min(my_usd, sgov_room_usd)
-
-        if my_usd >= MIN_USD_ACTION and is_open and not should_send:
-            if park_usd < sgov_price:
-                pass   # 1주도 못 채울 여유면 지시하지 않음 (잔챙이 매매 방지)
-            elif usd_cash_weight > CASH_CEILING_PCT:
-                msg += f"💰 **[현금 과다 경고: SGOV 파킹 권장]**\n"
-                msg += f"• 달러 현금 비중: {usd_cash_weight:.1f}% (천장 {CASH_CEILING_PCT:.0f}% 초과)\n"
-                msg += f"• SGOV 비중: {sgov_current_weight:.1f}% → 목표 {dynamic_targets['SGOV']:.0f}%까지만 채웁니다.\n"
-                msg += f"{buy_guide(park_usd, sgov_price, 'SGOV')}\n\n"
-                should_send = True
-            elif sgov_current_weight < dynamic_targets['SGOV']:
-                msg += f"🛡️ **[SGOV 파킹 (안전 자산 충전)]**\n"
-                msg += f"• SGOV 비중: 현재 {sgov_current_weight:.1f}% (목표 {dynamic_targets['SGOV']:.0f}%)\n"
-                msg += f"• 목표선까지만 채웁니다. 남는 달러는 폭락장 실탄으로 보유.\n"
-                msg += f"{buy_guide(park_usd, sgov_price, 'SGOV')}\n\n"
-                should_send = True
-
-        VOLATILITY_BUFFER = 8.0
-
-        # 🔥 자동화 3: 과열 리밸런싱 (수익 실현 / 출구 전략) - 코어와 위성 모두 똑같이 통제
-        if is_open:
-            if qld_rsi > 70 and qld_current_weight >= (dynamic_targets['QLD'] + VOLATILITY_BUFFER): # 수정
-                excess_pct = qld_current_weight - dynamic_targets['QLD']
-                excess_usd = total_portfolio_usd * (excess_pct / 100)
-                sell_qty = round(excess_usd / qld_price)
-                sell_qty = min(sell_qty, int(qld_qty))   # 추가: 실제 보유 수량을 넘지 않게 제한
-                sgov_qty_to_buy = round(excess_usd / sgov_price)
-                if sell_qty >= 1:
-                    msg += f"🔴 **[QLD 과열 익절 (위성 수익 실현)]** (RSI {qld_rsi:.1f})\n"
-                    msg += f"• 현재 비중: {qld_current_weight:.1f}% (+{excess_pct:.1f}% 초과)\n"
-                    msg += f"👉 **실행 가이드:** QLD **{sell_qty}주** 매도 후, SGOV **{sgov_qty_to_buy}주** 안전 파킹\n\n"
-                    should_send = True
-
-            elif qqqm_rsi > 70 and qqqm_current_weight >= (dynamic_targets['QQQM'] + VOLATILITY_BUFFER) and not should_send: # 수정
-                excess_pct = qqqm_current_weight - dynamic_targets['QQQM']
-                excess_usd = total_portfolio_usd * (excess_pct / 100)
-                sell_qty = round(excess_usd / qqqm_price)
-                sell_qty = min(sell_qty, int(qqqm_qty))   # 추가: 실제 보유 수량을 넘지 않게 제한
-                sgov_qty_to_buy = round(excess_usd / sgov_price)
-                if sell_qty >= 1:
-                    msg += f"🔴 **[QQQM 과열 리밸런싱]** (RSI {qqqm_rsi:.1f})\n"
-                    msg += f"• 현재 비중: {qqqm_current_weight:.1f}% (+{excess_pct:.1f}% 초과)\n"
-                    msg += f"👉 **실행 가이드:** QQQM **{sell_qty}주** 매도 후, SGOV **{sgov_qty_to_buy}주** 파킹\n\n"
-                    should_send = True
-
-            elif spym_rsi > 70 and spym_current_weight >= (dynamic_targets['SPYM'] + VOLATILITY_BUFFER) and not should_send: # 수정
-                excess_pct = spym_current_weight - dynamic_targets['SPYM']
-                excess_usd = total_portfolio_usd * (excess_pct / 100)
-                sell_qty = round(excess_usd / spym_price)
-                sell_qty = min(sell_qty, int(spym_qty))   # 추가: 실제 보유 수량을 넘지 않게 제한
-                sgov_qty_to_buy = round(excess_usd / sgov_price)
-                if sell_qty >= 1:
-                    msg += f"🔴 **[SPYM 과열 리밸런싱]** (RSI {spym_rsi:.1f})\n"
-                    msg += f"• 현재 비중: {spym_current_weight:.1f}% (+{excess_pct:.1f}% 초과)\n"
-                    msg += f"👉 **실행 가이드:** SPYM **{sell_qty}주** 매도 후, SGOV **{sgov_qty_to_buy}주** 파킹\n\n"
-                    should_send = True
-        # 🔥 자동화 4: SGOV 방어 해제 (공격 자금 장전)
-        # 시장이 안정/하락장으로 접어들어 SGOV 목표 비중이 줄어들었을 때, 초과된 SGOV를 팔아 현금을 확보합니다.
-        if is_open:
-            if sgov_current_weight >= (dynamic_targets['SGOV'] + VOLATILITY_BUFFER) and not should_send:
-                excess_pct = sgov_current_weight - dynamic_targets['SGOV']
-                excess_usd = total_portfolio_usd * (excess_pct / 100)
-                sgov_sell_qty = round(excess_usd / sgov_price)
-                sgov_sell_qty = min(sgov_sell_qty, int(sgov_qty))   # 추가: 실제 보유 수량을 넘지 않게 제한
-                
-                if sgov_sell_qty >= 1:
-                    msg += f"⚔️ **[SGOV 방어 해제 (공격 자금 장전)]**\n"
-                    msg += f"• SGOV 비중: {sgov_current_weight:.1f}% (+{excess_pct:.1f}% 초과)\n"
-                    msg += f"👉 **실행 가이드:** 초과된 파킹 자산 SGOV **{sgov_sell_qty}주**를 매도하여 달러($)를 확보하세요. (이 달러는 폭락장 타격에 사용됩니다.)\n\n"
-                    should_send = True
-                    
-        if should_send:
-            send_telegram(msg)
-            
+        # 🔥 규칙 판정은 백테스트와 똑같은 aegis_core.decide_signals 하나로 한다
+        signals = decide_signals(vix, price, rsi, qqqm_ma200, curr_rate, krw_ma60, get_fx_trend(ctx), my_avg_rate,
+                                 my_krw, my_usd, current_holdings, weights, total_portfolio_usd,
+                                 {'QQQM': qqqm_score, 'SPYM': spym_score, 'QLD': qld_score}, dynamic_targets,
+                                 is_open, is_bank_open)
+
+        # 지난 실행에도 있던 신호(지문이 같은 것)는 다시 보내지 않는다. 기록은 전송이 성공했을 때만 바꾼다
+        sent_log = notifier.SignalLog()
+        prints = [signal_fingerprint(sig) for sig in signals]
+        fresh = sent_log.fresh(prints)
+        for sig, fp in zip(signals, prints):
+            if fp in fresh: msg += format_signal(sig)
+        if len(fresh) < len(signals): msg += f"🔁 이미 알린 신호 {len(signals) - len(fresh)}건은 조건이 유지 중이라 생략\n"
+
+        delivered = True
+        if fresh:
+            delivered = send_telegram(msg)
+            if delivered: sent_log.commit(prints, fresh)
+        else:
+            if signals: print(f"신호 {len(signals)}건 모두 이미 알림 → 전송 생략")
+            sent_log.commit(prints)
+        # 전송에 실패했으면 지문을 남기지 않는다 — 다음 실행이 생략되지 않고 다시 보내도록
+        if delivered: save_run_state(run_state, input_fingerprint(is_open, is_bank_open, df_stock, df_cash), skipped=False)
+
     except ConnectionError as ce:
         send_telegram(f"⚠️ **[Aegis API 일시 장애]**\n야후 파이낸스 데이터 수신에 실패했습니다: {str(ce)}\n잘못된 매수를 막기 위해 봇 작동을 일시 중단합니다. 복구 후 재시도 바랍니다.")
         return 
@@ -532,5 +394,90 @@ def run_bot():
         send_telegram(f"⚠️ **[Aegis System Error]**\n🔻 에러 내용:\n{str(e)}")
         print(traceback.format_exc())
 
+# ==========================================
+# 5. 🔁 데몬 모드 (python bot.py --daemon)
+# ==========================================
+# GitHub Actions처럼 매번 프로세스를 새로 띄우지 않고, 한 프로세스에서 시트 클라이언트·사본과
+# 시장 데이터를 살려둔 채 정해진 시각마다 run_bot을 돌린다.
+ACTIVE_WINDOWS = [('America/New_York', (9, 0), (16, 30)),   # is_market_open과 같은 시간
+                  ('Asia/Seoul', (9, 0), (16, 0))]          # is_banking_hours와 같은 시간
+
+class WarmState:
+    """데몬에서 실행 사이에 살려두는 것들. 시장 데이터는 market_ttl초 안이면 다시 받지 않는다"""
+    def __init__(self, market_ttl=120):
+        self.mirror = None
+        self.ctx = None
+        self.ctx_at = 0.0
+        self.market_ttl = market_ttl
+
+    def keep(self, ctx):
+        if ctx is not self.ctx: self.ctx, self.ctx_at = ctx, time.monotonic()
+        return ctx
+
+    def refresh_market(self):
+        return self.keep(MarketContext.load())
+
+    def fresh_ctx(self):
+        if self.ctx is None or time.monotonic() - self.ctx_at > self.market_ttl: return None
+        return self.ctx
+
+def is_active(now):
+    return is_market_open(now)[0] or is_banking_hours(now)
+
+def next_window_edge(now):
+    """지금 이후 가장 가까운 미국장/한국 은행 시간의 시작·마감 시각 (평일만)"""
+    edges = []
+    for tz_name, start, end in ACTIVE_WINDOWS:
+        tz = pytz.timezone(tz_name)
+        local = now.astimezone(tz)
+        for add in range(4):   # 금요일 마감 뒤엔 월요일 시작까지 3일
+            d = local.date() + timedelta(days=add)
+            if d.weekday() >= 5: continue
+            for h, m in (start, end):
+                t = tz.localize(datetime(d.year, d.month, d.day, h, m))
+                if t > now: edges.append(t)
+    return min(edges)
+
+def next_run_time(now, active_minutes, idle_minutes):
+    """장/은행 시간엔 active_minutes, 그 밖엔 idle_minutes 간격의 '정각 기준' 눈금.
+    시작·마감 시각이 더 가까우면 그때 한 번 돈다 (장 열리자마자 판정)"""
+    step = (active_minutes if is_active(now) else idle_minutes) * 60
+    ts = now.timestamp()
+    tick = datetime.fromtimestamp((ts // step + 1) * step, tz=pytz.utc)
+    return min(tick, next_window_edge(now).astimezone(pytz.utc))
+
+def run_daemon(active_minutes=60, idle_minutes=60, prefetch=60, run_now=True):
+    warm = WarmState(market_ttl=prefetch * 2)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🔁 데몬 시작: 장/은행 시간 {active_minutes}분, 그 외 {idle_minutes}분 간격")
+    while True:
+        if run_now:
+            t0 = time.perf_counter()
+            run_bot(warm)
+            print(f"⏱️ 판정 {time.perf_counter() - t0:.2f}초")
+        run_now = True
+        now = datetime.now(pytz.utc)
+        nxt = next_run_time(now, active_minutes, idle_minutes)
+        print(f"💤 다음 실행: {nxt.astimezone(pytz.timezone('Asia/Seoul')).strftime('%m/%d %H:%M')} KST")
+        # 실행 prefetch초 전에 시장 데이터를 미리 받아둔다 → 정시 판정은 메모리에서 바로
+        wait = (nxt - now).total_seconds()
+        if wait > prefetch:
+            time.sleep(wait - prefetch)
+            try: warm.refresh_market()
+            except Exception as e: print(f"사전 수신 실패 (정시에 다시 시도): {e}")
+        time.sleep(max(0.0, (nxt - datetime.now(pytz.utc)).total_seconds()))
+
 if __name__ == "__main__":
-    run_bot()
+    parser = argparse.ArgumentParser(description="Aegis 알림 봇 (기본: 한 번 실행하고 종료)")
+    parser.add_argument("--daemon", action="store_true", help="프로세스를 띄워둔 채 일정에 맞춰 반복 실행")
+    parser.add_argument("--interval", type=int, default=int(os.environ.get('AEGIS_ACTIVE_MINUTES', 60)),
+                        help="미국장/한국 은행 시간 중 실행 간격(분)")
+    parser.add_argument("--idle-interval", type=int, default=int(os.environ.get('AEGIS_IDLE_MINUTES', 60)),
+                        help="그 밖의 시간 실행 간격(분)")
+    parser.add_argument("--prefetch", type=int, default=60, help="실행 몇 초 전에 시장 데이터를 미리 받을지")
+    args = parser.parse_args()
+    if args.daemon:
+        try: run_daemon(args.interval, args.idle_interval, args.prefetch)
+        except KeyboardInterrupt: print("데몬 종료")
+    else:
+        run_bot()
@@ -0,0 +1,203 @@
+"""
+Aegis 지표 (Indicators) — ta 라이브러리 없이 쓰는 RSI·이동평균·이동 최고/최저.
+
+두 가지 모양으로 같은 값을 낸다.
+- 일괄(배치): 종가 배열 전체 → 같은 길이의 NumPy 배열. 백테스트·대시보드 차트용
+    rsi_wilder(close, 14), sma(x, 200, min_periods=60), rolling_max(x, 5), rolling_min(x, 5)
+- 스트리밍: 봉 하나가 들어올 때마다 O(1)로 갱신하는 객체. 상태를 dict(JSON 가능)로 꺼내 저장했다가
+  그 지점부터 이어서 계산할 수 있다
+    r = WilderRSI(14); for c in closes: r.update(c)
+    saved = r.state() → ... → r = restore(saved); r.update(새 종가)
+  peek(x)는 '이 값이 다음 봉이라면'의 값만 돌려주고 상태는 그대로 둔다 (장중에 계속 바뀌는 마지막 봉용)
+
+값의 정의는 지금까지 쓰던 것과 같다: 일괄 RSI는 ta.momentum.RSIIndicator와, 이동평균·최고·최저는
+pandas rolling(window, min_periods)와 비트 단위로 같다. 스트리밍은 RSI·최고·최저가 일괄과 비트 단위로,
+이동평균은 부동소수 오차 수준(상대 1e-9 안)으로 같다.
+입력에 NaN이 없다고 가정한다 (쓰는 곳은 모두 ffill/dropna 뒤의 종가).
+"""
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# ==========================================
+# 📦 일괄 계산
+# ==========================================
+def rsi_wilder(close, window=14):
+    """ta.momentum.RSIIndicator(close, window).rsi()와 같은 값 (NumPy 배열, 앞 window-1개는 NaN).
+    ta와 같은 pandas ewm(alpha=1/window, adjust=False)을 그대로 써서 결과가 비트 단위로 같다."""
+    c = pd.Series(np.asarray(close, dtype=float))
+    d = c.diff()
+    up, dn = d.where(d > 0, 0.0), -d.where(d < 0, 0.0)
+    eu = up.ewm(alpha=1 / window, min_periods=window, adjust=False).mean().values
+    ed = dn.ewm(alpha=1 / window, min_periods=window, adjust=False).mean().values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(ed == 0, 100.0, 100 - (100 / (1 + eu / ed)))
+
+
+def rsi_last(close, window=14):
+    """마지막 봉의 RSI (float)"""
+    return float(rsi_wilder(close, window)[-1])
+
+
+def _rolling(x, window, min_periods):
+    # 이동 창 일괄 계산은 pandas rolling 그대로 — 지금까지의 백테스트·차트 숫자가 비트 단위로 유지된다
+    return pd.Series(np.asarray(x, dtype=float)).rolling(window, min_periods=min_periods)
+
+
+def sma(x, window, min_periods=None):
+    """x.rolling(window, min_periods).mean() (봉이 모자라면 min_periods 이상일 때 있는 만큼의 평균)"""
+    return _rolling(x, window, min_periods).mean().values
+
+
+def rolling_max(x, window, min_periods=None):
+    """x.rolling(window, min_periods).max()"""
+    return _rolling(x, window, min_periods).max().values
+
+
+def rolling_min(x, window, min_periods=None):
+    """x.rolling(window, min_periods).min()"""
+    return _rolling(x, window, min_periods).min().values
+
+
+# ==========================================
+# 🌊 스트리밍 (봉 하나씩, 상태 저장/재개)
+# ==========================================
+class WilderRSI:
+    """rsi_wilder를 봉 하나씩. update(종가) → 그 봉까지의 RSI (앞 window-1개는 NaN)"""
+    kind = 'rsi'
+
+    def __init__(self, window=14):
+        self.window = window
+        self.n, self.prev, self.eu, self.ed = 0, None, 0.0, 0.0
+
+    def _next(self, x):
+        # (n, prev, eu, ed, 값) — pandas ewm(adjust=False)이 한 칸 나아가는 식을 같은 순서로 (그래야 비트 단위로 같다)
+        if self.n == 0: n, eu, ed = 1, 0.0, -0.0
+        else:
+            d = x - self.prev
+            up, dn = (d if d > 0 else 0.0), -(d if d < 0 else 0.0)
+            a = 1.0 / self.window
+            old_wt, new_wt = 1.0 - a, a
+            n, eu, ed = self.n + 1, self.eu, self.ed
+            if eu != up: eu = (old_wt * eu + new_wt * up) / (old_wt + new_wt)
+            if ed != dn: ed = (old_wt * ed + new_wt * dn) / (old_wt + new_wt)
+        value = math.nan if n < self.window else (100.0 if ed == 0 else 100 - (100 / (1 + eu / ed)))
+        return n, x, eu, ed, value
+
+    def update(self, x):
+        self.n, self.prev, self.eu, self.ed, value = self._next(float(x))
+        return value
+
+    def peek(self, x):
+        return self._next(float(x))[-1]
+
+    def state(self):
+        return {'kind': self.kind, 'window': self.window, 'n': self.n, 'prev': self.prev, 'eu': self.eu, 'ed': self.ed}
+
+    @classmethod
+    def from_state(cls, st):
+        obj = cls(st['window'])
+        obj.n, obj.prev, obj.eu, obj.ed = st['n'], st['prev'], st['eu'], st['ed']
+        return obj
+
+
+class SMA:
+    """이동평균을 봉 하나씩. 창에서 빠지는 값을 빼고 들어오는 값을 더한다 (보정 합으로 오차가 쌓이지 않게)"""
+    kind = 'sma'
+
+    def __init__(self, window, min_periods=None):
+        self.window, self.min_periods = window, (window if min_periods is None else min_periods)
+        self.buf, self.total, self.comp = deque(), 0.0, 0.0
+
+    def _add(self, total, comp, v):
+        # Kahan 보정 덧셈
+        y = v - comp
+        t = total + y
+        return t, (t - total) - y
+
+    def _next(self, x):
+        total, comp = self._add(self.total, self.comp, x)
+        count = len(self.buf) + 1
+        if count > self.window:
+            total, comp = self._add(total, comp, -self.buf[0]); count = self.window
+        value = total / count if count >= self.min_periods else math.nan
+        return total, comp, value
+
+    def update(self, x):
+        x = float(x)
+        self.total, self.comp, value = self._next(x)
+        self.buf.append(x)
+        if len(self.buf) > self.window: self.buf.popleft()
+        return value
+
+    def peek(self, x):
+        return self._next(float(x))[-1]
+
+    def state(self):
+        return {'kind': self.kind, 'window': self.window, 'min_periods': self.min_periods,
+                'buf': list(self.buf), 'total': self.total, 'comp': self.comp}
+
+    @classmethod
+    def from_state(cls, st):
+        obj = cls(st['window'], st['min_periods'])
+        obj.buf, obj.total, obj.comp = deque(st['buf']), st['total'], st['comp']
+        return obj
+
+
+class RollingMax:
+    """창 안 최고값을 봉 하나씩 (단조 큐: 나중에 들어온 더 큰 값에 가려진 후보는 버린다 → 봉당 평균 O(1))"""
+    kind = 'max'
+
+    def __init__(self, window, min_periods=None):
+        self.window, self.min_periods = window, (window if min_periods is None else min_periods)
+        self.n, self.q = 0, deque()   # q: [봉 번호, 값] — 값이 앞에서 뒤로 엄격히 작아진다
+
+    def _beats(self, new, old):
+        return new >= old
+
+    def update(self, x):
+        x = float(x)
+        while self.q and self._beats(x, self.q[-1][1]): self.q.pop()
+        self.q.append([self.n, x])
+        self.n += 1
+        while self.q[0][0] <= self.n - 1 - self.window: self.q.popleft()
+        return self.q[0][1] if min(self.n, self.window) >= self.min_periods else math.nan
+
+    def peek(self, x):
+        x = float(x)
+        if min(self.n + 1, self.window) < self.min_periods: return math.nan
+        best = x
+        for i, v in self.q:   # 창에서 빠질 후보는 맨 앞 하나뿐
+            if i > self.n - self.window:
+                if not self._beats(x, v): best = v
+                break
+        return best
+
+    def state(self):
+        return {'kind': self.kind, 'window': self.window, 'min_periods': self.min_periods,
+                'n': self.n, 'q': [list(e) for e in self.q]}
+
+    @classmethod
+    def from_state(cls, st):
+        obj = cls(st['window'], st['min_periods'])
+        obj.n, obj.q = st['n'], deque(list(e) for e in st['q'])
+        return obj
+
+
+class RollingMin(RollingMax):
+    """창 안 최저값을 봉 하나씩"""
+    kind = 'min'
+
+    def _beats(self, new, old):
+        return new <= old
+
+
+_KINDS = {c.kind: c for c in (WilderRSI, SMA, RollingMax, RollingMin)}
+
+
+def restore(st):
+    """state()로 꺼내 둔 dict에서 같은 종류의 스트리밍 지표를 되살린다"""
+    return _KINDS[st['kind']].from_state(st)
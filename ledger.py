@@ -0,0 +1,257 @@
+"""
+Aegis 장부 엔진 (Ledger)
+
+시트 두 장(Sheet1 매매 기록 + CashFlow 입출금·환전)을 한 번만 숫자로 바꾸고 날짜순 이벤트 하나로 합친 뒤,
+한 번의 순회로 대시보드와 봇이 쓰는 숫자를 전부 만든다.
+- 잔고(원화·달러), 순 원금, 종목별 보유 수량, 배당
+- 환전 평단 (역환전하면 평단 그대로 물량만 줄이는 이동평균 방식)
+- 종목별 원화 매입원가 (세금 계산용 이동평균, 환율 0인 매수는 제외)
+- 연도별 실현 손익과 매도 로그
+- 날짜별 원금·현금·수량 변화량 (누적합을 펴면 추세 그래프의 일별 기록)
+Streamlit/네트워크 없이 pandas만 쓰므로 app.py와 bot.py가 같이 쓴다.
+"""
+import os
+import pickle
+import hashlib
+import numpy as np
+import pandas as pd
+
+DEFAULT_FX = 1450.0          # 환전 기록이 없을 때 쓰는 기준 환율
+TAX_FREE_ALLOWANCE = 2500000 # 해외주식 양도소득 기본공제 (원)
+TAX_RATE = 0.22
+STATE_COLS = ['Total_Invested', 'Cash_KRW', 'Cash_USD']   # 추세 그래프의 앞쪽 세 칸 (뒤는 종목별 Stock_* 수량)
+EVENT_COLS = ['Date', 'Kind', 'Ticker', 'Qty', 'Price', 'Fee', 'Rate', 'KRW', 'USD']
+
+
+def _num(s):
+    # 시트에서 온 값: 쉼표 제거 + 숫자가 아니면 0 (문자열 처리는 숫자로 안 읽힌 칸에만 — 행이 많아도 빠르게)
+    out = pd.to_numeric(s, errors='coerce')
+    bad = out.isna() & s.notna()
+    if bad.any(): out[bad] = pd.to_numeric(s[bad].astype(str).str.replace(',', ''), errors='coerce')
+    return out.fillna(0).astype(float)
+
+
+def _col(df, col, default=''):
+    return df[col] if col in df.columns else pd.Series(default, index=df.index)
+
+
+def build_events(df_stock, df_cash):
+    """두 시트를 '날짜 → (같은 날이면 현금 흐름·매수 먼저) → 시트 순서'로 정렬된 이벤트 프레임 하나로 합친다"""
+    frames = []
+    if not df_cash.empty and 'Type' in df_cash.columns:
+        frames.append(pd.DataFrame({
+            'Date': pd.to_datetime(_col(df_cash, 'Date', None), errors='coerce'),
+            'Kind': df_cash['Type'].astype(str), 'Ticker': '',
+            'Qty': 0.0, 'Price': 0.0, 'Fee': 0.0, 'Rate': 0.0,
+            'KRW': _num(_col(df_cash, 'Amount_KRW', 0)), 'USD': _num(_col(df_cash, 'Amount_USD', 0)),
+            '_ord': 0}))
+    if not df_stock.empty and 'Action' in df_stock.columns:
+        action = df_stock['Action'].astype(str)
+        frames.append(pd.DataFrame({
+            'Date': pd.to_datetime(_col(df_stock, 'Date', None), errors='coerce'),
+            'Kind': action, 'Ticker': _col(df_stock, 'Ticker').astype(str),
+            'Qty': _num(_col(df_stock, 'Qty', 0)), 'Price': _num(_col(df_stock, 'Price', 0)),
+            'Fee': _num(_col(df_stock, 'Fee', 0)), 'Rate': _num(_col(df_stock, 'Exchange_Rate', 0)),
+            'KRW': 0.0, 'USD': 0.0,
+            # 같은 날짜면 BUY(매수)를 먼저 처리 (원가 꼬임 방지)
+            '_ord': np.where(action == 'BUY', 0, 1)}))
+    if not frames:
+        return pd.DataFrame(columns=['Date', 'Kind', 'Ticker', 'Qty', 'Price', 'Fee', 'Rate', 'KRW', 'USD', '_ord'])
+    ev = pd.concat(frames, ignore_index=True)
+    return ev.sort_values(['Date', '_ord'], kind='mergesort', na_position='last').reset_index(drop=True)
+
+
+def _new_state():
+    return {'n': 0, 'invested': 0.0, 'krw': 0.0, 'usd': 0.0, 'usd_in': 0.0, 'usd_out': 0.0, 'total_div': 0.0,
+            'tickers': [], 'qty': [],
+            'held_usd': 0.0, 'spent_krw': 0.0, 'last_rate': DEFAULT_FX,   # 환전 평단
+            'basis': {},                                                 # 세금용 원화 매입원가
+            'realized': {}, 'div_by_month': {}, 'buy_log': [], 'sell_log': [], 'div_log': [],
+            'daily': pd.DataFrame(columns=STATE_COLS, dtype=float)}   # 날짜별 변화량 합계 (추세 그래프 재료)
+
+
+def _daily_deltas(ev, tickers):
+    """이벤트마다의 잔고·원금·수량 변화량을 벡터로 만들어 날짜별로 합친다 (행 순회 없음)"""
+    kind = ev['Kind'].values
+    krw, usd = ev['KRW'].values, ev['USD'].values
+    q, p, fee = ev['Qty'].values, ev['Price'].values, ev['Fee'].values
+    dep, wd = kind == 'Deposit', kind == 'Withdraw'
+    ex, rex = kind == 'Exchange', kind == 'Exchange_USD_to_KRW'
+    buy, sell, div = kind == 'BUY', kind == 'SELL', kind == 'DIVIDEND'
+    d = pd.DataFrame({
+        'Total_Invested': np.where(dep, krw, 0.0) - np.where(wd, krw, 0.0),
+        'Cash_KRW': np.where(dep | rex, krw, 0.0) - np.where(wd | ex, krw, 0.0),
+        'Cash_USD': (np.where(ex, usd, 0.0) - np.where(rex, usd, 0.0) - np.where(buy, q * p + fee, 0.0)
+                     + np.where(sell, q * p - fee, 0.0) + np.where(div, p - fee, 0.0))},
+        index=ev['Date'].dt.normalize())
+    dq = pd.Series(np.where(buy, q, 0.0) - np.where(sell, q, 0.0), index=d.index)
+    stock = buy | sell | div
+    qty = (dq[stock].groupby([d.index[stock], ev['Ticker'].values[stock]]).sum().unstack(fill_value=0.0)
+           if stock.any() else pd.DataFrame(index=d.index[:0]))
+    qty = qty.reindex(columns=tickers, fill_value=0.0).add_prefix('Stock_')
+    day = d[d.index.notna()].groupby(level=0).sum()
+    return day.join(qty, how='outer').fillna(0.0)
+
+
+def _apply(st, ev):
+    """정렬된 이벤트(ev)를 이어서 순회해 누적 상태 st를 갱신한다 (st는 체크포인트에서 꺼낸 것일 수도 있다)"""
+    tickers = st['tickers']; qty = st['qty']
+    for t in sorted(set(ev.loc[ev['Kind'].isin(['BUY', 'SELL', 'DIVIDEND']), 'Ticker']) - set(tickers)):
+        tickers.append(t); qty.append(0.0)   # 새 종목은 뒤에 붙인다
+    tix = {t: k for k, t in enumerate(tickers)}
+
+    invested = st['invested']; krw = st['krw']; usd = st['usd']
+    usd_in = st['usd_in']; usd_out = st['usd_out']; total_div = st['total_div']
+    held_usd = st['held_usd']; spent_krw = st['spent_krw']; last_rate = st['last_rate']
+    basis = st['basis']; realized = st['realized']; div_by_month = st['div_by_month']
+    buy_log = st['buy_log']; sell_log = st['sell_log']; div_log = st['div_log']
+
+    cols = [ev[c].tolist() for c in EVENT_COLS]
+    for date, kind, t, q, price, fee, rate, a_krw, a_usd in zip(*cols):
+        if kind == 'Deposit':
+            krw += a_krw; invested += a_krw
+        elif kind == 'Withdraw':
+            krw -= a_krw; invested -= a_krw
+        elif kind == 'Exchange':
+            krw -= a_krw; usd += a_usd; usd_in += a_usd
+            held_usd += a_usd; spent_krw += a_krw
+            if held_usd > 0: last_rate = spent_krw / held_usd
+        elif kind == 'Exchange_USD_to_KRW':
+            krw += a_krw; usd -= a_usd
+            if held_usd > 0:
+                sell_usd = min(a_usd, held_usd)
+                spent_krw -= sell_usd * (spent_krw / held_usd)
+                held_usd -= sell_usd
+            if held_usd <= 0.1: held_usd = 0.0; spent_krw = 0.0
+        elif kind == 'BUY':
+            cost = (q * price) + fee
+            usd -= cost; usd_out += cost; qty[tix[t]] += q
+            buy_log.append(f"[-] 매수 {t}: ${cost:.2f}")
+            if rate > 0:   # 환율 0짜리 매수는 세금 원가에서 제외 (거짓 폭탄 방지)
+                b = basis.setdefault(t, {'qty': 0.0, 'cost_krw': 0.0})
+                b['qty'] += q; b['cost_krw'] += (q * price * rate) + (fee * rate)
+        elif kind == 'SELL':
+            revenue = (q * price) - fee
+            usd += revenue; qty[tix[t]] -= q
+            sell_log.append(f"[+] 매도 {t}: ${revenue:.2f}")
+            b = basis.setdefault(t, {'qty': 0.0, 'cost_krw': 0.0})
+            if b['qty'] > 0:
+                buy_cost_krw = (b['cost_krw'] / b['qty']) * q
+                profit = ((q * price * rate) - (fee * rate)) - buy_cost_krw
+                b['qty'] -= q; b['cost_krw'] -= buy_cost_krw
+                if not pd.isna(date):
+                    r = realized.setdefault(date.year, {'profit': 0.0, 'log': []})
+                    r['profit'] += profit
+                    r['log'].append(f"{date.strftime('%Y-%m-%d')} {t} 매도: {int(profit):,}원 (수익)")
+        elif kind == 'DIVIDEND':
+            net = price - fee
+            usd += net; total_div += net
+            div_log.append(f"[+] 배당 {t}: ${net:.2f}")
+            basis.setdefault(t, {'qty': 0.0, 'cost_krw': 0.0})
+            if not pd.isna(date):
+                m = date.strftime('%Y-%m')
+                div_by_month[m] = div_by_month.get(m, 0.0) + net
+
+    st.update(n=st['n'] + len(ev), invested=invested, krw=krw, usd=usd, usd_in=usd_in, usd_out=usd_out,
+              total_div=total_div, held_usd=held_usd, spent_krw=spent_krw, last_rate=last_rate,
+              daily=st['daily'].add(_daily_deltas(ev, tickers), fill_value=0.0))
+    return st
+
+
+def _result(st):
+    qty = st['qty']
+    if st['held_usd'] > 0: avg_fx = st['spent_krw'] / st['held_usd']
+    elif sum(qty) > 0.001: avg_fx = st['last_rate']
+    else: avg_fx = DEFAULT_FX
+    return {'krw': st['krw'], 'usd': st['usd'], 'net_principal': st['invested'],
+            'usd_in': st['usd_in'], 'usd_out': st['usd_out'],
+            'stock_log': st['buy_log'] + st['sell_log'] + st['div_log'],
+            'holdings': dict(sorted(zip(st['tickers'], qty))),
+            'total_div': st['total_div'], 'div_by_month': st['div_by_month'],
+            'avg_fx': avg_fx, 'cost_basis': st['basis'], 'realized': st['realized'],
+            'tickers': sorted(st['tickers']), 'daily': st['daily']}
+
+
+# ==========================================
+# 💾 체크포인트 (앞부분이 그대로면 새 줄만 이어서 계산)
+# ==========================================
+CHECKPOINT_PATH = os.environ.get('AEGIS_LEDGER_CHECKPOINT',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), '.ledger_cache', 'ledger.pkl'))
+CHECKPOINT_VERSION = 2   # 누적 상태의 모양이나 계산식이 바뀌면 올려서 옛 체크포인트를 버린다
+
+
+def _row_hashes(ev):
+    return pd.util.hash_pandas_object(ev[EVENT_COLS], index=False).values
+
+
+def _prefix_hash(hashes):
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def events_hash(df_stock, df_cash):
+    """두 시트를 이벤트로 바꾼 모든 줄의 해시 하나. 줄이 추가·수정·삭제되면 달라진다 (봇이 '장부가 그대로인가' 볼 때)"""
+    return _prefix_hash(_row_hashes(build_events(df_stock, df_cash)))
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path, 'rb') as f: ck = pickle.load(f)
+        return ck if ck.get('version') == CHECKPOINT_VERSION else None
+    except Exception:
+        return None
+
+
+def _save_checkpoint(path, ck):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'   # 봇과 앱이 동시에 읽어도 반쯤 쓴 파일을 보지 않도록 교체 방식
+        with open(tmp, 'wb') as f: pickle.dump(ck, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception:
+        pass   # 체크포인트는 캐시일 뿐, 못 써도 결과는 맞다
+
+
+def run_ledger(df_stock, df_cash, checkpoint=None):
+    """이벤트를 한 번 순회해서 장부 숫자를 전부 만든다. 반환 dict:
+    krw, usd, net_principal, usd_in, usd_out, stock_log, holdings{종목: 수량}, total_div, div_by_month{'YYYY-MM': $},
+    avg_fx, cost_basis{종목: {'qty', 'cost_krw'}}, realized{연도: {'profit', 'log'}},
+    tickers, daily(날짜별 원금·현금·수량 변화량 합계), replayed(이번에 순회한 이벤트 수)
+    checkpoint에 파일 경로를 주면, 저장된 '앞부분 n개 이벤트의 해시'가 지금 이벤트의 앞 n개와 같을 때
+    그 뒤에 붙은 이벤트만 이어서 계산한다. 예전 줄이 고쳐지거나 지워졌거나 과거 날짜로 끼어들면 처음부터 다시 계산한다."""
+    ev = build_events(df_stock, df_cash)
+    if checkpoint is None:
+        lg = _result(_apply(_new_state(), ev)); lg['replayed'] = len(ev)
+        return lg
+
+    hashes = _row_hashes(ev)
+    ck = _load_checkpoint(checkpoint)
+    resumed = (ck is not None and ck['state']['n'] <= len(ev)
+               and ck['hash'] == _prefix_hash(hashes[:ck['state']['n']]))
+    st = ck['state'] if resumed else _new_state()
+    start = st['n']
+    if start < len(ev) or not resumed:
+        st = _apply(st, ev.iloc[start:])
+        _save_checkpoint(checkpoint, {'version': CHECKPOINT_VERSION, 'hash': _prefix_hash(hashes), 'state': st})
+    lg = _result(st); lg['replayed'] = len(ev) - start
+    return lg
+
+
+def tax_summary(lg, year):
+    """해당 연도 실현 손익 기준 세금 요약 (기본공제 250만원, 22%)"""
+    r = lg['realized'].get(year, {'profit': 0, 'log': []})
+    profit = r['profit']
+    return {'realized_profit': profit, 'tax_estimated': max(0, profit - TAX_FREE_ALLOWANCE) * TAX_RATE,
+            'remaining_allowance': max(0, TAX_FREE_ALLOWANCE - profit), 'log': r['log']}
+
+
+def daily_history(lg, end=None):
+    """날짜별 변화량의 누적합을 첫 기록일 ~ end(기본 오늘)의 매일 하루 끝 상태로 편다.
+    종목 컬럼(Stock_*)은 장부에 나온 종목 전부 — 기록이 없는 날은 전날 상태를 이어 쓴다."""
+    daily = lg['daily']
+    if daily.empty: return pd.DataFrame()
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.today()
+    date_range = pd.date_range(start=daily.index.min(), end=end)
+    hist = daily.cumsum().reindex(date_range, method='ffill').fillna(0.0)
+    hist = hist.reindex(columns=STATE_COLS + [f"Stock_{t}" for t in lg['tickers']], fill_value=0.0)
+    hist.index.name = 'Date'
+    return hist.reset_index()
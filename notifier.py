@@ -0,0 +1,119 @@
+"""
+Aegis 알림 전송 (Notifier)
+
+텔레그램 Bot API로 메시지를 보내는 부분과, '이미 보낸 신호'를 기억해 같은 알림을 반복하지 않게 하는 부분.
+bot.py와 app.py(테스트 메시지)가 같이 쓴다.
+
+- 전송: 연결을 재사용하는 requests 세션 + 요청마다 제한 시간
+- 재시도: 429는 텔레그램이 알려준 retry_after만큼, 5xx·연결 오류는 지수 백오프로. 그 밖의 4xx는 재시도 없이 실패
+- 길이: 텔레그램 한 메시지 한도(4096자, UTF-16 기준)를 넘으면 줄 단위로 나눠 여러 번 보낸다
+- 중복 억제: 신호 지문(aegis_core.signal_fingerprint)을 AEGIS_NOTIFY_STATE 파일(기본: 이 파일 옆의
+  .notify_state/sent.json)에 남겨, 지난 실행에도 있던 신호는 다시 보내지 않는다. 신호가 한 번 사라졌다가
+  다시 뜨면 새 신호로 본다
+- AEGIS_TELEGRAM_API 환경변수로 로컬 스텁(benchmarks/stub_services.py)을 가리킬 수 있다
+"""
+import os
+import json
+import time
+
+TELEGRAM_API = os.environ.get('AEGIS_TELEGRAM_API', 'https://api.telegram.org').rstrip('/')
+MAX_LEN = 4096   # 텔레그램 sendMessage 한 번의 글자 수 한도 (UTF-16 코드 단위)
+STATE_PATH = os.environ.get('AEGIS_NOTIFY_STATE',
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), '.notify_state', 'sent.json'))
+# 0이면 같은 신호는 조건이 풀릴 때까지 다시 안 보냄. 양수면 그 시간이 지나면 한 번 더 상기시킨다
+REPEAT_HOURS = float(os.environ.get('AEGIS_NOTIFY_REPEAT_HOURS', 0))
+
+
+def _units(s):
+    # 텔레그램은 UTF-16 기준으로 센다 (이모지 하나 = 2)
+    return len(s.encode('utf-16-le')) // 2
+
+
+def chunk_message(text, limit=MAX_LEN):
+    """text를 limit 이하 조각들로. 되도록 줄바꿈에서 자르고, 한 줄이 한도보다 길 때만 줄 중간에서 자른다"""
+    chunks, cur, n = [], [], 0
+    for line in text.splitlines(keepends=True):
+        size = _units(line)
+        if cur and n + size > limit:
+            chunks.append(''.join(cur)); cur, n = [], 0
+        while size > limit:   # 한 줄 자체가 한도를 넘는 경우
+            cut, used = 0, 0
+            while cut < len(line) and used + _units(line[cut]) <= limit: used += _units(line[cut]); cut += 1
+            chunks.append(line[:cut]); line = line[cut:]; size = _units(line)
+        if line: cur.append(line); n += size
+    if cur: chunks.append(''.join(cur))
+    return [c for c in chunks if c.strip()]
+
+
+# ==========================================
+# 📨 텔레그램 전송
+# ==========================================
+class Notifier:
+    def __init__(self, token, chat_id, api=None, timeout=30, retries=4, backoff=1.0, max_wait=60):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.http = requests.Session()
+        self.http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.url = f"{(api or TELEGRAM_API).rstrip('/')}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.timeout, self.retries, self.backoff, self.max_wait = timeout, retries, backoff, max_wait
+        self.sleep = time.sleep   # 벤치/확인용으로 바꿔 끼울 수 있게
+        self.sent = 0             # 이 객체로 실제 보낸 조각 수
+
+    def _post(self, text):
+        import requests
+        for attempt in range(self.retries + 1):
+            wait = self.backoff * 2 ** attempt
+            try:
+                r = self.http.post(self.url, data={"chat_id": self.chat_id, "text": text}, timeout=self.timeout)
+            except requests.RequestException as e:
+                reason = f"연결 오류 {type(e).__name__}"
+            else:
+                try: body = r.json()
+                except ValueError: body = {}
+                if r.status_code == 200 and body.get('ok'):
+                    self.sent += 1
+                    return True
+                reason = f"{r.status_code} {body.get('description', '')}".strip()
+                if r.status_code == 429:
+                    wait = float(body.get('parameters', {}).get('retry_after', wait))
+                elif r.status_code < 500:
+                    print(f"전송 거절 ({reason}) — 재시도하지 않음")   # 토큰·chat_id·문구 문제는 다시 보내도 같다
+                    return False
+            if attempt < self.retries:
+                print(f"전송 재시도 {attempt + 1}/{self.retries} ({reason}) — {min(wait, self.max_wait):.1f}초 뒤")
+                self.sleep(min(wait, self.max_wait))
+        print(f"전송 실패: {reason}")
+        return False
+
+    def send(self, text):
+        """text를 한도에 맞게 나눠 차례로 보낸다. 모든 조각이 전달됐을 때만 True"""
+        return all(self._post(c) for c in chunk_message(text))
+
+
+# ==========================================
+# 🧾 보낸 신호 기록 (중복 억제)
+# ==========================================
+class SignalLog:
+    def __init__(self, path=None, repeat_hours=None):
+        self.path = path or STATE_PATH
+        self.repeat = REPEAT_HOURS if repeat_hours is None else repeat_hours
+        try:
+            with open(self.path, encoding='utf-8') as f: self.active = dict(json.load(f).get('active', {}))
+        except (OSError, ValueError, AttributeError): self.active = {}   # 없거나 깨졌으면 처음부터
+
+    def fresh(self, fingerprints, now=None):
+        """이번에 보내야 할 지문 — 지난 실행에 없던 것 (+ repeat_hours가 지난 것)"""
+        now = time.time() if now is None else now
+        return {fp for fp in fingerprints
+                if fp not in self.active or (self.repeat > 0 and now - self.active[fp] >= self.repeat * 3600)}
+
+    def commit(self, fingerprints, sent=(), now=None):
+        """이번 실행의 신호 목록으로 기록을 바꾼다. 사라진 신호는 잊고, 보낸 신호는 보낸 시각을 새로 적는다"""
+        now = time.time() if now is None else now
+        self.active = {fp: (now if fp in sent else self.active.get(fp, now)) for fp in fingerprints}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'   # 반쯤 쓴 파일이 남지 않도록 교체 방식
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump({'active': self.active}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
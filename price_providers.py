@@ -0,0 +1,273 @@
+"""
+Aegis 시세 공급자 (Price Providers)
+
+price_store가 '저장소에 없는 구간'을 받아 올 때 쓰는 곳. 어디서 받든 모양은 같다:
+    histories(종목들, start, end=None) → {종목: OHLCV 프레임}  (여러 종목 한 번에, 받지 못한 종목은 빠진다)
+    history(종목, start, end=None)     → 프레임 하나 (없으면 빈 프레임)
+    latest_close(종목)                 → 마지막 종가 (없으면 None)
+프레임은 price_store와 같은 모양: 날짜(시간대 없는 자정) 인덱스 'Date', 열은 COLUMNS 중 있는 것, 수정주가.
+
+공급자
+- yfinance : yf.download 일괄 요청 (기본 1순위)
+- chart    : Yahoo chart API(/v8/finance/chart)를 직접. AEGIS_YAHOO_URL이 있으면 그 주소(로컬 스텁)
+- fixture  : 폴더의 {종목}.csv를 그대로 읽는다. 네트워크 없이 늘 같은 값 (오프라인 실행·벤치마크용)
+             record()로 다른 공급자에서 받은 값을 fixture 폴더에 떠 둘 수 있다
+
+실패 처리는 한 군데에서: 원격 공급자는 RetryPolicy(횟수·지수 백오프·요청 제한 시간)대로 '아직 못 받은 종목만'
+다시 요청하고, 끝까지 못 받은 종목은 체인의 다음 공급자에게 넘긴다.
+
+설정 (환경변수)
+- AEGIS_PRICE_PROVIDERS : 쉼표로 적은 체인 (예: 'yfinance,chart', 'fixture'). 없으면
+  AEGIS_PRICE_FIXTURES가 있을 때 'fixture', AEGIS_YAHOO_URL이 있을 때 'chart', 아니면 'yfinance,chart'
+- AEGIS_PRICE_FIXTURES  : fixture 폴더
+- AEGIS_PRICE_RETRIES / AEGIS_PRICE_BACKOFF / AEGIS_PRICE_TIMEOUT : 재시도 횟수(2), 첫 대기 초(1.0), 요청 제한 초(30)
+"""
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+import pandas as pd
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+YAHOO_URL = os.environ.get('AEGIS_YAHOO_URL', '').rstrip('/')
+FIXTURE_DIR = os.environ.get('AEGIS_PRICE_FIXTURES', '')
+
+
+def normalize(df):
+    """공급자가 준 프레임을 저장소 모양으로: 날짜만 남긴 인덱스, 중복 날짜는 마지막 값, 날짜순"""
+    df = df[[c for c in COLUMNS if c in df.columns]].dropna(how='all').astype(float)
+    idx = pd.to_datetime(df.index)
+    if idx.tz is not None: idx = idx.tz_localize(None)
+    df.index = idx.normalize()
+    df.index.name = 'Date'
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def _file_name(ticker):
+    # '^VIX' → '_VIX', 'KRW=X' → 'KRW_X', 'DX-Y.NYB' → 'DX_Y_NYB'
+    return re.sub(r'[^A-Za-z0-9]', '_', ticker)
+
+
+# ==========================================
+# ⏱️ 공통 재시도 규칙
+# ==========================================
+class RetryPolicy:
+    def __init__(self, retries=None, backoff=None, timeout=None):
+        self.retries = int(os.environ.get('AEGIS_PRICE_RETRIES', 2)) if retries is None else retries
+        self.backoff = float(os.environ.get('AEGIS_PRICE_BACKOFF', 1.0)) if backoff is None else backoff
+        self.timeout = float(os.environ.get('AEGIS_PRICE_TIMEOUT', 30)) if timeout is None else timeout
+        self.sleep = time.sleep   # 확인용으로 바꿔 끼울 수 있게
+
+    def wait(self, attempt):
+        self.sleep(self.backoff * 2 ** attempt)
+
+
+# ==========================================
+# 🔌 공급자
+# ==========================================
+class PriceProvider(ABC):
+    """fetch(tickers, start, end, timeout)만 구현하면 나머지는 여기서. remote=False면 재시도하지 않는다.
+    fetch가 없는 공급자는 만들 때 바로 TypeError (체인 도중에 터지지 않게)"""
+    name = 'base'
+    remote = True
+
+    @abstractmethod
+    def fetch(self, tickers, start, end, timeout):
+        """{종목: normalize된 프레임} — 받지 못한 종목은 빼고 돌려준다"""
+
+    def histories(self, tickers, start, end=None, policy=None):
+        return PriceChain([self], policy).histories(tickers, start, end)
+
+    def history(self, ticker, start, end=None, policy=None):
+        return self.histories([ticker], start, end, policy).get(ticker, pd.DataFrame(columns=COLUMNS))
+
+    def latest_close(self, ticker, policy=None):
+        df = self.history(ticker, pd.Timestamp.today().normalize() - pd.Timedelta(days=10), policy=policy)
+        return float(df['Close'].iloc[-1]) if len(df) else None
+
+
+class YFinanceProvider(PriceProvider):
+    name = 'yfinance'
+
+    def fetch(self, tickers, start, end, timeout):
+        import yfinance as yf   # 무거워서(0.3초+) 실제로 받을 때만 불러온다
+        raw = yf.download(list(tickers), start=start.strftime('%Y-%m-%d'),
+                          end=end.strftime('%Y-%m-%d') if end is not None else None, group_by='ticker',
+                          auto_adjust=True, threads=True, progress=False, timeout=timeout)
+        out = {}
+        if raw is None or raw.empty: return out
+        for t in tickers:
+            if t not in raw.columns.get_level_values(0): continue
+            df = normalize(raw[t])
+            if not df.empty: out[t] = df
+        return out
+
+
+class ChartProvider(PriceProvider):
+    """Yahoo chart API를 직접 부른다. yfinance의 auto_adjust처럼 OHLC에 (수정종가/종가) 비율을 곱하고,
+    봉 시각은 거래소 시간대 날짜로 바꾼다. 종목당 한 요청이라 동시에 부른다"""
+    name = 'chart'
+
+    def __init__(self, base=None):
+        self.base = (base or YAHOO_URL or 'https://query1.finance.yahoo.com').rstrip('/')
+        self.http = None
+
+    def _get(self, t, p1, p2, timeout):
+        r = self.http.get(f"{self.base}/v8/finance/chart/{t}", params={'period1': p1, 'period2': p2, 'interval': '1d'},
+                          headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout)
+        r.raise_for_status()
+        return r.json()['chart']['result'][0]
+
+    def fetch(self, tickers, start, end, timeout):
+        import requests
+        from concurrent.futures import ThreadPoolExecutor
+        if self.http is None: self.http = requests.Session()
+        p1 = int(start.timestamp())
+        p2 = int(end.timestamp()) if end is not None else int(pd.Timestamp.now().timestamp()) + 86400
+        with ThreadPoolExecutor(max_workers=min(8, len(tickers)) or 1) as ex:
+            futures = {t: ex.submit(self._get, t, p1, p2, timeout) for t in tickers}
+        out, errors = {}, []
+        for t, fut in futures.items():
+            if fut.exception() is not None:   # 이 종목만 빠진다 (못 받은 종목만 재시도·다음 공급자로)
+                errors.append(fut.exception()); continue
+            res = fut.result()
+            q = res['indicators']['quote'][0]
+            df = pd.DataFrame({'Open': q['open'], 'High': q['high'], 'Low': q['low'], 'Close': q['close'],
+                               'Volume': q['volume']},
+                              index=pd.to_datetime(res['timestamp'], unit='s', utc=True)
+                                      .tz_convert(res['meta'].get('exchangeTimezoneName', 'UTC')))
+            adj = res['indicators'].get('adjclose')
+            if adj:
+                ratio = pd.Series(adj[0]['adjclose'], index=df.index, dtype=float) / df['Close'].astype(float)
+                for c in ['Open', 'High', 'Low', 'Close']: df[c] = df[c].astype(float) * ratio
+            df = normalize(df)
+            if end is not None: df = df[df.index < end]
+            if not df.empty: out[t] = df
+        if errors and not out: raise errors[0]   # 전부 실패면 이유를 남기도록
+        return out
+
+
+class FixtureProvider(PriceProvider):
+    """folder/{종목}.csv (Date,Open,High,Low,Close,Volume)를 읽는다. 파일이 없는 종목은 빠진다"""
+    name = 'fixture'
+    remote = False
+
+    def __init__(self, folder=None):
+        self.folder = folder or FIXTURE_DIR
+        if not self.folder: raise ValueError("fixture 폴더가 없습니다 (AEGIS_PRICE_FIXTURES)")
+        self._frames = {}   # 한 번 읽은 파일은 다시 읽지 않는다
+
+    def path(self, ticker):
+        return os.path.join(self.folder, _file_name(ticker) + '.csv')
+
+    def fetch(self, tickers, start, end, timeout):
+        out = {}
+        for t in tickers:
+            if t not in self._frames:
+                try: self._frames[t] = normalize(pd.read_csv(self.path(t), index_col='Date', parse_dates=True))
+                except FileNotFoundError: continue
+            df = self._frames[t]
+            df = df[df.index >= start]
+            if end is not None: df = df[df.index < end]
+            if not df.empty: out[t] = df
+        return out
+
+
+# ==========================================
+# 🔗 체인 (1순위 → 2순위 …)
+# ==========================================
+class PriceChain(PriceProvider):
+    remote = False   # 재시도는 체인 안의 공급자마다 이미 한다
+
+    def __init__(self, providers, policy=None):
+        self.providers = list(providers)
+        self.policy = policy or RetryPolicy()
+        self.name = ','.join(p.name for p in self.providers)
+        self.served = {}   # 공급자 이름 → 그 공급자가 준 종목 수 (로그·벤치용)
+
+    def histories(self, tickers, start, end=None, policy=None):
+        """아직 못 받은 종목만 골라 공급자마다 재시도하고, 끝까지 못 받으면 다음 공급자로"""
+        pol = policy or self.policy
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize() if end is not None else None
+        out, todo = {}, list(dict.fromkeys(tickers))
+        for p in self.providers:
+            for attempt in range(pol.retries + 1 if p.remote else 1):
+                try: got = p.fetch(todo, start, end, pol.timeout)
+                except Exception as e:
+                    got = {}
+                    print(f"시세 {p.name} 실패 ({type(e).__name__}: {e})")
+                got = {t: df for t, df in got.items() if t in todo and not df.empty}
+                out.update(got)
+                self.served[p.name] = self.served.get(p.name, 0) + len(got)
+                todo = [t for t in todo if t not in got]
+                if not todo: return out
+                if p.remote and attempt < pol.retries: pol.wait(attempt)
+        return out
+
+    def fetch(self, tickers, start, end, timeout):
+        # 체인도 공급자 하나처럼 (다른 체인 안에 넣을 때)
+        return self.histories(tickers, start, end)
+
+
+_PROVIDERS = {'yfinance': YFinanceProvider, 'chart': ChartProvider, 'fixture': FixtureProvider}
+
+
+def from_spec(spec, policy=None):
+    """'yfinance,chart' 같은 이름 목록으로 체인을 만든다"""
+    names = [s.strip() for s in spec.split(',') if s.strip()]
+    bad = [n for n in names if n not in _PROVIDERS]
+    if bad or not names: raise ValueError(f"모르는 시세 공급자: {spec!r} (가능: {', '.join(_PROVIDERS)})")
+    return PriceChain([_PROVIDERS[n]() for n in names], policy)
+
+
+def default_spec():
+    spec = os.environ.get('AEGIS_PRICE_PROVIDERS', '')
+    if spec: return spec
+    if FIXTURE_DIR: return 'fixture'
+    if YAHOO_URL: return 'chart'
+    return 'yfinance,chart'
+
+
+_default = None
+
+
+def get_provider():
+    """환경변수로 정한 기본 체인 (프로세스에 하나, 세션·연결을 재사용)"""
+    global _default
+    if _default is None: _default = from_spec(default_spec())
+    return _default
+
+
+def set_provider(provider):
+    """기본 체인을 바꿔 끼운다 (벤치마크·오프라인 실행). None이면 다음에 환경변수로 다시 만든다"""
+    global _default
+    _default = provider
+
+
+# ==========================================
+# 📼 fixture 뜨기
+# ==========================================
+def record(folder, tickers, start, end=None, source=None):
+    """source(기본: 기본 체인)에서 받은 일봉을 folder/{종목}.csv로 저장. 저장한 종목 목록을 돌려준다"""
+    os.makedirs(folder, exist_ok=True)
+    frames = (source or get_provider()).histories(tickers, start, end)
+    for t, df in frames.items():
+        tmp = os.path.join(folder, _file_name(t) + '.csv.tmp')
+        df.to_csv(tmp)
+        os.replace(tmp, os.path.join(folder, _file_name(t) + '.csv'))
+    return sorted(frames)
+
+
+if __name__ == '__main__':
+    import argparse
+    ap = argparse.ArgumentParser(description="시세를 받아 fixture 폴더(종목별 CSV)로 저장")
+    ap.add_argument('folder')
+    ap.add_argument('tickers', nargs='+')
+    ap.add_argument('--start', default='2015-01-01')
+    ap.add_argument('--end', default=None)
+    ap.add_argument('--source', default=None, help="공급자 체인 (기본: 환경변수 설정)")
+    a = ap.parse_args()
+    saved = record(a.folder, a.tickers, a.start, a.end, from_spec(a.source) if a.source else None)
+    print(f"{len(saved)}종목 저장: {', '.join(saved)}" + (f" / 못 받음: {sorted(set(a.tickers) - set(saved))}"
+                                                     if set(a.tickers) - set(saved) else ''))
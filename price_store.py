@@ -0,0 +1,158 @@
+"""
+Aegis 가격 저장소 (Price Store)
+
+종목별 일봉(OHLCV)을 디스크에 parquet로 쌓아두고, 매번 전체 기간을 새로 받지 않고
+'마지막 저장 봉 이후의 꼬리'만 이어 받는다. bot.py와 app.py가 같이 쓴다.
+
+- 저장 위치: AEGIS_PRICE_STORE 환경변수 (기본: 이 파일 옆의 .price_store/)
+- 종목마다 {이름}.parquet (가격) + {이름}.json (어디까지 받아 뒀는지) 두 파일
+- 마지막 봉은 장중에 계속 바뀌므로, 꼬리를 받을 때 마지막 봉부터 다시 받아 덮어쓴다
+- 저장본은 받은 시점 기준의 수정주가(분할·배당 반영)다. 꼬리를 받을 때 이미 마감된 그 앞 봉도 같이 받아
+  종가를 맞춰 보고, 다르면(그 사이 분할·배당으로 기준이 바뀜) 그 종목 저장본을 버리고 전체 구간을 다시 받는다
+- 어디서 받을지(yfinance → chart API 예비, 또는 오프라인 fixture)와 재시도는 price_providers가 정한다
+"""
+import os
+import re
+import json
+import pandas as pd
+import price_providers
+
+STORE_DIR = os.environ.get('AEGIS_PRICE_STORE',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), '.price_store'))
+COLUMNS = price_providers.COLUMNS
+ADJUST_RTOL = 1e-4   # 다시 받은 마감 봉 종가가 저장본과 이만큼(상대) 넘게 다르면 수정주가 기준이 바뀐 것으로 본다
+
+
+def _path(ticker, ext):
+    # '^VIX' → '_VIX', 'KRW=X' → 'KRW_X', 'DX-Y.NYB' → 'DX_Y_NYB'
+    return os.path.join(STORE_DIR, re.sub(r'[^A-Za-z0-9]', '_', ticker) + ext)
+
+
+def _load(ticker):
+    """저장된 (가격 프레임, 보장 시작일). 없으면 (None, None)"""
+    try:
+        df = pd.read_parquet(_path(ticker, '.parquet'))
+        with open(_path(ticker, '.json')) as f: meta = json.load(f)
+        return df, pd.Timestamp(meta['covered_from'])
+    except Exception:
+        return None, None
+
+
+def _save(ticker, df, covered_from):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    # 다른 프로세스(봇/앱)가 반쯤 쓴 파일을 읽지 않도록 임시 파일에 쓰고 교체
+    tmp = _path(ticker, '.parquet.tmp')
+    df.to_parquet(tmp)
+    os.replace(tmp, _path(ticker, '.parquet'))
+    tmp = _path(ticker, '.json.tmp')
+    # 마지막 봉(시각, 종가)도 같이 적어 둔다 — 봇이 parquet를 열지 않고 '시세가 바뀌었나'만 볼 수 있게
+    last = [df.index[-1].isoformat(), float(df['Close'].iloc[-1])] if len(df) and 'Close' in df else None
+    with open(tmp, 'w') as f: json.dump({'covered_from': covered_from.strftime('%Y-%m-%d'), 'last': last}, f)
+    os.replace(tmp, _path(ticker, '.json'))
+
+
+def last_bars(tickers):
+    """종목별로 저장소에 있는 마지막 봉 [시각, 종가] (네트워크·parquet 없이 메타 파일만). 모르면 None"""
+    out = {}
+    for t in tickers:
+        try:
+            with open(_path(t, '.json')) as f: out[t] = json.load(f).get('last')
+        except Exception: out[t] = None
+    return out
+
+
+def _drop(ticker):
+    for ext in ('.parquet', '.json'):
+        try: os.remove(_path(ticker, ext))
+        except FileNotFoundError: pass
+
+
+def _check_from(df):
+    # 마지막 봉은 장중 값일 수 있으니, 이미 마감된 그 앞 봉부터 다시 받아 저장본과 맞춰 본다
+    return df.index[-2] if len(df) > 1 else df.index[-1]
+
+
+def _rebased(old, new):
+    """다시 받은 마감 봉들의 종가가 저장본과 다르면 True (분할·배당으로 과거 수정주가가 전부 바뀌었다)"""
+    both = old.index[:-1].intersection(new.index)
+    if both.empty: return False
+    a, b = old.loc[both, 'Close'], new.loc[both, 'Close']
+    return bool(((a - b).abs() > ADJUST_RTOL * a.abs()).any())
+
+
+def _merge(old, new):
+    if old is None or old.empty: return new
+    df = pd.concat([old, new])
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def _download(tickers, start):
+    """여러 종목을 start부터 받아 {종목: 프레임} (시세 공급자 체인이 재시도·예비 공급자까지 맡는다)"""
+    return price_providers.get_provider().histories(tickers, start)
+
+
+def _download_each(starts):
+    """{종목: 시작일} — 시작일이 같은 종목끼리 묶어 한 번씩 받는다 (낡은 종목 하나 때문에 모두가 긴 구간을 받지 않게)"""
+    groups = {}
+    for t, day in starts.items(): groups.setdefault(day, []).append(t)
+    out = {}
+    for day, ts in groups.items(): out.update(_download(ts, day))
+    return out
+
+
+def period_start(period):
+    """yfinance의 period 문자열을 '이 날짜부터 있으면 충분하다'는 시작일로 바꾼다"""
+    today = pd.Timestamp.today().normalize()
+    n = int(re.match(r'\d+', period).group())
+    if period.endswith('mo'): return today - pd.DateOffset(months=n)
+    if period.endswith('y'): return today - pd.DateOffset(years=n)
+    return today - pd.Timedelta(days=n * 2 + 5)   # 'Nd'는 거래일 기준이라 주말·휴일 여유를 둔다
+
+
+def slice_period(df, period):
+    """yfinance의 period('5d', '1mo', '2mo', '3mo', '1y')와 같은 구간만 잘라낸다"""
+    if df.empty: return df
+    if period.endswith('d'): return df.tail(int(period[:-1]))
+    if period.endswith('mo'): offset = pd.DateOffset(months=int(period[:-2]))
+    else: offset = pd.DateOffset(years=int(period[:-1]))
+    return df[df.index >= df.index[-1] - offset]
+
+
+def get_histories(tickers, period=None, start=None):
+    """여러 종목의 일봉을 저장소에서 꺼내 준다.
+    처음 보는 구간(콜드)은 한 번에 통째로, 이미 있는 종목(웜)은 마지막 봉 이후만 받는다 (이어 받을 날짜가 같은 종목끼리 한 번에).
+    이번에 새로 받지 못한 종목은 (낡은 저장본이 있어도) 결과에서 빠진다 — 실패 처리는 호출하는 쪽의 몫."""
+    need_from = pd.Timestamp(start).normalize() if start is not None else period_start(period)
+    stored = {t: _load(t) for t in tickers}
+    cold = [t for t in tickers if stored[t][0] is None or stored[t][1] > need_from]
+    warm = [t for t in tickers if t not in cold]
+
+    fresh = {}
+    if cold: fresh.update(_download(cold, need_from))
+    if warm:
+        got = _download_each({t: _check_from(stored[t][0]) for t in warm})
+        rebased = [t for t in got if _rebased(stored[t][0], got[t])]
+        for t in rebased:
+            # 새 꼬리와 예전 저장본은 가격 기준이 달라 이어 붙일 수 없다 → 저장본을 버리고 콜드처럼 통째로
+            print(f"시세 {t}: 수정주가 기준이 바뀜 → 저장본을 버리고 전체 구간을 다시 받습니다")
+            _drop(t); del got[t]
+            stored[t] = (None, stored[t][1])
+        got.update(_download_each({t: stored[t][1] for t in rebased}))
+        fresh.update(got)
+
+    out = {}
+    for t in tickers:
+        if t not in fresh: continue
+        df, covered_from = stored[t]
+        df = _merge(df, fresh[t])
+        if t in cold: covered_from = need_from
+        _save(t, df, covered_from)
+        out[t] = slice_period(df, period) if period else df[df.index >= need_from]
+    return out
+
+
+def get_history(ticker, period=None, start=None, end=None):
+    """한 종목의 일봉. period 또는 start/end(end는 미포함) 중 하나로 구간을 지정한다."""
+    df = get_histories([ticker], period=period, start=start).get(ticker, pd.DataFrame(columns=COLUMNS))
+    if end is not None: df = df[df.index < pd.Timestamp(end)]
+    return df
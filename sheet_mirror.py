@@ -0,0 +1,335 @@
+"""
+Aegis 시트 미러 (Sheet Mirror)
+
+구글 시트(Sheet1/시트1, CashFlow)를 로컬 SQLite에 그대로 복사해 두고, app.py와 bot.py는
+이 사본을 읽는다. 시트 전체를 다시 받는 건 '싼 신선도 확인'이 바뀌었다고 할 때만.
+
+- 신선도: 구글 시트는 Drive의 modifiedTime (스프레드시트 전체에 한 번), 실패하면 각 시트의 A열 줄 수
+- 쓰기: 시트에 먼저 append/덮어쓰기 → 성공하면 로컬 사본에도 같은 줄을 반영 (write-through).
+  사본에 반영했는지(그 사이 다른 곳의 수정이 없었는지)를 돌려주므로, 위에 캐시를 둔 쪽도 같은 변경만 반영할 수 있다
+- 저장 위치: AEGIS_SHEET_MIRROR 환경변수 (기본: 이 파일 옆의 .sheet_mirror/mirror.sqlite)
+- AEGIS_SHEET_DIR 환경변수가 있으면 구글 대신 그 폴더의 {시트}.csv 파일을 시트로 쓴다 (테스트/오프라인용)
+- AEGIS_SHEETS_API 환경변수가 있으면 그 주소의 Sheets REST 모양 서버(로컬 스텁)를 시트로 쓴다
+- 구글 시트는 처음 쓸 때 연다(인증·네트워크). 못 열거나 못 닿으면 sync만 실패하고 사본은 그대로 읽힌다
+"""
+import os
+import re
+import json
+import sqlite3
+from contextlib import contextmanager
+import pandas as pd
+
+DB_PATH = os.environ.get('AEGIS_SHEET_MIRROR',
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sheet_mirror', 'mirror.sqlite'))
+SHEET_DIR = os.environ.get('AEGIS_SHEET_DIR', '')
+SHEETS_API = os.environ.get('AEGIS_SHEETS_API', '')
+SHEETS = ['Sheet1', 'CashFlow']   # 'Sheet1'은 실제 이름이 '시트1'이어도 이 이름으로 부른다
+STOCK_COLS = ["Date", "Ticker", "Action", "Qty", "Price", "Exchange_Rate", "Fee"]
+CASH_COLS = ["Date", "Type", "Amount_KRW", "Amount_USD", "Ex_Rate"]
+
+
+def _cell(v):
+    # numpy 값/NaN은 JSON(API)과 CSV에 그대로 못 넣는다
+    if hasattr(v, 'item'): v = v.item()
+    if isinstance(v, float) and v != v: return ""
+    return v
+
+
+# ==========================================
+# 🌐 원본 1: 구글 시트 (gspread Spreadsheet)
+# ==========================================
+class GSheetSource:
+    def __init__(self, book):
+        self.book = book
+        self._ws = {}   # 이름 → (worksheet, 헤더). 한 번 찾으면 다시 탐색하지 않음
+
+    def worksheet(self, name):
+        if name not in self._ws:
+            try: ws = self.book.worksheet(name)
+            except Exception:
+                if name != 'Sheet1': raise
+                ws = self.book.worksheet('시트1')
+            self._ws[name] = (ws, ws.row_values(1))
+        return self._ws[name]
+
+    def version(self):
+        try: return 'mtime:' + self.book.get_lastUpdateTime()
+        except Exception:
+            # Drive 권한이 없으면 A열 줄 수로 (줄 추가/삭제는 잡고, 제자리 수정은 못 잡는다)
+            return 'rows:' + ','.join(str(len(self.worksheet(n)[0].col_values(1))) for n in SHEETS)
+
+    def fetch(self, name):
+        from gspread.utils import numericise_all
+        ws, _ = self.worksheet(name)
+        values = ws.get_all_values()
+        header = values[0] if values else []
+        self._ws[name] = (ws, header)
+        # get_all_records와 같은 숫자 변환 (봇이 예전에 받던 값과 같게)
+        rows = [numericise_all(r[:len(header)] + [""] * (len(header) - len(r))) for r in values[1:]]
+        return pd.DataFrame(rows, columns=header)
+
+    def append(self, name, rows, cols):
+        ws, header = self.worksheet(name)
+        if not header:
+            ws.update('A1', [cols]); header = list(cols); self._ws[name] = (ws, header)
+        if any(c not in header for c in cols): raise ValueError(f"{name}: 헤더가 다릅니다 {header}")
+        values = [[_cell(r.get(h, "")) for h in header] for r in rows]
+        res = ws.append_rows(values, value_input_option="USER_ENTERED", insert_data_option="INSERT_ROWS", table_range="A1")
+        # 응답의 updatedRows로 기록 확인 (시트 전체를 다시 받지 않음)
+        if (res or {}).get("updates", {}).get("updatedRows", 0) != len(values):
+            raise RuntimeError(f"{name}: append 확인 실패 ({res})")
+
+    def rewrite(self, name, df):
+        ws, _ = self.worksheet(name)
+        values = [list(df.columns)] + [[_cell(v) for v in r] for r in df.itertuples(index=False)]
+        ws.clear()
+        ws.update('A1', values, value_input_option="USER_ENTERED")
+        self._ws[name] = (ws, list(df.columns))
+
+
+# ==========================================
+# 📁 원본 2: 로컬 CSV 파일 (구글 시트 대역)
+# ==========================================
+class FileSheetSource:
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.folder, f"{name}.csv")
+
+    def version(self):
+        parts = []
+        for n in SHEETS:
+            try: s = os.stat(self._path(n)); parts.append(f"{s.st_mtime_ns}:{s.st_size}")
+            except FileNotFoundError: parts.append('-')
+        return 'file:' + ','.join(parts)
+
+    def fetch(self, name):
+        try: return pd.read_csv(self._path(name))
+        except (FileNotFoundError, pd.errors.EmptyDataError): return pd.DataFrame()
+
+    def append(self, name, rows, cols):
+        header = list(self.fetch(name).columns) or list(cols)
+        if any(c not in header for c in cols): raise ValueError(f"{name}: 헤더가 다릅니다 {header}")
+        new = pd.DataFrame([[_cell(r.get(h, "")) for h in header] for r in rows], columns=header)
+        exists = os.path.exists(self._path(name)) and os.path.getsize(self._path(name)) > 0
+        new.to_csv(self._path(name), mode='a', header=not exists, index=False)
+
+    def rewrite(self, name, df):
+        tmp = self._path(name) + '.tmp'
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, self._path(name))
+
+
+# ==========================================
+# 🔌 원본 3: Sheets/Drive REST 모양의 HTTP 서버 (로컬 스텁 서버 테스트용)
+# ==========================================
+class HttpSheetSource:
+    """Sheets v4 values / Drive v3 modifiedTime 엔드포인트만 쓰는 얇은 REST 클라이언트.
+    인증은 하지 않는다 — benchmarks/stub_services.py 같은 로컬 스텁을 가리킬 때 쓴다"""
+    def __init__(self, base, spreadsheet_id, timeout=30):
+        import requests
+        self.http = requests.Session()
+        self.base, self.id, self.timeout = base.rstrip('/'), spreadsheet_id, timeout
+        self._title = {}
+
+    def _call(self, method, path, **kw):
+        r = self.http.request(method, f"{self.base}{path}", timeout=self.timeout, **kw)
+        r.raise_for_status()
+        return r.json()
+
+    def _values(self, name, rng=''):
+        # 'Sheet1'이 없으면 '시트1' (실제 시트와 같은 규칙)
+        titles = [self._title[name]] if name in self._title else [name] + (['시트1'] if name == 'Sheet1' else [])
+        for i, title in enumerate(titles):
+            try:
+                res = self._call('GET', f"/v4/spreadsheets/{self.id}/values/{title}{rng}")
+                self._title[name] = title
+                return res.get('values', [])
+            except Exception:
+                if i == len(titles) - 1: raise
+
+    def version(self):
+        return 'mtime:' + self._call('GET', f"/drive/v3/files/{self.id}", params={'fields': 'modifiedTime'})['modifiedTime']
+
+    def fetch(self, name):
+        from gspread.utils import numericise_all
+        values = self._values(name)
+        header = values[0] if values else []
+        rows = [numericise_all(r[:len(header)] + [""] * (len(header) - len(r))) for r in values[1:]]
+        return pd.DataFrame(rows, columns=header)
+
+    def append(self, name, rows, cols):
+        header = (self._values(name, '!1:1') or [list(cols)])[0]
+        if any(c not in header for c in cols): raise ValueError(f"{name}: 헤더가 다릅니다 {header}")
+        values = [[_cell(r.get(h, "")) for h in header] for r in rows]
+        res = self._call('POST', f"/v4/spreadsheets/{self.id}/values/{self._title.get(name, name)}:append",
+                         params={'valueInputOption': 'USER_ENTERED', 'insertDataOption': 'INSERT_ROWS'},
+                         json={'values': values})
+        if res.get('updates', {}).get('updatedRows', 0) != len(values):
+            raise RuntimeError(f"{name}: append 확인 실패 ({res})")
+
+    def rewrite(self, name, df):
+        title = self._title.get(name, name)
+        self._call('POST', f"/v4/spreadsheets/{self.id}/values/{title}:clear")
+        values = [list(df.columns)] + [[_cell(v) for v in r] for r in df.itertuples(index=False)]
+        self._call('PUT', f"/v4/spreadsheets/{self.id}/values/{title}",
+                   params={'valueInputOption': 'USER_ENTERED'}, json={'values': values})
+
+
+# ==========================================
+# 🔗 원본 4: streamlit-gsheets 연결 (서비스 계정이 아닌 연결)
+# ==========================================
+class ConnSheetSource:
+    """연결의 read/update만 쓴다. gspread를 직접 못 쓰므로 신선도 표시는 GSheetSource의 대체 방식과 같은
+    A열 줄 수 (줄 추가/삭제는 잡고, 제자리 수정은 못 잡는다). 시트 전체는 fetch에서만 읽고,
+    쓰기는 시트를 읽어 줄을 붙인 뒤 통째로 다시 쓴다"""
+    def __init__(self, conn, sheet_url):
+        self.conn, self.url = conn, sheet_url
+        self._title = None
+
+    def _name(self, name):
+        # 'Sheet1'이 없으면 '시트1'
+        if name != 'Sheet1': return name
+        if self._title is None:
+            try: self.conn.read(spreadsheet=self.url, worksheet='Sheet1', ttl=0, usecols=[0]); self._title = 'Sheet1'
+            except Exception: self._title = '시트1'
+        return self._title
+
+    def _load(self, name, **opts):
+        return self.conn.read(spreadsheet=self.url, worksheet=self._name(name), ttl=0, **opts).dropna(how='all')
+
+    def version(self):
+        return 'rows:' + ','.join(str(len(self._load(n, usecols=[0]))) for n in SHEETS)
+
+    def fetch(self, name):
+        return self._load(name)
+
+    def append(self, name, rows, cols):
+        df = self._load(name)
+        header = list(df.columns) or list(cols)
+        if any(c not in header for c in cols): raise ValueError(f"{name}: 헤더가 다릅니다 {header}")
+        new = pd.DataFrame([[_cell(r.get(h, "")) for h in header] for r in rows], columns=header)
+        self.conn.update(spreadsheet=self.url, worksheet=self._name(name),
+                         data=pd.concat([df, new], ignore_index=True) if len(df) else new)
+
+    def rewrite(self, name, df):
+        self.conn.update(spreadsheet=self.url, worksheet=self._name(name), data=df)
+
+
+class LazySource:
+    """open_source()가 돌려줄 원본을 처음 쓸 때 연다. 열기에 실패하면 다음 호출 때 다시 연다
+    (그동안 SheetMirror는 sync만 실패하고 frame()은 마지막 사본을 그대로 준다)"""
+    def __init__(self, open_source):
+        self._open, self._src = open_source, None
+
+    def _get(self):
+        if self._src is None: self._src = self._open()
+        return self._src
+
+    def version(self): return self._get().version()
+    def fetch(self, name): return self._get().fetch(name)
+    def append(self, name, rows, cols): return self._get().append(name, rows, cols)
+    def rewrite(self, name, df): return self._get().rewrite(name, df)
+
+
+def source_from_env(open_book=None, sheet_url='', open_source=None):
+    """AEGIS_SHEET_DIR가 있으면 파일 대역, AEGIS_SHEETS_API가 있으면 그 HTTP 서버,
+    아니면 open_source()가 돌려주는 원본(없으면 open_book()의 구글 스프레드시트)을 처음 쓸 때 연다"""
+    if SHEET_DIR: return FileSheetSource(SHEET_DIR)
+    if SHEETS_API: return HttpSheetSource(SHEETS_API, re.search(r'/d/([^/]+)', sheet_url).group(1))
+    return LazySource(open_source or (lambda: GSheetSource(open_book())))
+
+
+# ==========================================
+# 🗄️ 로컬 SQLite 사본
+# ==========================================
+class SheetMirror:
+    def __init__(self, source, path=None):
+        self.source = source
+        self.path = path or DB_PATH
+        self.synced = 0   # 이 객체로 전체 동기화한 횟수 (로그/벤치용)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._db() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    @contextmanager
+    def _db(self):
+        # sqlite3 연결의 with는 커밋/롤백만 하고 닫지는 않는다 → 여기서 닫는다 (오래 도는 Streamlit 세션)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db: yield db
+        finally: db.close()
+
+    @staticmethod
+    def _table(name):
+        return f'"sheet_{name}"'
+
+    def _meta(self, db, key):
+        row = db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, db, key, value):
+        db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _store(self, db, name, df):
+        cols = [str(c) for c in df.columns]
+        db.execute(f'DROP TABLE IF EXISTS {self._table(name)}')
+        # 열 이름은 c0, c1.. (시트 헤더는 meta에). 타입을 안 정해야(SQLite 동적 타입) 숫자/글자가 그대로 돌아온다
+        db.execute(f'CREATE TABLE {self._table(name)} ({", ".join(f"c{i}" for i in range(len(cols))) or "_empty"})')
+        if cols and len(df):
+            ph = ', '.join('?' * len(cols))
+            db.executemany(f'INSERT INTO {self._table(name)} VALUES ({ph})',
+                           [[_cell(v) for v in r] for r in df.itertuples(index=False)])
+        self._set_meta(db, 'columns:' + name, json.dumps(cols, ensure_ascii=False))
+
+    def sync(self, force=False):
+        """원본의 신선도 표시가 사본과 다를 때만 전체를 다시 받는다. 받았으면 True"""
+        ver = self.source.version()
+        with self._db() as db:
+            if not force and ver == self._meta(db, 'version'): return False
+            frames = {n: self.source.fetch(n) for n in SHEETS}
+            for n, df in frames.items(): self._store(db, n, df)
+            self._set_meta(db, 'version', ver)
+        self.synced += 1
+        return True
+
+    def frame(self, name):
+        with self._db() as db:
+            cols = json.loads(self._meta(db, 'columns:' + name) or '[]')
+            if not cols: return pd.DataFrame()
+            df = pd.read_sql_query(f'SELECT * FROM {self._table(name)} ORDER BY rowid', db)
+        df.columns = cols
+        return df
+
+    def read(self):
+        """(주식 시트, CashFlow) - 필요하면 먼저 동기화"""
+        self.sync()
+        return self.frame('Sheet1'), self.frame('CashFlow')
+
+    def _write_through(self, write, local):
+        # 쓰기 직전까지 원본이 사본과 같았을 때만 '쓴 뒤의 버전'을 믿는다.
+        # 그 사이 누가 시트를 고쳤으면 버전을 비워서 다음 읽기 때 전체 동기화
+        before = self.source.version()
+        write()
+        with self._db() as db:
+            fresh = before == self._meta(db, 'version')
+            if fresh: local(db)
+            self._set_meta(db, 'version', self.source.version() if fresh else '')
+        return fresh
+
+    def append(self, name, rows, cols):
+        """시트 끝에 rows를 붙이고 사본에도 같은 줄을 넣는다. 사본이 쓰기 직전 원본과 같았으면 True
+        (False면 그 사이 다른 곳에서 시트가 바뀐 것 — 사본은 다음 sync 때 전체를 다시 받는다)"""
+        def local(db):
+            have = json.loads(self._meta(db, 'columns:' + name) or '[]')
+            if not have: self._store(db, name, pd.DataFrame(columns=cols)); have = list(cols)
+            ph = ', '.join('?' * len(have))
+            db.executemany(f'INSERT INTO {self._table(name)} VALUES ({ph})',
+                           [[_cell(r.get(h, "")) for h in have] for r in rows])
+        return self._write_through(lambda: self.source.append(name, rows, cols), local)
+
+    def rewrite(self, name, df):
+        """시트를 df로 덮어쓰고 사본도 바꾼다. 반환값은 append와 같다"""
+        return self._write_through(lambda: self.source.rewrite(name, df), lambda db: self._store(db, name, df))
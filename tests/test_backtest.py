@@ -0,0 +1,143 @@
+"""
+백테스트 배열 커널(backtest.bt_run)이 예전 iterrows 루프와 같은 결과를 내는지.
+
+기준(oracle)은 배열화 전 app.py에 있던 bt_run 본문 그대로다 (점수는 tests/test_master_score.py의 예전 스칼라).
+시드를 고정한 가짜 시장 경로(benchmarks/synthetic.py)에서 평가액 프레임·총 납입액·통계·유휴율·공포 매도 횟수를
+== 로 비교한다.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import indicators
+import synthetic
+from backtest import bt_run
+from test_master_score import legacy_score
+
+
+def legacy_bt_run(df, sched, threshold, spread, target_w, panic_dd=0.20):
+    # 배열화 이전 본문 (점수 함수만 예전 스칼라로)
+    inject = {}
+    for ym, amt in sched.items():
+        if amt <= 0: continue
+        try: t = pd.Timestamp(ym + '-05')
+        except: continue
+        fut = df.index[df.index >= t]
+        if len(fut): inject[fut[0]] = inject.get(fut[0], 0) + amt
+
+    def blank():
+        return {'krw':0.0,'sh':0.0,'ex_krw':0.0,'ex_usd':0.0,'buys':0,
+                'tot_in':0.0,'dip_in':0.0,'panic':0,'halted':False,'resume_px':0.0}
+    A, B, C = blank(), blank(), blank()
+    hist, idle_days, total_days, peakC = [], 0, 0, 0.0
+
+    def deploy(P, rate, price, vix):
+        if P['krw'] <= 0: return
+        amt = P['krw']
+        usd = amt / (rate * (1 + spread))
+        P['ex_krw'] += amt; P['ex_usd'] += usd
+        P['tot_in'] += amt
+        if vix >= 25: P['dip_in'] += amt
+        P['sh'] += usd / price
+        P['krw'] = 0.0; P['buys'] += 1
+
+    for d, r in df.iterrows():
+        if d in inject:
+            for P in (A, B, C): P['krw'] += inject[d]
+
+        deploy(A, r['FX'], r['P'], r['VIX'])
+
+        if B['krw'] > 0:
+            my_avg = (B['ex_krw']/B['ex_usd']) if B['ex_usd'] > 0 else r['FX']
+            b_stock = B['sh'] * r['P'] * r['FX']
+            b_tot = b_stock + B['krw']
+            cur_w = (b_stock / b_tot * 100) if b_tot > 0 else 0.0
+            sc = legacy_score(
+                'BT', r['P'], r['RSI'], r['VIX'], r['MA200'], r['FX'], my_avg,
+                r['FX_MA60'], r['DXY'], r['DXY_MA20'],
+                target_w, cur_w, B['krw'], int(d.day))
+            if sc >= threshold:
+                deploy(B, r['FX'], r['P'], r['VIX'])
+
+        if not C['halted']:
+            deploy(C, r['FX'], r['P'], r['VIX'])
+            eqC = C['sh']*r['P']*r['FX'] + C['krw']
+            peakC = max(peakC, eqC)
+            if C['sh'] > 0 and peakC > 0 and eqC < peakC * (1 - panic_dd):
+                C['krw'] += C['sh'] * r['P'] * r['FX'] * (1 - spread)
+                C['sh'] = 0.0; C['halted'] = True
+                C['resume_px'] = r['P']; C['panic'] += 1
+                C['ex_krw'] = 0.0; C['ex_usd'] = 0.0
+        else:
+            if r['P'] >= C['resume_px']:
+                C['halted'] = False
+                deploy(C, r['FX'], r['P'], r['VIX'])
+            peakC = max(peakC, C['sh']*r['P']*r['FX'] + C['krw'])
+
+        total_days += 1
+        if B['krw'] > 0: idle_days += 1
+        hist.append({'Date': d,
+                     'A': A['sh']*r['P']*r['FX'] + A['krw'],
+                     'B': B['sh']*r['P']*r['FX'] + B['krw'],
+                     'C': C['sh']*r['P']*r['FX'] + C['krw']})
+
+    h = pd.DataFrame(hist).set_index('Date')
+    paid = sum(inject.values())
+
+    def stats(P, col):
+        eq = h[col]; cm = eq.cummax()
+        mdd = ((eq - cm) / cm.where(cm > 0)).min()
+        return {'최종 평가액': eq.iloc[-1],
+                '수익률(%)': (eq.iloc[-1]/paid - 1)*100 if paid else 0,
+                '평균 환율': (P['ex_krw']/P['ex_usd']) if P['ex_usd'] else 0,
+                '매수 횟수': P['buys'],
+                '폭락장 매수 비중(%)': (P['dip_in']/P['tot_in']*100) if P['tot_in'] else 0,
+                'MDD(%)': (mdd*100) if pd.notna(mdd) else 0}
+
+    return (h, paid, stats(A,'A'), stats(B,'B'), stats(C,'C'),
+            (idle_days/total_days*100 if total_days else 0), C['panic'])
+
+
+def market(years, seed):
+    """bt_load 모양의 가짜 영업일 시계열 (P는 QQQ)"""
+    paths = synthetic.market_paths(years, seed)
+    df = pd.DataFrame({'P': paths['QQQ'], 'VIX': paths['^VIX'], 'FX': paths['KRW=X'], 'DXY': paths['DX-Y.NYB']})
+    df['RSI'] = indicators.rsi_wilder(df['P'], 14)
+    df['MA200'] = indicators.sma(df['P'], 200, min_periods=60)
+    df['FX_MA60'] = indicators.sma(df['FX'], 60, min_periods=20)
+    df['DXY_MA20'] = indicators.sma(df['DXY'], 20, min_periods=5)
+    return df.dropna()
+
+
+def schedule(df, amount=1000000):
+    # 매월 납입 + 한 번 쉬는 달, 한 번 두 배 (0 이하·중복 처리까지 같은지)
+    sched = {p.strftime('%Y-%m'): amount for p in pd.period_range(df.index[0], df.index[-1], freq='M')}
+    months = sorted(sched)
+    sched[months[3]] = 0
+    sched[months[len(months) // 2]] = amount * 2
+    return sched
+
+
+@pytest.mark.parametrize('years, seed', [(7, 0), (20, 1)])
+@pytest.mark.parametrize('threshold, spread, target_w, panic_dd', [
+    (70, 0.01, 30.0, 0.20),
+    (40, 0.0, 60.0, 0.10),   # 낮은 임계점·잦은 공포 매도
+    (120, 0.02, 10.0, 0.35),
+])
+def test_bt_run_matches_iterrows_loop(years, seed, threshold, spread, target_w, panic_dd):
+    df = market(years, seed)
+    sched = schedule(df)
+    want = legacy_bt_run(df, sched, threshold, spread, target_w, panic_dd)
+    got = bt_run(df, sched, threshold, spread, target_w, panic_dd)
+    pd.testing.assert_frame_equal(got[0], want[0], check_exact=True, check_freq=False)
+    assert got[1] == want[1]
+    for name, g, w in zip('ABC', got[2:5], want[2:5]):
+        assert g == w, f"전략 {name} 통계가 다름"
+    assert got[5] == want[5]
+    assert got[6] == want[6]
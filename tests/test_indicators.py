@@ -0,0 +1,95 @@
+"""
+지표 모듈(indicators.py)이 예전 정의와 비트 단위로 같은지.
+
+- 일괄: RSI는 ta.momentum.RSIIndicator, 이동평균·최고·최저는 pandas rolling (NaN 자리까지)
+- 스트리밍: 봉 하나씩 update한 값이 일괄과 봉마다 같은지 (이동평균만 상대 오차 RTOL 안),
+  중간에 state()를 JSON으로 저장했다 restore()로 되살려 이어 가도 같은지, peek가 update와 같은지
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indicators as ind
+
+RTOL = 1e-9
+SEEDS = range(12)
+# (이름, 스트리밍 생성, 일괄 계산, pandas 기준 — RSI는 ta)
+CASES = [
+    ('RSI14', lambda: ind.WilderRSI(14), lambda x: ind.rsi_wilder(x, 14), None),
+    ('SMA200/60', lambda: ind.SMA(200, 60), lambda x: ind.sma(x, 200, 60), lambda s: s.rolling(200, min_periods=60).mean()),
+    ('SMA200', lambda: ind.SMA(200), lambda x: ind.sma(x, 200), lambda s: s.rolling(200).mean()),
+    ('SMA5/1', lambda: ind.SMA(5, 1), lambda x: ind.sma(x, 5, 1), lambda s: s.rolling(5, min_periods=1).mean()),
+    ('MAX5/1', lambda: ind.RollingMax(5, 1), lambda x: ind.rolling_max(x, 5, 1), lambda s: s.rolling(5, min_periods=1).max()),
+    ('MIN5/1', lambda: ind.RollingMin(5, 1), lambda x: ind.rolling_min(x, 5, 1), lambda s: s.rolling(5, min_periods=1).min()),
+    ('MAX20', lambda: ind.RollingMax(20), lambda x: ind.rolling_max(x, 20), lambda s: s.rolling(20).max()),
+]
+IDS = [c[0] for c in CASES]
+
+
+def series(n, seed):
+    # 종가 같은 값: 양수, 가끔 같은 값이 이어짐(무변동 봉), 가끔 큰 점프
+    rng = np.random.default_rng(seed)
+    r = rng.normal(0, 0.015, n) * (rng.random(n) > 0.05) + (rng.random(n) < 0.01) * rng.normal(0, 0.1, n)
+    return pd.Series(100 * np.exp(np.cumsum(r)))
+
+
+def samples():
+    # 첫 번째는 창보다 짧은 시계열
+    return [series(30 if seed == 0 else 1500, seed) for seed in SEEDS]
+
+
+def assert_same(got, want, exact=True, what=''):
+    got, want = np.asarray(got, float), np.asarray(want, float)
+    assert np.array_equal(np.isnan(got), np.isnan(want)), f"{what}: NaN 자리가 다름"
+    m = ~np.isnan(want)
+    if exact: bad = np.flatnonzero(got[m] != want[m])
+    else: bad = np.flatnonzero(~np.isclose(got[m], want[m], rtol=RTOL, atol=0))
+    assert bad.size == 0, f"{what}: {bad.size}곳 불일치 (첫 위치 {np.flatnonzero(m)[bad[0]]})"
+
+
+def test_rsi_matches_ta():
+    ta = pytest.importorskip('ta')
+    for seed, s in zip(SEEDS, samples()):
+        assert_same(ind.rsi_wilder(s.values, 14), ta.momentum.RSIIndicator(s, window=14).rsi().values, what=f"seed {seed}")
+        assert_same([ind.rsi_last(s.values, 14)], ind.rsi_wilder(s.values, 14)[-1:], what=f"rsi_last seed {seed}")
+
+
+@pytest.mark.parametrize('name, make, batch, ref', [c for c in CASES if c[3] is not None], ids=IDS[1:])
+def test_rolling_matches_pandas(name, make, batch, ref):
+    for seed, s in zip(SEEDS, samples()):
+        assert_same(batch(s.values), ref(s).values, what=f"{name} seed {seed}")
+
+
+@pytest.mark.parametrize('name, make, batch, ref', CASES, ids=IDS)
+def test_streaming_matches_batch_bar_by_bar(name, make, batch, ref):
+    exact = not name.startswith('SMA')
+    for seed, s in zip(SEEDS, samples()):
+        x = s.values
+        obj = make()
+        out = []
+        for i, v in enumerate(x):
+            p = obj.peek(v)
+            out.append(obj.update(v))
+            assert_same([p], [out[-1]], what=f"{name} seed {seed} peek @{i}")
+        assert_same(out, batch(x), exact=exact, what=f"{name} seed {seed}")
+
+
+@pytest.mark.parametrize('name, make, batch, ref', CASES, ids=IDS)
+def test_state_restore_resumes(name, make, batch, ref):
+    # 여러 지점에서 끊어 JSON으로 저장 → 되살려 이어 간 값이 한 번에 흘린 값과 같아야 (상태가 빠짐없이 저장되는지)
+    x = series(600, 99).values
+    whole = make()
+    want = [whole.update(v) for v in x]
+    for cut in (0, 1, 4, 13, 14, 200, 599):
+        obj = make()
+        for v in x[:cut]: obj.update(v)
+        obj = ind.restore(json.loads(json.dumps(obj.state())))
+        assert type(obj) is type(whole)
+        got = [obj.update(v) for v in x[cut:]]
+        assert_same(got, want[cut:], what=f"{name} cut {cut}")
@@ -0,0 +1,332 @@
+"""
+장부 엔진(ledger.run_ledger)과 체크포인트.
+
+1) 한 번 순회한 결과가 예전 함수들과 같은지: 기준(oracle)은 ledger.py로 합치기 전 app.py에 있던
+   calculate_wallet_balance_detail · calculate_my_avg_exchange_rate · calculate_tax_guard · calculate_history 본문.
+   같은 날짜 줄의 순서만 예전(불안정 정렬)과 달리 시트 순서로 고정했으므로, 기준도 안정 정렬로 맞춘다.
+2) 체크포인트: 뒤에 붙은 줄만 이어서 계산하는지, 과거 날짜로 끼어든 줄·고쳐지거나 지워진 줄·CHECKPOINT_VERSION이
+   바뀐 체크포인트에서는 처음부터 다시 계산하는지. 어느 경우든 결과는 체크포인트 없이 계산한 것과 같아야 한다.
+장부는 benchmarks/synthetic.py의 가짜 장부(시드 고정)를 쓴다.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import ledger
+import synthetic
+
+RTOL = 1e-9   # 예전 함수는 종류별로 묶어 더했고 지금은 날짜순으로 더한다 → 합계만 부동소수 오차 수준으로 다를 수 있다
+
+
+# ==========================================
+# 🧾 예전 함수들 (기준)
+# ==========================================
+def legacy_wallet(df_stock, df_cash):
+    df_stock, df_cash = df_stock.copy(), df_cash.copy()
+    krw_deposit = 0; krw_withdrawn = 0; krw_used_for_usd = 0; krw_gained_from_usd = 0
+    usd_gained = 0; usd_sold = 0
+
+    if not df_cash.empty:
+        for col in ['Amount_KRW', 'Amount_USD']:
+            if col in df_cash.columns: df_cash[col] = pd.to_numeric(df_cash[col].astype(str).str.replace(',',''), errors='coerce').fillna(0)
+
+        krw_deposit = df_cash[df_cash['Type'] == 'Deposit']['Amount_KRW'].sum()
+        krw_withdrawn = df_cash[df_cash['Type'] == 'Withdraw']['Amount_KRW'].sum()
+        ex_to_usd = df_cash[df_cash['Type'] == 'Exchange']
+        krw_used_for_usd = ex_to_usd['Amount_KRW'].sum()
+        usd_gained = ex_to_usd['Amount_USD'].sum()
+        ex_to_krw = df_cash[df_cash['Type'] == 'Exchange_USD_to_KRW']
+        krw_gained_from_usd = ex_to_krw['Amount_KRW'].sum()
+        usd_sold = ex_to_krw['Amount_USD'].sum()
+
+    usd_spent = 0; usd_earned_stock = 0; stock_details = []
+    if not df_stock.empty:
+        for col in ['Qty', 'Price', 'Fee']:
+            if col in df_stock.columns: df_stock[col] = pd.to_numeric(df_stock[col].astype(str).str.replace(',',''), errors='coerce').fillna(0)
+        buys = df_stock[df_stock['Action'] == 'BUY']
+        for _, row in buys.iterrows():
+            cost = (row['Qty'] * row['Price']) + row['Fee']
+            usd_spent += cost
+            stock_details.append(f"[-] 매수 {row['Ticker']}: ${cost:.2f}")
+        sells = df_stock[df_stock['Action'] == 'SELL']
+        for _, row in sells.iterrows():
+            revenue = (row['Qty'] * row['Price']) - row['Fee']
+            usd_earned_stock += revenue
+            stock_details.append(f"[+] 매도 {row['Ticker']}: ${revenue:.2f}")
+        divs = df_stock[df_stock['Action'] == 'DIVIDEND']
+        for _, row in divs.iterrows():
+            revenue = row['Price'] - row['Fee']
+            usd_earned_stock += revenue
+            stock_details.append(f"[+] 배당 {row['Ticker']}: ${revenue:.2f}")
+
+    final_krw = (krw_deposit + krw_gained_from_usd) - (krw_used_for_usd + krw_withdrawn)
+    final_usd = (usd_gained + usd_earned_stock) - (usd_spent + usd_sold)
+    net_principal = krw_deposit - krw_withdrawn
+
+    return {'KRW': final_krw, 'USD': final_usd, 'Net_Principal': net_principal,
+            'Detail_USD_In': usd_gained, 'Detail_USD_Out': usd_spent, 'Stock_Log': stock_details}
+
+
+def legacy_avg_fx(df_cash, df_stock):
+    df_stock = df_stock.copy()
+    has_stock = False
+    if not df_stock.empty:
+        df_stock['Qty'] = pd.to_numeric(df_stock['Qty'].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
+        total_buy = df_stock[df_stock['Action'] == 'BUY']['Qty'].sum()
+        total_sell = df_stock[df_stock['Action'] == 'SELL']['Qty'].sum()
+        if (total_buy - total_sell) > 0.001: has_stock = True
+
+    if df_cash.empty: return 1450.0
+    df = df_cash.copy()
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+        df = df.sort_values('Date', kind='mergesort')   # 예전엔 기본(불안정) 정렬 — 같은 날 줄은 시트 순서로
+
+    total_usd_held = 0.0
+    total_krw_spent = 0.0
+    last_valid_rate = 1450.0
+
+    for _, row in df.iterrows():
+        try:
+            amt_krw = float(str(row['Amount_KRW']).replace(',', ''))
+            amt_usd = float(str(row['Amount_USD']).replace(',', ''))
+        except: continue
+
+        if row['Type'] == 'Exchange':
+            total_usd_held += amt_usd
+            total_krw_spent += amt_krw
+            if total_usd_held > 0: last_valid_rate = total_krw_spent / total_usd_held
+
+        elif row['Type'] == 'Exchange_USD_to_KRW':
+            if total_usd_held > 0:
+                current_avg = total_krw_spent / total_usd_held
+                sell_usd = min(amt_usd, total_usd_held)
+                total_usd_held -= sell_usd
+                total_krw_spent -= (sell_usd * current_avg)
+
+            if total_usd_held <= 0.1:
+                total_usd_held = 0
+                total_krw_spent = 0
+
+    if total_usd_held > 0: return total_krw_spent / total_usd_held
+    if has_stock: return last_valid_rate
+    return 1450.0
+
+
+def legacy_tax_guard(df_stock, current_year):
+    # 예전엔 올해(KST)만 — 연도를 인자로 받게만 바꿨다
+    if df_stock.empty: return {'realized_profit': 0, 'tax_estimated': 0, 'log': [], 'remaining_allowance': 2500000}
+    df = df_stock.copy(); df['Date'] = pd.to_datetime(df['Date'])
+    df['_order'] = df['Action'].apply(lambda x: 0 if x == 'BUY' else 1)
+    df = df.sort_values(by=['Date', '_order'])
+    for col in ['Qty', 'Price', 'Fee', 'Exchange_Rate']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', ''), errors='coerce').fillna(0)
+    df = df[~((df['Action'] == 'BUY') & (df['Exchange_Rate'] <= 0))]
+    holdings = {}; realized_profit_krw = 0; tax_log = []
+    for _, row in df.iterrows():
+        ticker = row['Ticker']; qty = row['Qty']; price = row['Price']; fee = row['Fee']; rate = row['Exchange_Rate']
+        if ticker not in holdings: holdings[ticker] = {'qty': 0, 'total_cost_krw': 0}
+        if row['Action'] == 'BUY':
+            cost_krw = (qty * price * rate) + (fee * rate)
+            holdings[ticker]['qty'] += qty; holdings[ticker]['total_cost_krw'] += cost_krw
+        elif row['Action'] == 'SELL':
+            if holdings[ticker]['qty'] > 0:
+                avg_buy_price_krw = holdings[ticker]['total_cost_krw'] / holdings[ticker]['qty']
+                sell_revenue_krw = (qty * price * rate) - (fee * rate)
+                buy_cost_krw = avg_buy_price_krw * qty
+                profit = sell_revenue_krw - buy_cost_krw
+                holdings[ticker]['qty'] -= qty; holdings[ticker]['total_cost_krw'] -= buy_cost_krw
+                if row['Date'].year == current_year:
+                    realized_profit_krw += profit; tax_log.append(f"{row['Date'].strftime('%Y-%m-%d')} {ticker} 매도: {int(profit):,}원 (수익)")
+    return {'realized_profit': realized_profit_krw, 'tax_estimated': max(0, realized_profit_krw - 2500000) * 0.22,
+            'remaining_allowance': max(0, 2500000 - realized_profit_krw), 'log': tax_log}
+
+
+def legacy_history(df_stock, df_cash):
+    if df_stock.empty and df_cash.empty: return pd.DataFrame()
+    dates = []
+    if not df_stock.empty and 'Date' in df_stock.columns: dates.append(pd.to_datetime(df_stock['Date']).min())
+    if not df_cash.empty and 'Date' in df_cash.columns: dates.append(pd.to_datetime(df_cash['Date']).min())
+    if not dates: return pd.DataFrame()
+    start_date = min(dates); end_date = pd.Timestamp.today(); date_range = pd.date_range(start=start_date, end=end_date)
+    history = []; cum_cash_krw = 0; cum_cash_usd = 0; cum_invested_krw = 0; cum_stock_qty = {'SGOV':0, 'SPYM':0, 'QQQM':0, 'QLD':0, 'GMMF':0}
+    df_s = df_stock.copy()
+    if not df_s.empty:
+        df_s['Date'] = pd.to_datetime(df_s['Date'])
+        for col in ['Qty', 'Price', 'Fee']: df_s[col] = pd.to_numeric(df_s[col], errors='coerce').fillna(0)
+    df_c = df_cash.copy()
+    if not df_c.empty:
+        df_c['Date'] = pd.to_datetime(df_c['Date'])
+        for col in ['Amount_KRW', 'Amount_USD']: df_c[col] = pd.to_numeric(df_c[col], errors='coerce').fillna(0)
+    for d in date_range:
+        if not df_c.empty:
+            day_cash = df_c[df_c['Date'] == d]
+            for _, row in day_cash.iterrows():
+                if row['Type'] == 'Deposit': cum_cash_krw += row['Amount_KRW']; cum_invested_krw += row['Amount_KRW']
+                elif row['Type'] == 'Withdraw': cum_cash_krw -= row['Amount_KRW']; cum_invested_krw -= row['Amount_KRW']
+                elif row['Type'] == 'Exchange': cum_cash_krw -= row['Amount_KRW']; cum_cash_usd += row['Amount_USD']
+                elif row['Type'] == 'Exchange_USD_to_KRW': cum_cash_krw += row['Amount_KRW']; cum_cash_usd -= row['Amount_USD']
+        if not df_s.empty:
+            day_stock = df_s[df_s['Date'] == d]
+            for _, row in day_stock.iterrows():
+                cost = (row['Qty'] * row['Price']) + row['Fee']
+                if row['Action'] == 'BUY': cum_cash_usd -= cost; cum_stock_qty[row['Ticker']] += row['Qty']
+                elif row['Action'] == 'SELL': net_gain = (row['Qty'] * row['Price']) - row['Fee']; cum_cash_usd += net_gain; cum_stock_qty[row['Ticker']] -= row['Qty']
+                elif row['Action'] == 'DIVIDEND': net_div = row['Price'] - row['Fee']; cum_cash_usd += net_div
+        history.append({"Date": d, "Total_Invested": cum_invested_krw, "Cash_KRW": cum_cash_krw, "Cash_USD": cum_cash_usd,
+                        "Stock_SGOV": cum_stock_qty.get('SGOV',0), "Stock_QQQM": cum_stock_qty.get('QQQM',0), "Stock_SPYM": cum_stock_qty.get('SPYM',0), "Stock_QLD": cum_stock_qty.get('QLD',0), "Stock_GMMF": cum_stock_qty.get('GMMF',0)})
+    return pd.DataFrame(history)
+
+
+# ==========================================
+# 1) 예전 함수와 같은지
+# ==========================================
+@pytest.fixture(scope='module', params=[(300, 0), (3000, 1), (3000, 2)], ids=lambda p: f"{p[0]}행-seed{p[1]}")
+def book(request):
+    n, seed = request.param
+    df_stock, df_cash = synthetic.ledger(n, years=4, seed=seed)
+    # 환율 0인 매수(세금 원가 제외)와 쉼표 붙은 금액(시트 서식)도 섞는다
+    rng = np.random.default_rng(seed)
+    zero = (df_stock['Action'] == 'BUY') & (rng.random(len(df_stock)) < 0.05)
+    df_stock.loc[zero, 'Exchange_Rate'] = 0.0
+    df_cash['Amount_KRW'] = [f"{v:,.0f}" if i % 3 == 0 else v for i, v in enumerate(df_cash['Amount_KRW'])]
+    return df_stock, df_cash
+
+
+def test_wallet_matches_legacy(book):
+    df_stock, df_cash = book
+    lg, old = ledger.run_ledger(df_stock, df_cash), legacy_wallet(df_stock, df_cash)
+    for new_key, old_key in [('krw', 'KRW'), ('usd', 'USD'), ('net_principal', 'Net_Principal'),
+                             ('usd_in', 'Detail_USD_In'), ('usd_out', 'Detail_USD_Out')]:
+        assert lg[new_key] == pytest.approx(old[old_key], rel=RTOL, abs=1e-6), new_key
+    # 시트가 날짜순이면 종류별(매수 → 매도 → 배당) 로그 순서도 같다
+    assert lg['stock_log'] == old['Stock_Log']
+
+
+def test_avg_fx_matches_legacy(book):
+    df_stock, df_cash = book
+    assert ledger.run_ledger(df_stock, df_cash)['avg_fx'] == legacy_avg_fx(df_cash, df_stock)
+
+
+def test_tax_matches_legacy(book):
+    df_stock, df_cash = book
+    lg = ledger.run_ledger(df_stock, df_cash)
+    years = sorted(pd.to_datetime(df_stock['Date']).dt.year.unique())
+    assert set(lg['realized']) <= set(years)
+    for year in years:
+        new, old = ledger.tax_summary(lg, year), legacy_tax_guard(df_stock, year)
+        assert new['realized_profit'] == pytest.approx(old['realized_profit'], rel=RTOL, abs=1e-6), year
+        assert new['tax_estimated'] == pytest.approx(old['tax_estimated'], rel=RTOL, abs=1e-6), year
+        assert new['log'] == old['log'], year
+
+
+def test_history_matches_legacy(book):
+    df_stock, df_cash = book
+    df_cash = df_cash.assign(Amount_KRW=ledger._num(df_cash['Amount_KRW']))   # 예전 추세 계산은 쉼표를 못 읽었다
+    new = ledger.daily_history(ledger.run_ledger(df_stock, df_cash))
+    old = legacy_history(df_stock, df_cash)
+    assert list(new['Date']) == list(old['Date'])
+    for col in old.columns[1:]:
+        np.testing.assert_allclose(new[col].values, old[col].values, rtol=RTOL, atol=1e-6, err_msg=col)
+
+
+# ==========================================
+# 2) 체크포인트
+# ==========================================
+def same_ledger(a, b):
+    for k in ('krw', 'usd', 'net_principal', 'usd_in', 'usd_out', 'total_div', 'avg_fx'):
+        assert a[k] == pytest.approx(b[k], rel=RTOL, abs=1e-6), k
+    for k in ('stock_log', 'tickers', 'div_by_month', 'cost_basis', 'realized'):
+        assert a[k] == b[k], k
+    assert a['holdings'].keys() == b['holdings'].keys()
+    for t in a['holdings']: assert a['holdings'][t] == pytest.approx(b['holdings'][t], abs=1e-9), t
+    pd.testing.assert_frame_equal(a['daily'], b['daily'], check_exact=False, rtol=RTOL, atol=1e-6)
+
+
+@pytest.fixture
+def ck(tmp_path):
+    return str(tmp_path / 'ledger.pkl')
+
+
+@pytest.fixture(scope='module')
+def small():
+    return synthetic.ledger(600, years=3, seed=5)
+
+
+def row(date, ticker='QQQM', action='BUY', qty=3.0, price=100.0, rate=1400.0, fee=0.2):
+    return pd.DataFrame([{'Date': date, 'Ticker': ticker, 'Action': action, 'Qty': qty, 'Price': price,
+                          'Exchange_Rate': rate, 'Fee': fee}])
+
+
+def test_checkpoint_resumes_appended_rows(ck, small):
+    df_stock, df_cash = small
+    first = ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    assert first['replayed'] == len(df_stock) + len(df_cash)
+    again = ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    assert again['replayed'] == 0
+    same_ledger(again, first)
+
+    last = pd.to_datetime(df_stock['Date']).max() + pd.Timedelta(days=1)
+    grown = pd.concat([df_stock, row(last.strftime('%Y-%m-%d')), row(last.strftime('%Y-%m-%d'), action='SELL', qty=1.0)],
+                      ignore_index=True)
+    lg = ledger.run_ledger(grown, df_cash, checkpoint=ck)
+    assert lg['replayed'] == 2
+    same_ledger(lg, ledger.run_ledger(grown, df_cash))
+
+
+@pytest.mark.parametrize('change', ['back-dated insert', 'edited row', 'deleted row', 'same-day insert before'])
+def test_checkpoint_rebuilds_when_history_changes(ck, small, change):
+    df_stock, df_cash = small
+    ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    s, c = df_stock.copy(), df_cash.copy()
+    if change == 'back-dated insert':
+        s = pd.concat([s, row(s['Date'].iloc[len(s) // 2])], ignore_index=True)
+    elif change == 'edited row':
+        s.loc[len(s) // 3, 'Qty'] = s.loc[len(s) // 3, 'Qty'] + 1
+    elif change == 'deleted row':
+        c = c.drop(index=len(c) // 2).reset_index(drop=True)
+    else:
+        # 마지막 날짜에 매수가 붙으면 같은 날의 매도보다 앞에 정렬된다 → 끝에 붙은 게 아니다
+        last = s['Date'].max()
+        s.loc[s.index[-1], ['Date', 'Action']] = [last, 'SELL']
+        ledger.run_ledger(s, c, checkpoint=ck)
+        s = pd.concat([s, row(last)], ignore_index=True)
+    lg = ledger.run_ledger(s, c, checkpoint=ck)
+    assert lg['replayed'] == len(s) + len(c)
+    same_ledger(lg, ledger.run_ledger(s, c))
+    # 다시 만든 체크포인트에서는 이어서 계산된다
+    assert ledger.run_ledger(s, c, checkpoint=ck)['replayed'] == 0
+
+
+def test_checkpoint_version_bump_rebuilds(ck, small, monkeypatch):
+    df_stock, df_cash = small
+    ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    monkeypatch.setattr(ledger, 'CHECKPOINT_VERSION', ledger.CHECKPOINT_VERSION + 1)
+    lg = ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    assert lg['replayed'] == len(df_stock) + len(df_cash)
+    same_ledger(lg, ledger.run_ledger(df_stock, df_cash))
+
+
+def test_checkpoint_corrupt_file_rebuilds(ck, small):
+    df_stock, df_cash = small
+    with open(ck, 'wb') as f: f.write(b'not a pickle')
+    lg = ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    assert lg['replayed'] == len(df_stock) + len(df_cash)
+    assert ledger.run_ledger(df_stock, df_cash, checkpoint=ck)['replayed'] == 0
+
+
+def test_checkpoint_does_not_share_state_between_runs(ck, small):
+    # 이어서 계산한 결과를 호출한 쪽이 고쳐도 다음 실행(체크포인트 파일)에 새지 않는다
+    df_stock, df_cash = small
+    ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    lg = ledger.run_ledger(df_stock, df_cash, checkpoint=ck)
+    lg['realized'].clear(); lg['cost_basis'].clear()
+    same_ledger(ledger.run_ledger(df_stock, df_cash, checkpoint=ck), ledger.run_ledger(df_stock, df_cash))
@@ -0,0 +1,133 @@
+"""
+마스터 스코어 배열 버전(aegis_core)이 예전 스칼라 함수와 비트 단위로 같은지.
+
+기준(oracle)은 벡터화 전 app.py/bot.py에 있던 calculate_aegis_master_score 본문 그대로다.
+경계값 조합 + 무작위 표본에서, 스칼라 래퍼와 배열 버전(한 번에 전부) 모두 == 로 비교한다.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import itertools
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aegis_core import calculate_aegis_master_score, calculate_aegis_master_score_array
+
+
+def legacy_score(ticker, current_price, rsi, vix, ma200, curr_rate, my_avg_rate, krw_ma60, dxy_curr, dxy_ma20,
+                 target_weight, current_weight, my_krw, sim_day):
+    # 벡터화 이전 본문 (날짜만 sim_day로 고정)
+    score = 0.0
+
+    score_A = 0
+    if rsi < 50:
+        if vix >= 18:
+            score_A += (50 - rsi) * 1.5
+    if vix > 20: score_A += (vix - 20) * 1.0
+    if current_price < ma200: score_A += 20
+    score += min(score_A, 60)
+
+    score_B = 0
+    gap = target_weight - current_weight
+    if gap > 5.0:
+        score_B += (gap - 5.0) * 2.5
+    score += min(score_B, 30)
+
+    score_C = 0
+    today = sim_day
+    days_passed = (today - 5) if today >= 5 else (today + 30 - 5)
+    if my_krw >= 100000:
+        rate_per_day = 0.8 + min(1.0, (my_krw - 100000) / 500000) * 1.0
+        score_C = days_passed * rate_per_day
+    score += min(score_C, 50)
+
+    score_D = 0
+    blended_base_rate = (my_avg_rate * 0.15) + (krw_ma60 * 0.85)
+    if curr_rate > blended_base_rate:
+        score_D += (curr_rate - blended_base_rate) * 0.5
+    if dxy_curr > dxy_ma20:
+        score_D = score_D * 0.5
+    score -= min(score_D, 50)
+
+    score_F = 0
+    if curr_rate < blended_base_rate:
+        score_F = min((blended_base_rate - curr_rate) * 0.25, 15)
+    score += score_F
+
+    score_E = 0
+    if rsi > 55:
+        score_E += (rsi - 55) * 1.2
+    if current_price > ma200 * 1.10:
+        score_E += 15
+    score -= score_E
+    return score
+
+
+ARGS = ['current_price', 'rsi', 'vix', 'ma200', 'curr_rate', 'my_avg_rate', 'krw_ma60', 'dxy_curr', 'dxy_ma20',
+        'target_weight', 'current_weight', 'my_krw', 'sim_day']
+
+
+def boundary_cases():
+    """각 조건의 경계 바로 아래·위·딱 그 값. 점수 요소는 서로 더하기만 하므로, 시장 요소(A·E: 가격·RSI·VIX)의
+    경계 전부를 현금 요소(C: 원화·날짜)와 한 번, 환율·비중 요소(D·F·B)와 한 번 곱하고 나머지는 돌려 쓴다"""
+    ma200 = 100.0
+    prices = [ma200 * 0.99, ma200, ma200 * 1.10, np.nextafter(ma200 * 1.10, np.inf), 200.0]
+    rsis = [30.0, 49.9, 50.0, 55.0, 55.1, 90.0]
+    vixes = [17.9, 18.0, 20.0, 20.1, 45.0]
+    cash = list(itertools.product([99999.0, 100000.0, 600000.0, 600001.0], [1, 4, 5, 6, 31]))
+    # (현재 환율, 평단, 60일선): 블렌드 기준과 같음 / 위 / 아래 / 크게 위(D 상한) / 크게 아래(F 상한)
+    fxs = [(1400.0, 1400.0, 1400.0), (1410.0, 1400.0, 1400.0), (1390.0, 1400.0, 1400.0),
+           (1600.0, 1400.0, 1400.0), (1200.0, 1400.0, 1400.0)]
+    dxys = [(99.0, 100.0), (100.0, 100.0), (101.0, 100.0)]
+    weights = [(30.0, 25.0), (30.0, 24.9), (50.0, 0.0)]   # 갭 5(경계) / 5.1 / 50(B 상한)
+    fx_side = list(itertools.product(fxs, dxys, weights))
+    market = list(itertools.product(prices, rsis, vixes))
+    combos = ([(m, c, f) for (m, c), f in zip(itertools.product(market, cash), itertools.cycle(fx_side))]
+              + [(m, c, f) for (m, f), c in zip(itertools.product(market, fx_side), itertools.cycle(cash))])
+    for (price, rsi, vix), (krw, day), ((fx, avg, ma60), (dxy, dxy20), (tw, cw)) in combos:
+        yield dict(current_price=price, rsi=rsi, vix=vix, ma200=ma200, curr_rate=fx, my_avg_rate=avg, krw_ma60=ma60,
+                   dxy_curr=dxy, dxy_ma20=dxy20, target_weight=tw, current_weight=cw, my_krw=krw, sim_day=day)
+
+
+def random_cases(n=20000, seed=0):
+    """넓은 범위의 무작위 값. 일부는 0.5 단위로 반올림해서 경계와 같은 값(동점)이 자주 나오게"""
+    rng = np.random.default_rng(seed)
+    cols = {'current_price': rng.uniform(50, 150, n), 'rsi': rng.uniform(0, 100, n), 'vix': rng.uniform(9, 80, n),
+            'ma200': rng.uniform(50, 150, n), 'curr_rate': rng.uniform(1100, 1600, n),
+            'my_avg_rate': rng.uniform(1100, 1600, n), 'krw_ma60': rng.uniform(1100, 1600, n),
+            'dxy_curr': rng.uniform(90, 110, n), 'dxy_ma20': rng.uniform(90, 110, n),
+            'target_weight': rng.uniform(0, 60, n), 'current_weight': rng.uniform(0, 60, n),
+            'my_krw': rng.uniform(0, 2e6, n), 'sim_day': rng.integers(1, 32, n)}
+    tie = rng.random(n) < 0.3
+    for k in ('rsi', 'vix', 'curr_rate', 'krw_ma60', 'my_avg_rate', 'dxy_curr', 'dxy_ma20'):
+        cols[k] = np.where(tie, np.round(cols[k] * 2) / 2, cols[k])
+    cols['ma200'] = np.where(tie, cols['current_price'], cols['ma200'])
+    return [{k: (int(v[i]) if k == 'sim_day' else float(v[i])) for k, v in cols.items()} for i in range(n)]
+
+
+def check(cases):
+    expected = np.array([legacy_score('QQQM', **c) for c in cases])
+    scalar = np.array([calculate_aegis_master_score('QQQM', **c) for c in cases])
+    cols = {k: np.array([c[k] for c in cases]) for k in ARGS}
+    day = cols.pop('sim_day')
+    array = calculate_aegis_master_score_array(*cols.values(), day=day)['score']
+    bad_scalar = np.flatnonzero(scalar != expected)
+    bad_array = np.flatnonzero(array != expected)
+    assert bad_scalar.size == 0, f"스칼라 불일치 {bad_scalar.size}건, 예: {cases[bad_scalar[0]]}"
+    assert bad_array.size == 0, f"배열 불일치 {bad_array.size}건, 예: {cases[bad_array[0]]}"
+
+
+def test_boundaries_match_legacy():
+    check(list(boundary_cases()))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_random_sweep_matches_legacy(seed):
+    check(random_cases(seed=seed))
+
+
+def test_scalar_returns_float():
+    c = next(boundary_cases())
+    assert type(calculate_aegis_master_score('QQQM', **c)) is float
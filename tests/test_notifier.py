@@ -0,0 +1,250 @@
+"""
+텔레그램 전송(notifier)을 로컬 가짜 Bot API(benchmarks/stub_services.py) 상대로.
+
+- 재시도: 429는 retry_after만큼(최대 max_wait), 5xx·연결 오류는 지수 백오프, 그 밖의 4xx는 바로 실패
+- 나눠 보내기: 한글·이모지가 섞여도 조각마다 4096 UTF-16 단위 이하, 이어 붙이면 원문
+- 중복 억제: SignalLog 단위 동작 + 봇 한 번 실행 끝-끝(전송이 실패하면 기록을 남기지 않아 다음 실행이 다시 보낸다)
+대기는 실제로 자지 않고 Notifier.sleep을 바꿔 끼워 기록만 한다.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import json
+import socket
+import contextlib
+import io
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import notifier
+from notifier import Notifier, SignalLog, chunk_message, _units
+from stub_services import StubServices
+
+
+@pytest.fixture(scope='module')
+def stub():
+    s = StubServices().start()
+    yield s
+    s.stop()
+
+
+@pytest.fixture
+def api(stub):
+    stub.messages.clear(); stub.telegram_faults.clear(); stub.hits.clear()
+    return stub
+
+
+def make(api, **kw):
+    n = Notifier('TOKEN', 'CHAT', api=api.url, timeout=5, **kw)
+    n.waits = []
+    n.sleep = n.waits.append
+    return n
+
+
+# ==========================================
+# 📨 재시도
+# ==========================================
+def test_ok_first_try(api):
+    n = make(api)
+    assert n.send("안녕 👋")
+    assert api.messages == ["안녕 👋"] and n.waits == [] and n.sent == 1
+
+
+def test_429_waits_retry_after(api):
+    api.telegram_faults += [(429, 7), (429, 3)]
+    n = make(api)
+    assert n.send("신호")
+    assert n.waits == [7.0, 3.0]
+    assert api.messages == ["신호"]
+
+
+def test_429_wait_is_capped(api):
+    api.telegram_faults += [(429, 600)]
+    n = make(api, max_wait=60)
+    assert n.send("신호")
+    assert n.waits == [60]
+
+
+def test_5xx_exponential_backoff(api):
+    api.telegram_faults += [500, 502, 503]
+    n = make(api, backoff=0.5)
+    assert n.send("신호")
+    assert n.waits == [0.5, 1.0, 2.0]
+    assert api.messages == ["신호"]
+
+
+def test_5xx_gives_up_after_retries(api):
+    api.telegram_faults += [500] * 3
+    n = make(api, retries=2, backoff=1.0)
+    assert not n.send("신호")
+    assert n.waits == [1.0, 2.0]
+    assert api.messages == [] and api.hits['telegram'] == 3
+
+
+@pytest.mark.parametrize('code', [400, 401, 403, 404])
+def test_other_4xx_not_retried(api, code):
+    api.telegram_faults += [code]
+    n = make(api)
+    assert not n.send("신호")
+    assert n.waits == [] and api.hits['telegram'] == 1
+    assert api.messages == []
+
+
+def test_connection_error_backs_off():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0)); port = s.getsockname()[1]   # 닫힌 포트
+    n = Notifier('TOKEN', 'CHAT', api=f"http://127.0.0.1:{port}", timeout=2, retries=3, backoff=0.25)
+    n.waits = []; n.sleep = n.waits.append
+    assert not n.send("신호")
+    assert n.waits == [0.25, 0.5, 1.0]
+
+
+def test_failed_chunk_fails_send(api):
+    # 두 조각 중 두 번째가 거절되면 send 전체가 실패
+    api.telegram_faults += [None, 400]
+    text = ("가" * 3000 + "\n") * 2
+    n = make(api)
+    assert not n.send(text)
+    assert len(api.messages) == 1
+
+
+# ==========================================
+# ✂️ 나눠 보내기 (UTF-16 기준 4096)
+# ==========================================
+def lines(n, seed=0):
+    import random
+    rng = random.Random(seed)
+    parts = ["📡 **[Aegis]**", "💰 잔고: ￦1,234,567", "한글 신호 줄", "🔥🔥🔥 QLD 매수", "plain ascii line", "👨‍👩‍👧 가족"]
+    return "".join(rng.choice(parts) * rng.randint(1, 40) + "\n" for _ in range(n))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_chunks_fit_limit_and_rejoin(seed):
+    text = lines(400, seed)
+    chunks = chunk_message(text)
+    assert len(chunks) > 1
+    assert all(_units(c) <= notifier.MAX_LEN for c in chunks)
+    assert "".join(chunks) == text
+    assert all(c.endswith("\n") for c in chunks)   # 줄이 한도보다 짧으면 줄바꿈에서만 자른다
+
+
+def test_emoji_counts_two_units():
+    assert _units("🔥") == 2 and _units("가") == 1
+    text = "🔥" * 2048 + "\n끝\n"   # 첫 줄이 4096 단위 + 줄바꿈
+    chunks = chunk_message(text)
+    assert chunks == ["🔥" * 2048, "\n끝\n"]
+
+
+def test_long_single_line_is_split_inside():
+    text = ("가🔥" * 5000)
+    chunks = chunk_message(text, limit=100)
+    assert "".join(chunks) == text
+    assert all(_units(c) <= 100 for c in chunks)
+    # 이모지(2단위)를 반으로 쪼개지 않으므로 한도에서 많아야 1단위 모자란다
+    assert all(_units(c) >= 99 for c in chunks[:-1])
+
+
+def test_exact_limit_is_one_chunk():
+    text = "가" * 4095 + "\n"
+    assert chunk_message(text) == [text]
+
+
+def test_long_message_delivered_in_pieces(api):
+    text = lines(600, 1)
+    n = make(api)
+    assert n.send(text)
+    assert len(api.messages) == len(chunk_message(text)) > 1
+    assert "".join(api.messages) == text
+
+
+# ==========================================
+# 🧾 SignalLog
+# ==========================================
+def test_signal_log_suppresses_until_signal_clears(tmp_path):
+    path = str(tmp_path / 'sent.json')
+    log = SignalLog(path, repeat_hours=0)
+    assert log.fresh(['a', 'b']) == {'a', 'b'}
+    log.commit(['a', 'b'], sent={'a', 'b'}, now=100)
+    log = SignalLog(path, repeat_hours=0)   # 다음 실행
+    assert log.fresh(['a', 'b', 'c']) == {'c'}
+    log.commit(['b', 'c'], sent={'c'}, now=200)   # a는 사라짐
+    log = SignalLog(path, repeat_hours=0)
+    assert log.fresh(['a', 'b', 'c']) == {'a'}   # 사라졌다 다시 뜬 신호는 새 신호
+
+
+def test_signal_log_repeat_hours(tmp_path):
+    path = str(tmp_path / 'sent.json')
+    log = SignalLog(path, repeat_hours=2)
+    log.commit(['a'], sent={'a'}, now=0)
+    assert SignalLog(path, repeat_hours=2).fresh(['a'], now=2 * 3600 - 1) == set()
+    assert SignalLog(path, repeat_hours=2).fresh(['a'], now=2 * 3600) == {'a'}
+    # 유지 중이지만 안 보낸 신호는 처음 보낸 시각을 그대로 둔다
+    log = SignalLog(path, repeat_hours=2); log.commit(['a'], now=3600)
+    assert SignalLog(path, repeat_hours=2).fresh(['a'], now=2 * 3600) == {'a'}
+
+
+def test_signal_log_broken_file_starts_over(tmp_path):
+    path = tmp_path / 'sent.json'
+    path.write_text('{not json')
+    assert SignalLog(str(path)).fresh(['a']) == {'a'}
+
+
+# ==========================================
+# 🤖 봇 한 번 실행: 전송이 성공했을 때만 기록
+# ==========================================
+@pytest.fixture(scope='module')
+def bot_env(tmp_path_factory):
+    from bench_pipeline import STOCK, CASH, configure
+    s = StubServices(sheets={'Sheet1': [r[:] for r in STOCK], 'CashFlow': [r[:] for r in CASH]}).start()
+    work = str(tmp_path_factory.mktemp('bot'))
+    configure(s, work)
+    import bot
+    import price_providers
+    # import 시점에 읽은 경로·주소를 이 테스트의 것으로 (다른 테스트가 먼저 import했을 수 있다)
+    bot.price_store.STORE_DIR = os.environ['AEGIS_PRICE_STORE']
+    bot.sheet_mirror.DB_PATH = os.environ['AEGIS_SHEET_MIRROR']
+    bot.sheet_mirror.SHEETS_API = os.environ['AEGIS_SHEETS_API']
+    bot.sheet_mirror.SHEET_DIR = ''
+    price_providers.set_provider(price_providers.PriceChain([price_providers.ChartProvider(s.url)]))
+    bot.ledger.CHECKPOINT_PATH = os.environ['AEGIS_LEDGER_CHECKPOINT']
+    bot.notifier.STATE_PATH = os.environ['AEGIS_NOTIFY_STATE']
+    bot.RUN_STATE_PATH = os.environ['AEGIS_RUN_STATE']
+    bot._notifier = Notifier('TOKEN', 'CHAT', api=s.url, timeout=5)
+    bot._notifier.sleep = lambda sec: None
+    saved = bot.is_market_open, bot.is_banking_hours
+    bot.is_market_open = lambda now=None: (True, "장 운영 중 🟢")
+    bot.is_banking_hours = lambda now=None: True
+    yield bot, s
+    bot.is_market_open, bot.is_banking_hours = saved
+    price_providers.set_provider(None)
+    bot._notifier = None
+    s.stop()
+
+
+def run(bot):
+    with contextlib.redirect_stdout(io.StringIO()) as out: bot.run_bot()
+    return out.getvalue()
+
+
+def test_bot_commits_signals_only_after_delivery(bot_env):
+    bot, s = bot_env
+    state = os.environ['AEGIS_NOTIFY_STATE']
+
+    s.telegram_faults += [403]   # 전송 실패
+    run(bot)
+    assert s.messages == []
+    assert not os.path.exists(state)            # 보낸 신호 기록 없음
+    assert not os.path.exists(bot.RUN_STATE_PATH)   # 입력 지문도 없음 → 다음 실행이 생략되지 않는다
+
+    run(bot)                                    # 다시 보낸다
+    assert len(s.messages) == 1
+    with open(state, encoding='utf-8') as f: sent = json.load(f)['active']
+    assert sent                                 # 신호가 있었고 기록됐다
+
+    os.remove(bot.RUN_STATE_PATH)               # 입력 지문 생략을 끄고 판정까지 다시 돌려도
+    out = run(bot)
+    assert len(s.messages) == 1                 # 같은 신호는 다시 보내지 않는다
+    assert "이미 알림" in out
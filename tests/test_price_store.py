@@ -0,0 +1,83 @@
+"""
+가격 저장소(price_store)의 이어 받기: 종목마다 자기 마지막 봉부터만 받는지, 수정주가 기준이 바뀌면 통째로 다시 받는지.
+공급자는 메모리 속 가짜(요청마다 (종목들, 시작일)을 기록)로 바꿔 끼운다.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import price_providers as pp
+import price_store as ps
+
+TODAY = pd.Timestamp.today().normalize()
+IDX = pd.bdate_range(end=TODAY, periods=400)
+
+
+class FakeProvider(pp.PriceProvider):
+    name = 'fake'
+    remote = False
+
+    def __init__(self, frames):
+        self.frames = frames   # 종목 → 지금 '원본'에 있는 전체 프레임
+        self.calls = []
+
+    def fetch(self, tickers, start, end, timeout):
+        self.calls.append((tuple(sorted(tickers)), pd.Timestamp(start)))
+        return {t: self.frames[t][self.frames[t].index >= start] for t in tickers if t in self.frames}
+
+
+def frame(lo, hi, n=len(IDX)):
+    return pd.DataFrame({c: np.linspace(lo, hi, n) for c in pp.COLUMNS}, index=IDX[-n:])
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(ps, 'STORE_DIR', str(tmp_path))
+    yield
+    pp.set_provider(None)
+
+
+def test_warm_tickers_fetch_from_their_own_last_bar(store):
+    full = {'QQQ': frame(100, 200), 'SPY': frame(300, 400)}
+    # QQQ는 어제까지, SPY는 한 달 전까지만 저장돼 있다
+    p = FakeProvider({'QQQ': full['QQQ'].iloc[:-1], 'SPY': full['SPY'].iloc[:-22]})
+    pp.set_provider(p)
+    ps.get_histories(['QQQ', 'SPY'], period='1y')
+    p.frames, p.calls = full, []
+    out = ps.get_histories(['QQQ', 'SPY'], period='1y')
+    assert sorted(p.calls) == sorted([(('QQQ',), IDX[-3]), (('SPY',), IDX[-24])])
+    for t in full: assert out[t]['Close'].iloc[-1] == full[t]['Close'].iloc[-1]
+
+
+def test_same_start_is_one_request(store):
+    full = {'QQQ': frame(100, 200), 'SPY': frame(300, 400)}
+    p = FakeProvider({t: df.iloc[:-1] for t, df in full.items()})
+    pp.set_provider(p)
+    ps.get_histories(['QQQ', 'SPY'], period='1y')
+    p.frames, p.calls = full, []
+    ps.get_histories(['QQQ', 'SPY'], period='1y')
+    assert p.calls == [(('QQQ', 'SPY'), IDX[-3])]
+
+
+def test_adjustment_change_refetches_only_that_ticker(store):
+    full = {'QQQ': frame(100, 200), 'SPY': frame(300, 400)}
+    p = FakeProvider({t: df.iloc[:-1] for t, df in full.items()})
+    pp.set_provider(p)
+    first = ps.get_histories(['QQQ', 'SPY'], period='1y')
+    # QQQ 2:1 분할 → 과거 수정주가가 전부 절반
+    split = full['QQQ'].copy()
+    split[pp.COLUMNS] = split[pp.COLUMNS] / 2
+    p.frames, p.calls = {'QQQ': split, 'SPY': full['SPY']}, []
+    out = ps.get_histories(['QQQ', 'SPY'], period='1y')
+    covered = first['QQQ'].index[0]
+    assert p.calls[0] == (('QQQ', 'SPY'), IDX[-3])
+    assert p.calls[1:] == [(('QQQ',), covered)]
+    stored = pd.read_parquet(ps._path('QQQ', '.parquet'))
+    assert stored['Close'].max() == split['Close'].max()
+    assert out['QQQ']['Close'].equals(split.loc[out['QQQ'].index, 'Close'])
+    assert out['SPY']['Close'].iloc[-1] == full['SPY']['Close'].iloc[-1]